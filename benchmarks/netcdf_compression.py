@@ -0,0 +1,120 @@
+"""Benchmark of writing netCDF products with each chunking and compression configuration
+
+Packages synthetic Sentinel-1 (radar) and Landsat-8 (optical) sized velocity grids with `netCDF_packaging`, and
+reports the time taken and the size of the product for each compression filter and level (see
+`hyp3_autorift.netcdf_writer`). Filters which aren't available in this netCDF4 build are skipped.
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import netCDF4
+import numpy as np
+from osgeo import osr
+from scipy import ndimage
+
+from hyp3_autorift.netcdf_output import netCDF_packaging
+from hyp3_autorift.netcdf_writer import COMPRESSIONS, Compression
+
+# Approximate (lines, columns) of the 120 m grids of a Sentinel-1 IW frame pair and a Landsat-8 scene pair
+PRODUCT_SHAPES = {'S1': (1900, 2300), 'L8': (1700, 1700)}
+EPSG = 32622
+PIXEL_SIZE = 120.
+
+DEFAULT_CONFIGURATIONS = ('none', 'zlib:1', 'zlib:2', 'zlib:4', 'zstd:1', 'zstd:3', 'blosc_lz4:5', 'blosc_zstd:3')
+
+
+def synthetic_velocities(shape, seed: int = 42):
+    """Smooth reference velocity fields (m/yr), and measured ones with noise, and no data along the edges and in
+    patches
+    """
+    rng = np.random.default_rng(seed)
+    flow = ndimage.gaussian_filter(rng.normal(size=shape), sigma=40)
+    flow = 2000 * np.abs(flow) / np.abs(flow).max()
+    VX = (flow + rng.normal(scale=5, size=shape)).astype(np.float32)
+    VY = (0.3 * flow + rng.normal(scale=5, size=shape)).astype(np.float32)
+    nodata = ndimage.gaussian_filter(rng.normal(size=shape), sigma=20) > 0.02
+    nodata[:, :shape[1] // 10] = True
+    VX[nodata] = np.nan
+    VY[nodata] = np.nan
+    return VX, VY, (flow + 1).astype(np.float32), (0.3 * flow + 1).astype(np.float32)
+
+
+def package(out_nc_filename: str, shape, pair_type: str, compression: Compression) -> float:
+    """Package a synthetic product, and return the time `netCDF_packaging` took"""
+    VX, VY, VXref, VYref = synthetic_velocities(shape)
+    ones = np.ones(shape, dtype=np.float32)
+    zeros = np.zeros(shape, dtype=np.float32)
+    SX, SY = ones * -0.02, ones * -0.005
+    DX, DY = VX / 100, -VY / 100
+    SSM = np.isfinite(VX) & (np.hypot(VX, VY) < 50)
+    SSM1 = np.isfinite(VX) & (np.hypot(VX, VY) < 100)
+    chip_size = np.full(shape, 16, dtype=np.float32)
+    interp_mask = np.zeros(shape, dtype=np.float32)
+
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    tran = [500_000., PIXEL_SIZE, 0., 7_500_000., 0., -PIXEL_SIZE]
+
+    if pair_type == 'radar':
+        IMG_INFO_DICT = {'mission_img1': 'S', 'satellite_img1': '1A', 'mission_img2': 'S', 'satellite_img2': '1B',
+                         'date_center': '20210105', 'date_dt': 12., 'autoRIFT_software_version': 'benchmark'}
+        error_vector = np.array([[0.0267, 0.0398, 0.0269, 0.0248, 0.0212, 0.0312],
+                                 [0.2, 0.3, 0.2, 0.2, 0.15, 0.25]])
+        detection_method, coordinates, pixel_sizes = 'feature', 'radar, map', (2.3, 14.)
+    else:
+        IMG_INFO_DICT = {'mission_img1': 'L', 'satellite_img1': 8., 'mission_img2': 'L', 'satellite_img2': 8.,
+                         'date_center': '20200711', 'date_dt': 16., 'autoRIFT_software_version': 'benchmark'}
+        error_vector = np.array([25.5, 25.5])
+        detection_method, coordinates, pixel_sizes = 'feature', 'map', (15., 15.)
+
+    start = time.perf_counter()
+    netCDF_packaging(
+        VX, VY, DX, DY, interp_mask, chip_size.copy(), chip_size.copy(), SSM, SSM1, SX, SY,
+        ones * 100, ones * 10, ones * 10, ones * -100, zeros, VXref, VYref, *pixel_sizes, 16., EPSG, srs, tran,
+        out_nc_filename, pair_type, detection_method, coordinates, IMG_INFO_DICT, int(SSM.sum()), int(SSM1.sum()),
+        1, 0., 0., 0., 0., error_vector, 'benchmark', compression=compression,
+    )
+    return time.perf_counter() - start
+
+
+def available(compression: str, directory: Path) -> bool:
+    if compression in ('none', 'zlib'):
+        return True
+    with netCDF4.Dataset(directory / 'filters.nc', 'w') as nc:
+        has_filter = getattr(nc, f'has_{compression.split("_")[0]}_filter', None)
+        return has_filter is not None and has_filter()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('configurations', nargs='*', default=DEFAULT_CONFIGURATIONS,
+                        help=f'Compression filters and levels to benchmark, as `filter:level`; filters are one of '
+                             f'{COMPRESSIONS}')
+    parser.add_argument('--chunk-lines', type=int, help='Lines in each chunk (default: full-width chunks of '
+                                                        '`default_chunk_lines`)')
+    parser.add_argument('--chunk-columns', type=int, help='Columns in each chunk (default: the full width)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = Path(temp_dir)
+        for product, pair_type in (('S1', 'radar'), ('L8', 'optical')):
+            shape = PRODUCT_SHAPES[product]
+            print(f'{product} ({pair_type}) product, {shape[0]}x{shape[1]} grid')
+            for configuration in args.configurations:
+                name, _, level = configuration.partition(':')
+                if not available(name, directory):
+                    print(f'  {configuration:14} not available in this netCDF4 build')
+                    continue
+                compression = Compression(name, int(level or 0), args.chunk_lines, args.chunk_columns)
+                product_file = directory / f'{product}_{name}_{level}.nc'
+                wall_time = package(str(product_file), shape, pair_type, compression)
+                size = product_file.stat().st_size
+                print(f'  {configuration:14} {wall_time:6.2f} s  {size / 2**20:6.1f} MB')
+                product_file.unlink()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""Micro-benchmark of the no-data mask construction in the vendored autoRIFT drivers"""
+
+import argparse
+import timeit
+
+import numpy as np
+
+from hyp3_autorift.vend.testautoRIFT import maskZeroValues
+
+
+def mask_zero_values_loop(I1, I2, xGrid, yGrid, noDataMask, nodata):
+    for ii in range(xGrid.shape[0]):
+        for jj in range(xGrid.shape[1]):
+            if (yGrid[ii, jj] != nodata) & (xGrid[ii, jj] != nodata):
+                if (I1[yGrid[ii, jj] - 1, xGrid[ii, jj] - 1] == 0) | (I2[yGrid[ii, jj] - 1, xGrid[ii, jj] - 1] == 0):
+                    noDataMask[ii, jj] = True
+    return noDataMask
+
+
+def synthetic_grid(size: int, spacing: int = 4, nodata: int = -32767, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    I1 = rng.integers(0, 100, size=(size * spacing, size * spacing)).astype(np.float32)
+    I2 = rng.integers(0, 100, size=(size * spacing, size * spacing)).astype(np.float32)
+    xGrid, yGrid = np.meshgrid(np.arange(1, size * spacing, spacing), np.arange(1, size * spacing, spacing))
+    xGrid = xGrid.astype(np.int32)
+    yGrid = yGrid.astype(np.int32)
+    xGrid[rng.random(xGrid.shape) < 0.2] = nodata
+    return I1, I2, xGrid, yGrid, nodata
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=2000, help='Number of grid rows and columns')
+    args = parser.parse_args()
+
+    I1, I2, xGrid, yGrid, nodata = synthetic_grid(args.size)
+    noDataMask = xGrid == nodata
+
+    loop_time = timeit.timeit(
+        lambda: mask_zero_values_loop(I1, I2, xGrid, yGrid, noDataMask.copy(), nodata), number=1
+    )
+    vectorized_time = timeit.timeit(
+        lambda: maskZeroValues(I1, I2, xGrid, yGrid, noDataMask.copy(), nodata), number=1
+    )
+
+    print(f'{args.size}x{args.size} grid')
+    print(f'  loop:       {loop_time:.3f} s')
+    print(f'  vectorized: {vectorized_time:.3f} s')
+    print(f'  speedup:    {loop_time / vectorized_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+"""End-to-end benchmark of the optical pipeline on a synthetic Landsat-8 pair
+
+Builds a pair of synthetic Landsat-8 band 8 GeoTIFFs, where the secondary image is the reference image displaced
+by a known velocity field (a glacier flowing east through stable ground), and the matching synthetic ITS_LIVE
+parameter rasters (DEM, slopes, reference velocities, search ranges, chip sizes, and stable surface mask). Then it
+runs Geogrid, autoRIFT and netCDF packaging (`generateAutoriftProduct`), and browse image generation locally,
+without any network access, and writes a JSON report of the metrics of the run and each stage (wall time, CPU time,
+peak RSS, and bytes read and written; see `hyp3_autorift.metrics`), and of the product's velocity error, to track
+across releases.
+"""
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from netCDF4 import Dataset
+from osgeo import gdal, osr
+from scipy import ndimage
+
+import hyp3_autorift
+from hyp3_autorift import cache, image
+from hyp3_autorift.metrics import StageMetrics
+
+EPSG = 32622
+PIXEL_SIZE = 15.
+PARAMETER_PIXEL_SIZE = 240.
+ORIGIN = (500_000., 7_500_000.)
+DAYS = 16
+
+REFERENCE = 'LC08_L1TP_009011_20200703_20200913_02_T1_B8.TIF'
+SECONDARY = 'LC08_L1TP_009011_20200719_20200913_02_T1_B8.TIF'
+
+SEARCH_RANGE = 2000
+CHIP_SIZE_MIN = 240
+CHIP_SIZE_MAX = 960
+
+
+def velocity(x: np.ndarray, y: np.ndarray, extent: float, max_velocity: float):
+    """A glacier flowing east across the middle of the scene, in m/yr; the ground either side of it is stable"""
+    center = ORIGIN[1] - extent / 2
+    vx = max_velocity * np.exp(-((y - center) / (extent / 8)) ** 2) * (1 + 0.2 * np.sin(2 * np.pi * x / extent))
+    vx[np.abs(vx) < 1] = 0
+    return vx, np.zeros_like(vx)
+
+
+def write_raster(path: Path, array: np.ndarray, pixel_size: float, origin=ORIGIN, data_type=gdal.GDT_Float32):
+    ds = gdal.GetDriverByName('GTiff').Create(str(path), array.shape[1], array.shape[0], 1, data_type,
+                                              options=['TILED=YES', 'COMPRESS=DEFLATE'])
+    ds.SetGeoTransform([origin[0], pixel_size, 0, origin[1], 0, -pixel_size])
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    ds.SetProjection(srs.ExportToWkt())
+    ds.GetRasterBand(1).WriteArray(array)
+    del ds
+    return str(path)
+
+
+def synthetic_pair(directory: Path, size: int, max_velocity: float, seed: int = 42):
+    """Write a synthetic reference image, and the secondary image its texture is displaced to after `DAYS` days"""
+    rng = np.random.default_rng(seed)
+    texture = ndimage.gaussian_filter(rng.normal(size=(size, size)), sigma=1.5)
+    reference = np.interp(texture, (texture.min(), texture.max()), (5_000, 30_000))
+
+    rows, cols = np.mgrid[0:size, 0:size].astype(np.float32)
+    x = ORIGIN[0] + (cols + 0.5) * PIXEL_SIZE
+    y = ORIGIN[1] - (rows + 0.5) * PIXEL_SIZE
+    vx, vy = velocity(x, y, size * PIXEL_SIZE, max_velocity)
+    years = DAYS / 365.25
+    secondary = ndimage.map_coordinates(
+        reference, [rows + vy * years / PIXEL_SIZE, cols - vx * years / PIXEL_SIZE], order=3, mode='reflect'
+    )
+
+    return (
+        write_raster(directory / REFERENCE, reference.astype(np.uint16), PIXEL_SIZE, data_type=gdal.GDT_UInt16),
+        write_raster(directory / SECONDARY, secondary.astype(np.uint16), PIXEL_SIZE, data_type=gdal.GDT_UInt16),
+    )
+
+
+def synthetic_parameters(directory: Path, size: int, max_velocity: float) -> dict:
+    """Write synthetic ITS_LIVE parameter rasters covering the scene, with a margin, and return their
+    `parameter_info['geogrid']` dict
+    """
+    margin = 4
+    extent = size * PIXEL_SIZE
+    count = int(np.ceil(extent / PARAMETER_PIXEL_SIZE)) + 2 * margin
+    origin = (ORIGIN[0] - margin * PARAMETER_PIXEL_SIZE, ORIGIN[1] + margin * PARAMETER_PIXEL_SIZE)
+
+    rows, cols = np.mgrid[0:count, 0:count].astype(np.float64)
+    x = origin[0] + (cols + 0.5) * PARAMETER_PIXEL_SIZE
+    y = origin[1] - (rows + 0.5) * PARAMETER_PIXEL_SIZE
+    vx, vy = velocity(x, y, extent, max_velocity)
+    dem = 500 + 0.01 * (x - origin[0])
+    stable = (vx == 0) & (vy == 0)
+
+    def write(name, array, data_type=gdal.GDT_Float32):
+        return write_raster(directory / f'{name}.tif', array, PARAMETER_PIXEL_SIZE, origin, data_type)
+
+    def full(value):
+        return np.full((count, count), value, dtype=np.int32)
+
+    slope_x = np.full((count, count), 0.01, dtype=np.float32)
+    slope_y = np.zeros((count, count), dtype=np.float32)
+    return {
+        'dem': write('dem', dem.astype(np.float32)),
+        'dhdx': write('dhdx', slope_x),
+        'dhdy': write('dhdy', slope_y),
+        'vx': write('vx0', vx.astype(np.int32), gdal.GDT_Int32),
+        'vy': write('vy0', vy.astype(np.int32), gdal.GDT_Int32),
+        'srx': write('vxSearchRange', full(SEARCH_RANGE), gdal.GDT_Int32),
+        'sry': write('vySearchRange', full(SEARCH_RANGE), gdal.GDT_Int32),
+        'csminx': write('xMinChipSize', full(CHIP_SIZE_MIN), gdal.GDT_Int32),
+        'csminy': write('yMinChipSize', full(CHIP_SIZE_MIN), gdal.GDT_Int32),
+        'csmaxx': write('xMaxChipSize', full(CHIP_SIZE_MAX), gdal.GDT_Int32),
+        'csmaxy': write('yMaxChipSize', full(CHIP_SIZE_MAX), gdal.GDT_Int32),
+        'ssm': write('StableSurface', stable.astype(np.uint8), gdal.GDT_Byte),
+        'sp': write('sp', stable.astype(np.uint8), gdal.GDT_Byte),
+        'dhdxs': write('dhdxs', slope_x),
+        'dhdys': write('dhdys', slope_y),
+    }
+
+
+def velocity_error(product_file: str, size: int, max_velocity: float) -> dict:
+    """RMS error of the product's velocities against the synthetic velocity field"""
+    with Dataset(product_file) as nc:
+        x, y = np.meshgrid(nc.variables['x'][:], nc.variables['y'][:])
+        vx = np.ma.masked_values(nc.variables['vx'][:], -32767.).filled(np.nan)
+        vy = np.ma.masked_values(nc.variables['vy'][:], -32767.).filled(np.nan)
+    true_vx, true_vy = velocity(x, y, size * PIXEL_SIZE, max_velocity)
+    valid = np.isfinite(vx) & np.isfinite(vy)
+    return {
+        'valid_fraction': float(valid.mean()),
+        'vx_rms_error': float(np.sqrt(np.mean((vx[valid] - true_vx[valid]) ** 2))),
+        'vy_rms_error': float(np.sqrt(np.mean((vy[valid] - true_vy[valid]) ** 2))),
+    }
+
+
+def run_pipeline(directory: Path, size: int, max_velocity: float, workers: int, memory_limit=None) -> dict:
+    metrics = StageMetrics()
+    os.chdir(directory)
+
+    with metrics.stage('synthetic data'):
+        reference_path, secondary_path = synthetic_pair(directory, size, max_velocity)
+        geogrid_parameters = synthetic_parameters(directory, size, max_velocity)
+
+    with metrics.stage('Geogrid'):
+        from hyp3_autorift.vend.testGeogridOptical import coregisterLoadMetadata, runGeogrid
+        meta_r, meta_s = coregisterLoadMetadata(reference_path, secondary_path)
+        geogrid_info = runGeogrid(meta_r, meta_s, epsg=EPSG, **geogrid_parameters)
+
+    with metrics.stage('autoRIFT'):
+        from hyp3_autorift.vend.testautoRIFT import generateAutoriftProduct
+        netcdf_file = generateAutoriftProduct(
+            reference_path, secondary_path, nc_sensor='L', optical_flag=True, ncname=None,
+            geogrid_run_info=geogrid_info, grid_location='window_location.tif',
+            init_offset='window_offset.tif', search_range='window_search_range.tif',
+            chip_size_min='window_chip_size_min.tif', chip_size_max='window_chip_size_max.tif',
+            offset2vx='window_rdr_off2vel_x_vec.tif', offset2vy='window_rdr_off2vel_y_vec.tif',
+            stable_surface_mask='window_stable_surface_mask.tif', mpflag=workers if workers > 1 else 0,
+            parameter_file='synthetic', memory_limit=memory_limit,
+        )
+
+    with metrics.stage('browse'):
+        with Dataset(netcdf_file) as nc:
+            data = np.ma.masked_values(nc.variables['v'], -32767.).filled(0)
+        image.make_browse(Path(netcdf_file).with_suffix('.png'), data)
+
+    return {
+        **metrics.to_dict(),
+        'product': {
+            'size': os.path.getsize(netcdf_file),
+            **velocity_error(netcdf_file, size, max_velocity),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=2048, help='Number of image rows and columns')
+    parser.add_argument('--max-velocity', type=float, default=1000., help='Peak glacier velocity, in m/yr')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to run autoRIFT with')
+    parser.add_argument('--memory-limit', type=float, help='Memory limit, in GB, for running autoRIFT in tiles')
+    parser.add_argument('--directory', type=Path, help='Directory to run in (default: a temporary directory)')
+    parser.add_argument('--report', type=Path, default=Path('optical_pipeline.json'),
+                        help='JSON report to write')
+    args = parser.parse_args()
+
+    # Benchmark cold runs: don't reuse preprocessed images from the blob cache
+    os.environ[cache.CACHE_SIZE_ENV] = '0'
+
+    report_file = args.report.resolve()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        directory = (args.directory or Path(temp_dir)).resolve()
+        directory.mkdir(parents=True, exist_ok=True)
+        try:
+            results = run_pipeline(directory, args.size, args.max_velocity, args.workers, args.memory_limit)
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        'benchmark': 'optical_pipeline',
+        'hyp3_autorift_version': hyp3_autorift.__version__,
+        'python_version': platform.python_version(),
+        'gdal_version': gdal.__version__,
+        'parameters': {'size': args.size, 'max_velocity': args.max_velocity, 'workers': args.workers,
+                       'memory_limit': args.memory_limit},
+        **results,
+    }
+    report_file.write_text(json.dumps(report, indent=2))
+
+    print(f'{args.size}x{args.size} synthetic Landsat-8 pair: {results["wall_time"]:.1f} s, '
+          f'peak RSS {results["peak_rss_so_far"] / 2**20:.0f} MB')
+    for name, stage in results['stages'].items():
+        print(f'  {name:15} {stage["wall_time"]:7.1f} s  peak RSS so far {stage["peak_rss_so_far"] / 2**20:6.0f} MB')
+    print(f'  vx RMS error {results["product"]["vx_rms_error"]:.1f} m/yr, '
+          f'vy RMS error {results["product"]["vy_rms_error"]:.1f} m/yr')
+    print(f'Report written to {report_file}')
+
+
+if __name__ == '__main__':
+    main()
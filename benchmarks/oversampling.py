@@ -0,0 +1,90 @@
+"""Benchmark of autoRIFT's oversampling policies: runtime vs. offset difference from the default policy
+
+Runs `runAutorift` from the vendored optical driver on a synthetic pair of images, where the secondary image is
+the reference image displaced by a known, smoothly varying, subpixel displacement field.
+"""
+
+import argparse
+import contextlib
+import io
+import timeit
+
+import numpy as np
+from scipy import ndimage
+
+from hyp3_autorift.oversampling import POLICIES
+from hyp3_autorift.vend.testautoRIFT import runAutorift
+
+NODATA = -32767
+
+# Chip sizes, in pixels, of the synthetic Geogrid run (ChipSize0X * [1, 2, 4, 8])
+CHIP_SIZE0 = 16
+GEOGRID_RUN_INFO = {'gridspacingx': 160., 'chipsizex0': 160., 'XPixelSize': 10.}
+
+
+def synthetic_pair(size: int, shift: float, seed: int = 42):
+    """A textured reference image, and the secondary image it's displaced to by a known displacement field"""
+    rng = np.random.default_rng(seed)
+    reference = ndimage.gaussian_filter(rng.normal(size=(size, size)), sigma=2)
+    reference = np.interp(reference, (reference.min(), reference.max()), (1, 255)).astype(np.float32)
+
+    rows, cols = np.mgrid[0:size, 0:size].astype(np.float32)
+    dx = shift + 0.5 * np.sin(2 * np.pi * rows / size)
+    dy = shift / 2 + 0.5 * np.cos(2 * np.pi * cols / size)
+    secondary = ndimage.map_coordinates(reference, [rows - dy, cols - dx], order=3, mode='reflect')
+    return reference, np.clip(secondary, 1, 255).astype(np.float32), dx, dy
+
+
+def synthetic_grids(size: int, spacing: int = CHIP_SIZE0, margin: int = 4 * CHIP_SIZE0):
+    yGrid, xGrid = np.mgrid[margin:size - margin:spacing, margin:size - margin:spacing].astype(np.int32)
+    shape = xGrid.shape
+
+    def full(value):
+        return np.full(shape, value, dtype=np.int32)
+
+    return (xGrid, yGrid, full(0), full(0), full(8), full(8), full(CHIP_SIZE0), full(CHIP_SIZE0),
+            full(4 * CHIP_SIZE0), full(4 * CHIP_SIZE0), np.zeros(shape, dtype=bool))
+
+
+def run_policy(reference, secondary, policy):
+    grids = synthetic_grids(reference.shape[0])
+    with contextlib.redirect_stdout(io.StringIO()):
+        outputs = runAutorift(reference.copy(), secondary.copy(), *grids, 1, NODATA, 0,
+                              geogrid_run_info=GEOGRID_RUN_INFO, oversample=policy)
+    Dx, Dy = outputs[:2]
+    return Dx, Dy, grids[0], grids[1]
+
+
+def rms(values):
+    values = values[np.isfinite(values)]
+    return np.sqrt(np.mean(values ** 2)) if values.size else np.nan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1024, help='Number of image rows and columns')
+    parser.add_argument('--shift', type=float, default=2.3, help='Mean x displacement, in pixels')
+    parser.add_argument('--repeat', type=int, default=1, help='Number of times to time each policy')
+    args = parser.parse_args()
+
+    reference, secondary, dx, dy = synthetic_pair(args.size, args.shift)
+
+    results = {}
+    for policy in POLICIES:
+        wall_time = min(timeit.repeat(lambda: run_policy(reference, secondary, policy), number=1,
+                                      repeat=args.repeat))
+        results[policy] = (wall_time, *run_policy(reference, secondary, policy))
+
+    _, default_dx, default_dy, xGrid, yGrid = results['default']
+    true_dx = dx[yGrid - 1, xGrid - 1]
+
+    print(f'{args.size}x{args.size} images, {xGrid.size} grid points')
+    print(f'  {"policy":9} {"time":>8} {"speedup":>8} {"RMS diff from default":>22} {"RMS x error":>12}')
+    for policy, (wall_time, Dx, Dy, _, _) in results.items():
+        diff = rms(np.hypot(Dx - default_dx, Dy - default_dy))
+        print(f'  {policy:9} {wall_time:7.2f}s {results["default"][0] / wall_time:7.2f}x '
+              f'{diff:20.4f}px {rms(Dx - true_dx):10.4f}px')
+
+
+if __name__ == '__main__':
+    main()
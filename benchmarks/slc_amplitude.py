@@ -0,0 +1,81 @@
+"""Benchmark of loading the amplitude of a complex SLC: all at once vs. streamed a block of rows at a time
+
+Each method runs in a fresh process, so its peak resident memory can be measured on its own.
+"""
+
+import argparse
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from osgeo import gdal
+
+from hyp3_autorift import slc
+
+# Approximate (lines, samples) of topsApp's merged, full-resolution SLC of a Sentinel-1 IW frame
+IW_FRAME_SHAPE = (12_600, 68_000)
+
+
+def write_slc(directory: str, rows: int, columns: int, seed: int = 42) -> str:
+    rng = np.random.default_rng(seed)
+    path = f'{directory}/reference.slc.full'
+    ds = gdal.GetDriverByName('ENVI').Create(path, columns, rows, 1, gdal.GDT_CFloat32)
+    band = ds.GetRasterBand(1)
+    for start in range(0, rows, slc.DEFAULT_BLOCK_ROWS):
+        stop = min(start + slc.DEFAULT_BLOCK_ROWS, rows)
+        block = rng.normal(size=(stop - start, columns)) + 1j * rng.normal(size=(stop - start, columns))
+        band.WriteArray(block.astype(np.complex64), 0, start)
+    del band, ds
+    gdal.Translate(f'{path}.vrt', path, format='VRT')
+    return f'{path}.vrt'
+
+
+def max_rss() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def load(path: str, method: str):
+    baseline = max_rss()
+    start = time.perf_counter()
+    if method == 'complex':
+        data = gdal.Open(path).ReadAsArray()
+        amplitude = np.abs(data)
+    else:
+        amplitude = slc.read_amplitude(path, dtype=method)
+    wall_time = time.perf_counter() - start
+    return wall_time, max_rss() - baseline, amplitude.nbytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=2048, help='Number of SLC rows (lines)')
+    parser.add_argument('--columns', type=int, default=16384, help='Number of SLC columns (samples)')
+    args = parser.parse_args()
+
+    labels = {'complex': 'complex + abs', 'float32': 'streamed float32', 'uint16': 'streamed uint16'}
+    # a block of complex data, and (for uint16) a float32 amplitude of it
+    block_pixels = slc.DEFAULT_BLOCK_ROWS * IW_FRAME_SHAPE[1]
+    frame_pixels = IW_FRAME_SHAPE[0] * IW_FRAME_SHAPE[1]
+    frame_bytes = {'complex': frame_pixels * (8 + 4), 'float32': frame_pixels * 4 + block_pixels * 8,
+                   'uint16': frame_pixels * 2 + block_pixels * (8 + 4)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_slc(directory, args.rows, args.columns)
+        print(f'{args.rows}x{args.columns} complex64 SLC ({args.rows * args.columns * 8 / 2**20:.0f} MB)')
+        for method, label in labels.items():
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                wall_time, peak, nbytes = executor.submit(load, path, method).result()
+            print(f'  {label:17} {wall_time:6.2f} s  peak RSS +{peak / 2**20:5.0f} MB  '
+                  f'amplitude {nbytes / 2**20:4.0f} MB')
+
+    print(f'Projected peak memory per image of a {IW_FRAME_SHAPE[0]}x{IW_FRAME_SHAPE[1]} S1 IW frame')
+    for method, label in labels.items():
+        saved = frame_bytes['complex'] - frame_bytes[method]
+        print(f'  {label:17} {frame_bytes[method] / 2**30:5.1f} GB  (saves {saved / 2**30:.1f} GB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,27 @@
 """
 AutoRIFT processing for HyP3
 """
+import json
+import sys
 from argparse import ArgumentParser
+from contextlib import nullcontext
+from pathlib import Path
 
 from hyp3lib.aws import upload_file_to_s3
 from hyp3lib.fetch import write_credentials_to_netrc_file
 from hyp3lib.image import create_thumbnail
 
+from hyp3_autorift import batch, oversampling, profiling
+from hyp3_autorift.download import DEFAULT_CHUNK_SIZE
+from hyp3_autorift.plan import plan
 from hyp3_autorift.process import DEFAULT_PARAMETER_FILE, get_datetime, process
 
 
 def main():
+    if sys.argv[1:2] == ['batch']:
+        batch.main(sys.argv[2:])
+        return
+
     parser = ArgumentParser()
     parser.add_argument('--username', help='NASA Earthdata Login username for fetching Sentinel-1 scenes')
     parser.add_argument('--password', help='NASA Earthdata Login password for fetching Sentinel-1 scenes')
@@ -21,6 +32,29 @@ def main():
                              'Path to shapefile must be understood by GDAL')
     parser.add_argument('--naming-scheme', default='ITS_LIVE_OD', choices=['ITS_LIVE_OD', 'ITS_LIVE_PROD', 'ASF'],
                         help='Naming scheme to use for product files')
+    parser.add_argument('--memory-limit', type=float,
+                        help='Approximate memory limit, in GB, for running autoRIFT; if provided, autoRIFT will be '
+                             'run in tiles sized to fit within this limit (for each worker)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to run autoRIFT with')
+    parser.add_argument('--download-chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Number of bytes to read into memory and write at a time when downloading '
+                             'Sentinel-1 scenes')
+    parser.add_argument('--amplitude-dtype', default='float32', choices=['float32', 'uint16'],
+                        help='Data type to load the amplitude of Sentinel-1 SLCs as; uint16 amplitudes are scaled, '
+                             'and take half the memory')
+    parser.add_argument('--oversample', default='default', choices=oversampling.POLICIES,
+                        help='Oversampling policy for subpixel refinement: fast halves the oversampling ratio for '
+                             'each chip size, and accurate uses the largest ratio (128) for every chip size')
+    parser.add_argument('--metrics-file', type=Path,
+                        help='JSON file to write the per-stage wall time, CPU time, peak RSS so far, and bytes read '
+                             'and written to (and upload, with the product files)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run with cProfile (and py-spy, if installed), writing .pstats and '
+                             'flamegraph-ready collapsed stack files next to the product (and uploading them, with '
+                             'the product files)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Print a JSON plan of the run (parameter region, Geogrid grid, and estimated cost) '
+                             'without downloading or processing the granules')
     parser.add_argument('granules', type=str.split, nargs='+',
                         help='Granule pair to process')
     args = parser.parse_args()
@@ -34,13 +68,30 @@ def main():
 
     g1, g2 = sorted(args.granules, key=get_datetime)
 
-    product_file, browse_file = process(g1, g2, parameter_file=args.parameter_file, naming_scheme=args.naming_scheme)
+    if args.plan:
+        run_plan = plan(g1, g2, parameter_file=args.parameter_file, memory_limit=args.memory_limit,
+                        workers=args.workers)
+        print(json.dumps(run_plan, indent=2))
+        return
+
+    profiler = profiling.Profiler() if args.profile else nullcontext()
+    with profiler:
+        product_file, browse_file = process(g1, g2, parameter_file=args.parameter_file,
+                                            naming_scheme=args.naming_scheme, memory_limit=args.memory_limit,
+                                            workers=args.workers, download_chunk_size=args.download_chunk_size,
+                                            amplitude_dtype=args.amplitude_dtype, oversample=args.oversample,
+                                            metrics_file=args.metrics_file)
+    profile_files = profiler.write(product_file.with_suffix('')) if args.profile else []
 
     if args.bucket:
         upload_file_to_s3(product_file, args.bucket, args.bucket_prefix)
         upload_file_to_s3(browse_file, args.bucket, args.bucket_prefix)
         thumbnail_file = create_thumbnail(browse_file)
         upload_file_to_s3(thumbnail_file, args.bucket, args.bucket_prefix)
+        if args.metrics_file:
+            upload_file_to_s3(args.metrics_file, args.bucket, args.bucket_prefix)
+        for profile_file in profile_files:
+            upload_file_to_s3(profile_file, args.bucket, args.bucket_prefix)
 
 
 if __name__ == '__main__':
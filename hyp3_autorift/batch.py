@@ -0,0 +1,217 @@
+"""Process many pairs in one long-lived process, or a pool of them
+
+Each pair is processed in its own working directory, so pairs can't clobber each other's intermediate files, and
+a failed pair doesn't stop the batch. The per-process caches (parameter regions and STAC items) and the on-disk
+caches (parameter shapefile and rasters) are shared by every pair a process handles. Downloaded Sentinel-1 scenes
+are shared through the batch's `scenes` directory, with the pairs that start after the pair which downloaded them
+has finished: pairs run concurrently in a pool may each download a scene they share. Orbit files are downloaded by
+each pair into its own `Orbits` directory, as hyp3lib rewrites them in place. The parameter raster cache is
+enabled, with a budget of `hyp3_autorift.cache.DEFAULT_CACHE_SIZE` GB, unless `HYP3_AUTORIFT_CACHE_SIZE` is set,
+as is the optical preprocessing cache, unless `HYP3_AUTORIFT_PREPROCESSING_CACHE` is set.
+"""
+
+import csv
+import json
+import logging
+import os
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from hyp3lib.fetch import write_credentials_to_netrc_file
+
+from hyp3_autorift import cache, oversampling, preprocessing
+from hyp3_autorift.download import DEFAULT_CHUNK_SIZE
+from hyp3_autorift.metrics import StageMetrics
+from hyp3_autorift.process import DEFAULT_PARAMETER_FILE, get_datetime, process
+
+log = logging.getLogger(__name__)
+
+RESULTS_FILE = 'batch_results.json'
+METRICS_FILE = 'metrics.json'
+SCENE_DIR = 'scenes'
+
+
+def load_manifest(manifest: Path) -> List[dict]:
+    """Load the pairs to process from a CSV or JSON manifest
+
+    A CSV manifest has a header row with `reference` and `secondary` columns; a JSON manifest is a list of
+    objects with `reference` and `secondary` keys (or an object with a `pairs` list of them). Each pair may also
+    have a `name`, used for its working directory.
+
+    Returns:
+        pairs: Pairs, with the reference scene acquired before the secondary scene, and a unique name
+    """
+    if manifest.suffix.lower() == '.json':
+        entries = json.loads(manifest.read_text())
+        if isinstance(entries, dict):
+            entries = entries['pairs']
+    else:
+        with open(manifest, newline='') as f:
+            entries = list(csv.DictReader(f))
+
+    pairs = []
+    for index, entry in enumerate(entries):
+        if not entry.get('reference') or not entry.get('secondary'):
+            raise ValueError(f'Pair {index} of {manifest} must have a reference and a secondary scene')
+        reference, secondary = sorted([entry['reference'], entry['secondary']], key=get_datetime)
+        pairs.append({'name': entry.get('name') or f'{reference}_{secondary}',
+                      'reference': reference, 'secondary': secondary})
+
+    names = [pair['name'] for pair in pairs]
+    if len(set(names)) != len(names):
+        raise ValueError(f'Pair names in {manifest} must be unique')
+
+    return pairs
+
+
+def link_files(paths: Sequence[Path], directory: Path):
+    """Hard link files into a directory, skipping any already present (or linked meanwhile by another pair)"""
+    for path in paths:
+        target = directory / path.name
+        if path.exists() and not target.exists():
+            try:
+                os.link(path, target)
+            except FileExistsError:
+                pass
+
+
+def process_pair(pair: dict, directory: Path, **kwargs) -> dict:
+    """Process a pair in its own working directory, recording its outcome instead of raising
+
+    The pair's metrics (see `hyp3_autorift.metrics`) are written to `metrics.json` in its working directory, whether
+    or not it succeeds.
+
+    Args:
+        pair: Pair to process
+        directory: Batch directory, containing the pair's working directory and the shared scenes
+        **kwargs: Additional arguments for `hyp3_autorift.process.process`
+
+    Returns:
+        result: The pair, its `status`, product and browse files or `error`, and its total and per-stage wall times
+    """
+    pair_dir = (directory / pair['name']).resolve()
+    pair_dir.mkdir(parents=True, exist_ok=True)
+    scene_dir = directory.resolve() / SCENE_DIR
+    scenes = [f'{pair["reference"]}.zip', f'{pair["secondary"]}.zip']
+
+    link_files([scene_dir / scene for scene in scenes], pair_dir)
+
+    result = {**pair, 'status': 'failed', 'product_file': None, 'browse_file': None, 'error': None}
+    metrics = StageMetrics()
+    start = time.perf_counter()
+    cwd = os.getcwd()
+    os.chdir(pair_dir)
+    try:
+        product_file, browse_file = process(pair['reference'], pair['secondary'], metrics=metrics, **kwargs)
+        result.update(status='succeeded', product_file=str(pair_dir / product_file),
+                      browse_file=str(pair_dir / browse_file))
+    except Exception as e:  # noqa: B902 (a failed pair must not stop the batch)
+        log.exception(f'Processing {pair["reference"]} and {pair["secondary"]} failed')
+        result['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        os.chdir(cwd)
+        link_files([pair_dir / scene for scene in scenes], scene_dir)
+
+    result['wall_time'] = time.perf_counter() - start
+    result['stages'] = {name: stage['wall_time'] for name, stage in metrics.stages.items()}
+    metrics.write(pair_dir / METRICS_FILE)
+    log.info(f'Pair {pair["name"]} {result["status"]} in {result["wall_time"]:.1f} s')
+    return result
+
+
+def write_results(results: List[Optional[dict]], results_file: Path):
+    results_file.write_text(json.dumps([result for result in results if result is not None], indent=2))
+
+
+def run_batch(manifest: Path, directory: Path = Path('.'), pool: int = 1, **kwargs) -> List[dict]:
+    """Process every pair in a manifest
+
+    The result manifest (`batch_results.json` in `directory`) is rewritten as each pair finishes, so it reflects
+    a partially processed batch too. If a pool process dies (e.g., is killed for running out of memory), the pool
+    can't run any more pairs, and the pairs it hadn't finished are recorded as failed.
+
+    The blob cache (see `hyp3_autorift.cache`) is enabled for the batch, unless `HYP3_AUTORIFT_CACHE_SIZE` is
+    already set, so the parameter rasters are downloaded once and shared by every pair in the same region. So is the
+    preprocessing cache (see `hyp3_autorift.preprocessing`), unless `HYP3_AUTORIFT_PREPROCESSING_CACHE` is already
+    set, so optical scenes are preprocessed once for every pair they're in.
+
+    Args:
+        manifest: CSV or JSON manifest of the pairs to process (see `load_manifest`)
+        directory: Directory to process the pairs in
+        pool: Number of pairs to process concurrently, each in its own process; with 1, the pairs are
+            processed one after another in this process
+        **kwargs: Additional arguments for `hyp3_autorift.process.process`
+
+    Returns:
+        results: Result of each pair (see `process_pair`), in the order of the manifest
+    """
+    pairs = load_manifest(manifest)
+    os.environ.setdefault(cache.CACHE_SIZE_ENV, str(cache.DEFAULT_CACHE_SIZE))
+    os.environ.setdefault(preprocessing.PREPROCESSING_CACHE_ENV, 'true')
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / SCENE_DIR).mkdir(exist_ok=True)
+    results_file = directory / RESULTS_FILE
+    results: List[Optional[dict]] = [None] * len(pairs)
+
+    if pool == 1:
+        for index, pair in enumerate(pairs):
+            results[index] = process_pair(pair, directory, **kwargs)
+            write_results(results, results_file)
+    else:
+        with ProcessPoolExecutor(max_workers=pool) as executor:
+            futures = {
+                executor.submit(process_pair, pair, directory, **kwargs): index for index, pair in enumerate(pairs)
+            }
+            for future in as_completed(futures):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except BrokenProcessPool as e:
+                    results[index] = {**pairs[index], 'status': 'failed', 'product_file': None,
+                                      'browse_file': None, 'error': f'{type(e).__name__}: {e}'}
+                write_results(results, results_file)
+
+    succeeded = sum(result['status'] == 'succeeded' for result in results)
+    log.info(f'Processed {succeeded} of {len(pairs)} pairs successfully; results written to {results_file}')
+    return results
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    """Entrypoint for `hyp3_autorift batch`"""
+    parser = ArgumentParser(prog='hyp3_autorift batch', description='Process many pairs listed in a manifest')
+    parser.add_argument('--username', help='NASA Earthdata Login username for fetching Sentinel-1 scenes')
+    parser.add_argument('--password', help='NASA Earthdata Login password for fetching Sentinel-1 scenes')
+    parser.add_argument('--directory', type=Path, default=Path('.'),
+                        help='Directory to process the pairs in, and write the result manifest to')
+    parser.add_argument('--pool', type=int, default=1, help='Number of pairs to process concurrently')
+    parser.add_argument('--parameter-file', default=DEFAULT_PARAMETER_FILE,
+                        help='Shapefile for determining the correct search parameters by geographic location.'
+                             'Path to shapefile must be understood by GDAL')
+    parser.add_argument('--naming-scheme', default='ITS_LIVE_OD', choices=['ITS_LIVE_OD', 'ITS_LIVE_PROD', 'ASF'],
+                        help='Naming scheme to use for product files')
+    parser.add_argument('--memory-limit', type=float,
+                        help='Approximate memory limit, in GB, for running autoRIFT; if provided, autoRIFT will be '
+                             'run in tiles sized to fit within this limit (for each worker)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to run autoRIFT with, per pair')
+    parser.add_argument('--download-chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='Number of bytes to read into memory and write at a time when downloading '
+                             'Sentinel-1 scenes')
+    parser.add_argument('--amplitude-dtype', default='float32', choices=['float32', 'uint16'],
+                        help='Data type to load the amplitude of Sentinel-1 SLCs as')
+    parser.add_argument('--oversample', default='default', choices=oversampling.POLICIES,
+                        help='Oversampling policy for subpixel refinement, trading accuracy for speed')
+    parser.add_argument('manifest', type=Path,
+                        help='CSV or JSON manifest of the pairs to process, with reference and secondary scenes')
+    args = parser.parse_args(argv)
+
+    if args.username and args.password:
+        write_credentials_to_netrc_file(args.username, args.password)
+
+    run_batch(args.manifest, directory=args.directory, pool=args.pool, parameter_file=args.parameter_file,
+              naming_scheme=args.naming_scheme, memory_limit=args.memory_limit, workers=args.workers,
+              download_chunk_size=args.download_chunk_size, amplitude_dtype=args.amplitude_dtype,
+              oversample=args.oversample)
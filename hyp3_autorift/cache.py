@@ -0,0 +1,320 @@
+"""Local, on-disk caching of remote files used by autoRIFT"""
+
+import fcntl
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from hashlib import sha256
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import requests
+
+log = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = 'HYP3_AUTORIFT_CACHE_DIR'
+CACHE_SIZE_ENV = 'HYP3_AUTORIFT_CACHE_SIZE'
+DEFAULT_CACHE_SIZE = 50.0
+
+# (connect, read) timeouts, in seconds, of requests to revalidate and download files; the read timeout is the
+# longest a download may stall between chunks, not how long it may take
+REQUEST_TIMEOUT = (10, 60)
+
+# Blobs used this recently may be in use by a running job, and won't be evicted
+EVICTION_GRACE_PERIOD = 3600
+
+
+def get_cache_dir() -> Path:
+    """Get the cache directory, which can be set with the `HYP3_AUTORIFT_CACHE_DIR` environment variable"""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if cache_dir is None:
+        return Path.home() / '.cache' / 'hyp3_autorift'
+    return Path(cache_dir)
+
+
+def get_cache_size() -> int:
+    """Get the cache's byte budget for blobs, which can be set in GB with the `HYP3_AUTORIFT_CACHE_SIZE`
+    environment variable; a size of 0 disables the blob cache
+    """
+    return int(float(os.environ.get(CACHE_SIZE_ENV, DEFAULT_CACHE_SIZE)) * 2**30)
+
+
+def is_enabled() -> bool:
+    """The blob cache is opt-in: it's only used if its size is set, with the `HYP3_AUTORIFT_CACHE_SIZE` environment
+    variable, to more than 0, as `hyp3_autorift batch` does by default
+    """
+    return float(os.environ.get(CACHE_SIZE_ENV, 0)) > 0
+
+
+def cached_path(url: str, cache_dir: Path) -> Path:
+    """Local path for a cached URL; files sharing a remote directory share a local directory"""
+    parent, name = url.rsplit('/', 1)
+    return cache_dir / sha256(parent.encode()).hexdigest()[:16] / name
+
+
+def _validators_file(path: Path) -> Path:
+    return path.with_name(f'{path.name}.http.json')
+
+
+def fetch(url: str, cache_dir: Optional[Path] = None, session: Optional[requests.Session] = None) -> Path:
+    """Fetch a remote file into the local cache
+
+    A previously cached copy is revalidated against the server with the `ETag` and `Last-Modified`
+    validators it was downloaded with, and only re-downloaded if it has changed. If the server
+    can't be reached, a previously cached copy will be used.
+
+    Args:
+        url: URL of the file to fetch
+        cache_dir: Directory to cache files in (default: `get_cache_dir()`)
+        session: requests session to use for the request
+
+    Returns:
+        path: Path to the cached file
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    if session is None:
+        session = requests.Session()
+
+    path = cached_path(url, cache_dir)
+    validators_file = _validators_file(path)
+
+    headers = {}
+    if path.exists() and validators_file.exists():
+        validators = json.loads(validators_file.read_text())
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+    try:
+        response = session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        if path.exists():
+            log.warning(f'Unable to revalidate {url}; using cached copy {path}: {e}')
+            return path
+        raise
+
+    if response.status_code == 304:
+        log.debug(f'Cached copy of {url} is up to date: {path}')
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.name}.{os.getpid()}.part')
+    with open(partial, 'wb') as f:
+        for chunk in response.iter_content(chunk_size=1048576):
+            f.write(chunk)
+    os.replace(partial, path)
+
+    validators = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+    validators_file.write_text(json.dumps(validators))
+    log.info(f'Cached {url} to {path}')
+
+    return path
+
+
+@contextmanager
+def _locked(lock_file: Path):
+    """Hold an exclusive lock, shared with other processes on this host, for the duration of the context"""
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_file, 'w') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _blob_key(url: str, response: requests.Response) -> str:
+    """Key a blob by its URL and version, using the best validator the server provides"""
+    etag = response.headers.get('ETag')
+    if etag is None:
+        etag = f'{response.headers.get("Last-Modified")}:{response.headers.get("Content-Length")}'
+    return sha256(f'{url}\n{etag}'.encode()).hexdigest()
+
+
+def _blob_dir(cache_dir: Path, key: str) -> Path:
+    return cache_dir / 'blobs' / key[:2] / key
+
+
+def _blob_path(cache_dir: Path, url: str, key: str) -> Path:
+    return _blob_dir(cache_dir, key) / url.rsplit('/', 1)[-1]
+
+
+def _index_file(cache_dir: Path, url: str) -> Path:
+    return cache_dir / 'blobs' / 'index' / f'{sha256(url.encode()).hexdigest()}.json'
+
+
+def fetch_blob(url: str, cache_dir: Optional[Path] = None, cache_size: Optional[int] = None,
+               session: Optional[requests.Session] = None) -> Path:
+    """Fetch a remote file into the content-addressed blob cache
+
+    Blobs are keyed by URL and `ETag`, so a changed remote file is cached as a new blob, and are shared
+    by all jobs on a host: concurrent fetches of the same blob are serialized with a file lock, so it's
+    only downloaded once. If the server can't be reached, the most recently cached blob for the URL will
+    be used. Least recently used blobs are evicted to keep the cache within its byte budget.
+
+    Args:
+        url: URL of the file to fetch
+        cache_dir: Directory to cache files in (default: `get_cache_dir()`)
+        cache_size: Byte budget for the blob cache (default: `get_cache_size()`)
+        session: requests session to use for the requests
+
+    Returns:
+        path: Path to the cached file
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    if cache_size is None:
+        cache_size = get_cache_size()
+    if session is None:
+        session = requests.Session()
+
+    index_file = _index_file(cache_dir, url)
+    try:
+        response = session.head(url, allow_redirects=True, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        if index_file.exists():
+            path = _blob_path(cache_dir, url, json.loads(index_file.read_text())['key'])
+            if path.exists():
+                log.warning(f'Unable to revalidate {url}; using cached copy {path}: {e}')
+                _touch(path)
+                return path
+        raise
+
+    key = _blob_key(url, response)
+    path = _blob_path(cache_dir, url, key)
+
+    with _locked(path.with_name('.lock')):
+        if path.exists():
+            log.debug(f'Using cached copy of {url}: {path}')
+        else:
+            partial = path.with_name(f'{path.name}.{os.getpid()}.part')
+            with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+                response.raise_for_status()
+                with open(partial, 'wb') as f:
+                    for chunk in response.iter_content(chunk_size=1048576):
+                        f.write(chunk)
+            os.replace(partial, path)
+            log.info(f'Cached {url} to {path}')
+        _touch(path)
+
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    partial_index = index_file.with_name(f'{index_file.name}.{os.getpid()}.part')
+    partial_index.write_text(json.dumps({'url': url, 'key': key}))
+    os.replace(partial_index, index_file)
+
+    evict(cache_dir, cache_size, keep=path)
+    return path
+
+
+def find_blobs(key: str, names: Sequence[str], cache_dir: Optional[Path] = None) -> Optional[List[Path]]:
+    """Find the files of a locally computed blob, marking them as recently used
+
+    Args:
+        key: Key of the blob
+        names: Names of the blob's files
+        cache_dir: Directory to cache files in (default: `get_cache_dir()`)
+
+    Returns:
+        paths: Paths to the blob's files, or None unless all of them are cached
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+
+    directory = _blob_dir(cache_dir, key)
+    if not directory.exists():
+        return None
+
+    paths = [directory / name for name in names]
+    with _locked(directory / '.lock'):
+        if not all(path.exists() for path in paths):
+            return None
+        for path in paths:
+            _touch(path)
+    return paths
+
+
+def store_blob(key: str, name: str, write: Callable[[Path], None], cache_dir: Optional[Path] = None,
+               cache_size: Optional[int] = None) -> Path:
+    """Store a file of a locally computed blob in the blob cache
+
+    Least recently used blobs are evicted to keep the cache within its byte budget.
+
+    Args:
+        key: Key of the blob
+        name: Name of the file
+        write: Function which writes the file to the path it's given
+        cache_dir: Directory to cache files in (default: `get_cache_dir()`)
+        cache_size: Byte budget for the blob cache (default: `get_cache_size()`)
+
+    Returns:
+        path: Path to the cached file
+    """
+    if cache_dir is None:
+        cache_dir = get_cache_dir()
+    if cache_size is None:
+        cache_size = get_cache_size()
+
+    path = _blob_dir(cache_dir, key) / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(f'{path.name}.{os.getpid()}.part')
+    write(partial)
+    with _locked(path.with_name('.lock')):
+        os.replace(partial, path)
+        _touch(path)
+
+    evict(cache_dir, cache_size, keep=path)
+    return path
+
+
+def _touch(path: Path):
+    now = time.time()
+    os.utime(path, (now, now))
+
+
+def evict(cache_dir: Path, cache_size: int, keep: Optional[Path] = None) -> int:
+    """Evict least recently used blobs until the blob cache is within its byte budget
+
+    Blobs used within the last `EVICTION_GRACE_PERIOD` seconds, or `keep`, are never evicted.
+
+    Returns:
+        evicted: Number of bytes evicted
+    """
+    blobs_dir = cache_dir / 'blobs'
+    if not blobs_dir.exists():
+        return 0
+
+    evicted = 0
+    with _locked(blobs_dir / '.lock'):
+        blobs = []
+        for path in blobs_dir.glob('??/*/*'):
+            if path.name == '.lock' or path.name.endswith('.part'):
+                continue
+            stat = path.stat()
+            blobs.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in blobs)
+        cutoff = time.time() - EVICTION_GRACE_PERIOD
+        for mtime, size, path in sorted(blobs):
+            if total <= cache_size:
+                break
+            if mtime > cutoff or path == keep:
+                continue
+            with _locked(path.with_name('.lock')):
+                if not path.exists() or path.stat().st_mtime > cutoff:
+                    continue
+                path.unlink()
+            total -= size
+            evicted += size
+            log.info(f'Evicted {path} from the cache')
+
+    return evicted
@@ -0,0 +1,135 @@
+"""Resumable downloads of the Sentinel-1 scenes and orbits to process"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from hyp3lib.get_orb import downloadSentinelOrbitFile
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from hyp3_autorift.cache import REQUEST_TIMEOUT
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 5242880
+
+# Percent of a file downloaded between progress log messages
+PROGRESS_INTERVAL = 10
+
+
+class DownloadCancelled(Exception):
+    """A download was cancelled before it completed"""
+
+
+def get_session(retries: int = 2, backoff_factor: float = 1.0) -> requests.Session:
+    """requests session which retries failed requests; credentials are read from `~/.netrc`"""
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504])
+    session.mount('https://', HTTPAdapter(max_retries=retry))
+    session.mount('http://', HTTPAdapter(max_retries=retry))
+    return session
+
+
+def _total_size(response: requests.Response, offset: int) -> Optional[int]:
+    content_range = response.headers.get('Content-Range')
+    if content_range and '/' in content_range and not content_range.endswith('/*'):
+        return int(content_range.rsplit('/', 1)[-1])
+    content_length = response.headers.get('Content-Length')
+    if content_length is not None:
+        return offset + int(content_length)
+    return None
+
+
+def _remote_size(response: requests.Response) -> Optional[int]:
+    """Size of the remote file, from the `Content-Range: bytes */<size>` header of a 416 (Range Not Satisfiable)
+    response
+    """
+    content_range = response.headers.get('Content-Range', '')
+    size = content_range.rsplit('/', 1)[-1]
+    return int(size) if '/' in content_range and size.isdigit() else None
+
+
+def download_file(url: str, directory: Path = Path('.'), chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  session: Optional[requests.Session] = None, cancel: Optional[threading.Event] = None) -> Path:
+    """Download a file, resuming a previous partial download of it if one exists
+
+    The file is downloaded to a `.part` file, which is renamed once the download is complete. If a `.part`
+    file is already present, only the remaining bytes are requested with an HTTP range request; if the server
+    can't satisfy the range because the `.part` file doesn't match the remote file's size, it's discarded and
+    the download restarts. A file which has already been completely downloaded will not be downloaded again.
+
+    Args:
+        url: URL of the file to download
+        directory: Directory to download the file to
+        chunk_size: Number of bytes to read into memory and write at a time
+        session: requests session to use for the download (default: `get_session()`)
+        cancel: Event which, once set, stops the download at its next chunk, leaving the `.part` file to resume
+
+    Returns:
+        path: Path to the downloaded file
+    """
+    if session is None:
+        session = get_session()
+
+    path = Path(directory) / os.path.basename(urlparse(url).path)
+    if path.exists():
+        log.info(f'{path} already downloaded')
+        return path
+
+    partial = path.with_name(f'{path.name}.part')
+    offset = partial.stat().st_size if partial.exists() else 0
+    headers = {'Range': f'bytes={offset}-'} if offset else {}
+
+    with session.get(url, headers=headers, stream=True, timeout=REQUEST_TIMEOUT) as response:
+        if response.status_code == 416 and offset:
+            remote_size = _remote_size(response)
+            if remote_size == offset:
+                log.info(f'{partial} is already complete')
+                os.replace(partial, path)
+                return path
+            log.warning(f'{partial} is {offset} bytes, but {url} is {remote_size} bytes; restarting the download')
+            partial.unlink()
+            return download_file(url, directory, chunk_size, session, cancel)
+        response.raise_for_status()
+
+        if response.status_code == 206:
+            log.info(f'Resuming download of {url} from byte {offset}')
+            mode = 'ab'
+        else:
+            offset = 0
+            mode = 'wb'
+
+        total = _total_size(response, offset)
+        downloaded = offset
+        logged = 0
+        with open(partial, mode) as f:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                if cancel is not None and cancel.is_set():
+                    raise DownloadCancelled(f'Download of {url} was cancelled after {downloaded} bytes')
+                f.write(chunk)
+                downloaded += len(chunk)
+                if total:
+                    percent = int(100 * downloaded / total) // PROGRESS_INTERVAL * PROGRESS_INTERVAL
+                    if percent > logged:
+                        log.info(f'{path.name}: {percent}% of {total / 2**20:.1f} MB')
+                        logged = percent
+
+    if total is not None and downloaded != total:
+        raise requests.exceptions.ChunkedEncodingError(
+            f'Download of {url} ended after {downloaded} of {total} bytes; rerun to resume it'
+        )
+
+    os.replace(partial, path)
+    log.info(f'Downloaded {url} to {path}')
+    return path
+
+
+def download_orbit(granule: str, directory: Path) -> Tuple[str, str]:
+    orbit_file, provider = downloadSentinelOrbitFile(granule, directory=str(directory))
+    log.info(f'Downloaded orbit file {orbit_file} from {provider}')
+    return orbit_file, provider
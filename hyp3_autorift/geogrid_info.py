@@ -0,0 +1,73 @@
+"""Structured run info for a Geogrid run, shared between Geogrid and autoRIFT"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+RUN_INFO_FILE = 'testGeogrid.json'
+RUN_INFO_TEXT_FILE = 'testGeogrid.txt'
+
+
+def _to_json(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def write_run_info(run_info: dict, filename: Union[str, Path] = RUN_INFO_FILE):
+    """Write Geogrid's run info to a JSON sidecar file"""
+    Path(filename).write_text(json.dumps(run_info, indent=2, default=_to_json))
+
+
+def parse_run_info_text(text: str) -> dict:
+    """Parse Geogrid's run info from its (captured) standard output"""
+    lines = text.splitlines()
+
+    def fgrep(label):
+        return str.split('\n'.join(line for line in lines if label in line))
+
+    run_info = {
+        'chipsizex0': float(fgrep('Smallest Allowable Chip Size in m:')[-1]),
+        'gridspacingx': float(fgrep('Grid spacing in m:')[-1]),
+        'vxname': fgrep('Velocities:')[1],
+        'vyname': fgrep('Velocities:')[2],
+        'sxname': fgrep('Slopes:')[1][:-4] + 's.tif',
+        'syname': fgrep('Slopes:')[2][:-4] + 's.tif',
+        'maskname': fgrep('Slopes:')[2][:-8] + 'sp.tif',
+        'xoff': int(fgrep('Origin index (in DEM) of geogrid:')[6]),
+        'yoff': int(fgrep('Origin index (in DEM) of geogrid:')[7]),
+        'xcount': int(fgrep('Dimensions of geogrid:')[3]),
+        'ycount': int(fgrep('Dimensions of geogrid:')[5]),
+        'dt': float(fgrep('Repeat Time:')[2]) if fgrep('Repeat Time:') else None,
+        'epsg': float(fgrep('EPSG:')[1]),
+        'cen_lat': float(fgrep('Scene-center lat/lon:')[2]),
+        'cen_lon': float(fgrep('Scene-center lat/lon:')[3]),
+    }
+
+    if fgrep('Ground range pixel size:'):
+        run_info['XPixelSize'] = float(fgrep('Ground range pixel size:')[4])
+        run_info['YPixelSize'] = float(fgrep('Azimuth pixel size:')[3])
+    else:
+        run_info['XPixelSize'] = float(fgrep('X-direction pixel size:')[3])
+        run_info['YPixelSize'] = float(fgrep('Y-direction pixel size:')[3])
+
+    return run_info
+
+
+def load_run_info(filename: Union[str, Path] = RUN_INFO_FILE,
+                  text_filename: Union[str, Path] = RUN_INFO_TEXT_FILE) -> dict:
+    """Load Geogrid's run info from its JSON sidecar file
+
+    For Geogrid runs that predate the sidecar file, the run info is parsed from Geogrid's captured
+    standard output instead.
+    """
+    if Path(filename).exists():
+        return json.loads(Path(filename).read_text())
+
+    log.info(f'{filename} not found; parsing Geogrid run info from {text_filename}')
+    return parse_run_info_text(Path(text_filename).read_text())
@@ -2,6 +2,9 @@
 
 import logging
 import os
+import time
+from datetime import datetime
+from types import SimpleNamespace
 from typing import Tuple
 
 import isce  # noqa: F401
@@ -18,7 +21,115 @@ from osgeo import osr
 log = logging.getLogger(__name__)
 
 
-def bounding_box(safe, priority='reference', polarization='hh', orbits='Orbits', epsg=4326):
+class S1Metadata:
+    """Sentinel-1 scene metadata, parsed once from the SAFE annotations and orbit files of all three swaths
+
+    One instance per scene can be shared by everything that needs the scene's sensing times, ranges, PRF,
+    or merged orbit, instead of each parsing the annotations again.
+    """
+    def __init__(self, safe, priority='reference', polarization='hh', orbits='Orbits'):
+        """
+        :param safe: Path to the Sentinel-1 SAFE zip archive
+        :param priority: Image priority, either 'reference' (default) or 'secondary'
+        :param polarization: Image polarization (default: 'hh')
+        :param orbits: Path to the orbital files (default: './Orbits')
+        """
+        self.safe = os.path.abspath(safe)
+        self.priority = priority
+        self.polarization = polarization
+        self.orbits = os.path.abspath(orbits)
+        self._frames = None
+        self._orbit = None
+
+    @property
+    def frames(self) -> list:
+        """The parsed product of each swath"""
+        if self._frames is None:
+            log.info(f'Parsing {self.priority} SAFE annotations: {self.safe}')
+            start = time.perf_counter()
+            frames = []
+            for swath in range(1, 4):
+                rdr = Sentinel1()
+                rdr.configure()
+                rdr.safe = [self.safe]
+                rdr.output = self.priority
+                rdr.orbitDir = self.orbits
+                rdr.auxDir = self.orbits
+                rdr.swathNumber = swath
+                rdr.polarization = self.polarization
+                rdr.parse()
+                frames.append(rdr.product)
+            self._frames = frames
+            log.info(f'Parsed {self.priority} SAFE annotations in {time.perf_counter() - start:.1f} s')
+        return self._frames
+
+    @property
+    def sensing_start(self) -> datetime:
+        return min([x.sensingStart for x in self.frames])
+
+    @property
+    def sensing_stop(self) -> datetime:
+        return max([x.sensingStop for x in self.frames])
+
+    @property
+    def starting_range(self) -> float:
+        return min([x.startingRange for x in self.frames])
+
+    @property
+    def far_range(self) -> float:
+        return max([x.farRange for x in self.frames])
+
+    @property
+    def range_pixel_size(self) -> float:
+        return self.frames[0].bursts[0].rangePixelSize
+
+    @property
+    def prf(self) -> float:
+        return 1.0 / self.frames[0].bursts[0].azimuthTimeInterval
+
+    @property
+    def number_of_lines(self) -> int:
+        return int(np.round((self.sensing_stop - self.sensing_start).total_seconds() * self.prf))
+
+    @property
+    def number_of_samples(self) -> int:
+        return int(np.round((self.far_range - self.starting_range) / self.range_pixel_size))
+
+    @property
+    def orbit(self) -> Orbit:
+        """Orbit merged from the state vectors of every burst"""
+        if self._orbit is None:
+            orb = Orbit()
+            orb.configure()
+
+            for state_vector in self.frames[0].bursts[0].orbit:
+                orb.addStateVector(state_vector)
+
+            for frame in self.frames:
+                for burst in frame.bursts:
+                    for state_vector in burst.orbit:
+                        if state_vector.time < orb.minTime or state_vector.time > orb.maxTime:
+                            orb.addStateVector(state_vector)
+            self._orbit = orb
+        return self._orbit
+
+    def geogrid_info(self) -> SimpleNamespace:
+        """Scene metadata in the form of Geogrid's `loadMetadata`"""
+        return SimpleNamespace(
+            sensingStart=self.sensing_start,
+            sensingStop=self.sensing_stop,
+            startingRange=self.starting_range,
+            farRange=self.far_range,
+            prf=self.prf,
+            rangePixelSize=self.range_pixel_size,
+            lookSide=-1,
+            numberOfLines=self.number_of_lines,
+            numberOfSamples=self.number_of_samples,
+            orbit=self.orbit,
+        )
+
+
+def bounding_box(safe, priority='reference', polarization='hh', orbits='Orbits', epsg=4326, metadata=None):
     """Determine the geometric bounding box of a Sentinel-1 image
 
     :param safe: Path to the Sentinel-1 SAFE zip archive
@@ -26,55 +137,26 @@ def bounding_box(safe, priority='reference', polarization='hh', orbits='Orbits',
     :param polarization: Image polarization (default: 'hh')
     :param orbits: Path to the orbital files (default: './Orbits')
     :param epsg: Projection EPSG code (default: 4326)
+    :param metadata: Previously parsed `S1Metadata` for the image (default: parse it from `safe`)
 
     :return: lat_limits (list), lon_limits (list)
         lat_limits: list containing the [minimum, maximum] latitudes
         lat_limits: list containing the [minimum, maximum] longitudes
     """
-    frames = []
-    for swath in range(1, 4):
-        rdr = Sentinel1()
-        rdr.configure()
-        rdr.safe = [os.path.abspath(safe)]
-        rdr.output = priority
-        rdr.orbitDir = os.path.abspath(orbits)
-        rdr.auxDir = os.path.abspath(orbits)
-        rdr.swathNumber = swath
-        rdr.polarization = polarization
-        rdr.parse()
-        frames.append(rdr.product)
-
-    first_burst = frames[0].bursts[0]
-    sensing_start = min([x.sensingStart for x in frames])
-    sensing_stop = max([x.sensingStop for x in frames])
-    starting_range = min([x.startingRange for x in frames])
-    far_range = max([x.farRange for x in frames])
-    range_pixel_size = first_burst.rangePixelSize
-    prf = 1.0 / first_burst.azimuthTimeInterval
-
-    orb = Orbit()
-    orb.configure()
-
-    for state_vector in first_burst.orbit:
-        orb.addStateVector(state_vector)
-
-    for frame in frames:
-        for burst in frame.bursts:
-            for state_vector in burst.orbit:
-                if state_vector.time < orb.minTime or state_vector.time > orb.maxTime:
-                    orb.addStateVector(state_vector)
+    if metadata is None:
+        metadata = S1Metadata(safe, priority=priority, polarization=polarization, orbits=orbits)
 
     obj = Geogrid()
     obj.configure()
 
-    obj.startingRange = starting_range
-    obj.rangePixelSize = range_pixel_size
-    obj.sensingStart = sensing_start
-    obj.prf = prf
+    obj.startingRange = metadata.starting_range
+    obj.rangePixelSize = metadata.range_pixel_size
+    obj.sensingStart = metadata.sensing_start
+    obj.prf = metadata.prf
     obj.lookSide = -1
-    obj.numberOfLines = int(np.round((sensing_stop - sensing_start).total_seconds() * prf))
-    obj.numberOfSamples = int(np.round((far_range - starting_range)/range_pixel_size))
-    obj.orbit = orb
+    obj.numberOfLines = metadata.number_of_lines
+    obj.numberOfSamples = metadata.number_of_samples
+    obj.orbit = metadata.orbit
     obj.epsg = epsg
 
     obj.determineBbox()
@@ -4,6 +4,11 @@ import argparse
 import logging
 import os
 import textwrap
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import NamedTuple, Optional, Tuple
 
 import boto3
 from hyp3lib import DemError
@@ -12,54 +17,119 @@ from osgeo import gdal
 from osgeo import ogr
 from scipy.io import savemat
 
-from hyp3_autorift.geometry import flip_point_coordinates
+from hyp3_autorift import cache
+from hyp3_autorift.geometry import S1Metadata, flip_point_coordinates
 
 log = logging.getLogger(__name__)
 
 _s3_client = boto3.client('s3')
 
 
-def find_jpl_parameter_info(polygon: ogr.Geometry, parameter_file: str) -> dict:
+SHAPEFILE_SIDECARS = ('.shx', '.dbf', '.prj')
+
+
+class ParameterRegion(NamedTuple):
+    envelope: Tuple[float, float, float, float]
+    geometry: ogr.Geometry
+    feature: dict
+
+
+def cache_parameter_file(parameter_file: str, cache_dir: Optional[Path] = None) -> str:
+    """Cache a `/vsicurl/` parameter shapefile, and its sidecar files, locally
+
+    Parameter files not accessed via `/vsicurl/` are returned unchanged.
+    """
+    if not parameter_file.startswith('/vsicurl/'):
+        return parameter_file
+
+    url = parameter_file[len('/vsicurl/'):]
+    base_url, _ = os.path.splitext(url)
+    for extension in SHAPEFILE_SIDECARS:
+        cache.fetch(f'{base_url}{extension}', cache_dir)
+
+    return str(cache.fetch(url, cache_dir))
+
+
+def cache_parameter_rasters(parameter_info: dict, cache_dir: Optional[Path] = None) -> dict:
+    """Rewrite the `/vsicurl/` Geogrid input rasters of the parameter info to locally cached copies
+
+    Rasters are fetched into the shared blob cache concurrently. Caching a whole raster only pays off when it's
+    reused by other jobs on the host, so unless the blob cache is enabled (see `cache.is_enabled`), the parameter
+    info is returned unchanged, and Geogrid and autoRIFT read just the windows they need from the remote rasters.
+    """
+    if not cache.is_enabled():
+        return parameter_info
+
+    remote = {name: path[len('/vsicurl/'):] for name, path in parameter_info['geogrid'].items()
+              if isinstance(path, str) and path.startswith('/vsicurl/')}
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        cached = dict(zip(remote, executor.map(lambda url: cache.fetch_blob(url, cache_dir), remote.values())))
+
+    parameter_info['geogrid'].update({name: str(path) for name, path in cached.items()})
+    return parameter_info
+
+
+@lru_cache(maxsize=None)
+def load_parameter_regions(parameter_file: str) -> Tuple[ParameterRegion, ...]:
+    """Load the regions of a parameter shapefile, once per process, with their envelopes for fast lookups"""
     driver = ogr.GetDriverByName('ESRI Shapefile')
-    shapes = driver.Open(parameter_file, gdal.GA_ReadOnly)
+    shapes = driver.Open(cache_parameter_file(parameter_file), gdal.GA_ReadOnly)
 
+    regions = []
+    for feature in shapes.GetLayer(0):
+        geometry = feature.geometry().Clone()
+        regions.append(ParameterRegion(geometry.GetEnvelope(), geometry, feature.items()))
+
+    return tuple(regions)
+
+
+def find_parameter_region(point: ogr.Geometry, parameter_file: str) -> Optional[dict]:
+    """Find the attributes of the parameter shapefile region containing a point"""
+    x, y = point.GetX(), point.GetY()
+    for region in load_parameter_regions(parameter_file):
+        min_x, max_x, min_y, max_y = region.envelope
+        if min_x <= x <= max_x and min_y <= y <= max_y and region.geometry.Contains(point):
+            return region.feature
+    return None
+
+
+def find_jpl_parameter_info(polygon: ogr.Geometry, parameter_file: str) -> dict:
     parameter_info = None
     centroid = flip_point_coordinates(polygon.Centroid())
-    for feature in shapes.GetLayer(0):
-        if feature.geometry().Contains(centroid):
-            parameter_info = {
-                'name': f'{feature["name"]}',
-                'epsg': feature['epsg'],
-                'geogrid': {
-                    'dem': f"/vsicurl/{feature['h']}",
-                    'ssm': f"/vsicurl/{feature['StableSurfa']}",
-                    'dhdx': f"/vsicurl/{feature['dhdx']}",
-                    'dhdy': f"/vsicurl/{feature['dhdy']}",
-                    'vx': f"/vsicurl/{feature['vx0']}",
-                    'vy': f"/vsicurl/{feature['vy0']}",
-                    'srx': f"/vsicurl/{feature['vxSearchRan']}",
-                    'sry': f"/vsicurl/{feature['vySearchRan']}",
-                    'csminx': f"/vsicurl/{feature['xMinChipSiz']}",
-                    'csminy': f"/vsicurl/{feature['yMinChipSiz']}",
-                    'csmaxx': f"/vsicurl/{feature['xMaxChipSiz']}",
-                    'csmaxy': f"/vsicurl/{feature['yMaxChipSiz']}",
-                    'sp': f"/vsicurl/{feature['sp']}",
-                    'dhdxs': f"/vsicurl/{feature['dhdxs']}",
-                    'dhdys': f"/vsicurl/{feature['dhdys']}",
-                },
-                'autorift': {
-                    'grid_location': 'window_location.tif',
-                    'init_offset': 'window_offset.tif',
-                    'search_range': 'window_search_range.tif',
-                    'chip_size_min': 'window_chip_size_min.tif',
-                    'chip_size_max': 'window_chip_size_max.tif',
-                    'offset2vx': 'window_rdr_off2vel_x_vec.tif',
-                    'offset2vy': 'window_rdr_off2vel_y_vec.tif',
-                    'stable_surface_mask': 'window_stable_surface_mask.tif',
-                    'mpflag': 0,
-                }
+    feature = find_parameter_region(centroid, parameter_file)
+    if feature is not None:
+        parameter_info = {
+            'name': f'{feature["name"]}',
+            'epsg': feature['epsg'],
+            'geogrid': {
+                'dem': f"/vsicurl/{feature['h']}",
+                'ssm': f"/vsicurl/{feature['StableSurfa']}",
+                'dhdx': f"/vsicurl/{feature['dhdx']}",
+                'dhdy': f"/vsicurl/{feature['dhdy']}",
+                'vx': f"/vsicurl/{feature['vx0']}",
+                'vy': f"/vsicurl/{feature['vy0']}",
+                'srx': f"/vsicurl/{feature['vxSearchRan']}",
+                'sry': f"/vsicurl/{feature['vySearchRan']}",
+                'csminx': f"/vsicurl/{feature['xMinChipSiz']}",
+                'csminy': f"/vsicurl/{feature['yMinChipSiz']}",
+                'csmaxx': f"/vsicurl/{feature['xMaxChipSiz']}",
+                'csmaxy': f"/vsicurl/{feature['yMaxChipSiz']}",
+                'sp': f"/vsicurl/{feature['sp']}",
+                'dhdxs': f"/vsicurl/{feature['dhdxs']}",
+                'dhdys': f"/vsicurl/{feature['dhdys']}",
+            },
+            'autorift': {
+                'grid_location': 'window_location.tif',
+                'init_offset': 'window_offset.tif',
+                'search_range': 'window_search_range.tif',
+                'chip_size_min': 'window_chip_size_min.tif',
+                'chip_size_max': 'window_chip_size_max.tif',
+                'offset2vx': 'window_rdr_off2vel_x_vec.tif',
+                'offset2vy': 'window_rdr_off2vel_y_vec.tif',
+                'stable_surface_mask': 'window_stable_surface_mask.tif',
+                'mpflag': 0,
             }
-            break
+        }
 
     if parameter_info is None:
         raise DemError('Could not determine appropriate DEM for:\n'
@@ -111,6 +181,30 @@ def format_tops_xml(reference, secondary, polarization, dem, orbits, xml_file='t
         f.write(textwrap.dedent(xml_template))
 
 
+def scene_metadata(name: str, safe: str, sensing_start: datetime, sensing_stop: datetime) -> dict:
+    """Filename and center sensing time of a Sentinel-1 scene, as used for netCDF packaging"""
+    sensing_dt = (sensing_stop - sensing_start) / 2 + sensing_start
+    return {
+        f'{name}_filename': os.path.basename(safe),
+        f'{name}_dt': sensing_dt.strftime("%Y%m%dT%H:%M:%S"),
+    }
+
+
+def topsinsar_metadata(reference_safe: str, secondary_safe: str, reference_info, secondary_info) -> dict:
+    """Sentinel-1 scene filenames and center sensing times for netCDF packaging
+
+    Args:
+        reference_safe: Path to the reference SAFE zip archive
+        secondary_safe: Path to the secondary SAFE zip archive
+        reference_info: Reference scene metadata in the form of Geogrid's `loadMetadata`, spanning all swaths
+        secondary_info: Secondary scene metadata in the form of Geogrid's `loadMetadata`, spanning all swaths
+    """
+    return {
+        **scene_metadata('reference', reference_safe, reference_info.sensingStart, reference_info.sensingStop),
+        **scene_metadata('secondary', secondary_safe, secondary_info.sensingStart, secondary_info.sensingStop),
+    }
+
+
 def save_topsinsar_mat():
     insar = TopsInSAR(name="topsApp")
     insar.configure()
@@ -118,23 +212,8 @@ def save_topsinsar_mat():
     mat_data = {}
     for name in ['reference', 'secondary']:
         scene = insar.__getattribute__(name)
-
-        sensing_times = []
-        for swath in range(1, 4):
-            scene.configure()
-            scene.swathNumber = swath
-            scene.parse()
-            sensing_times.append(
-                (scene.product.sensingStart, scene.product.sensingStop)
-            )
-
-        sensing_start = min([sensing_time[0] for sensing_time in sensing_times])
-        sensing_stop = max([sensing_time[1] for sensing_time in sensing_times])
-
-        sensing_dt = (sensing_stop - sensing_start) / 2 + sensing_start
-
-        mat_data[f'{name}_filename'] = os.path.basename(scene.safe[0])
-        mat_data[f'{name}_dt'] = sensing_dt.strftime("%Y%m%dT%H:%M:%S")
+        metadata = S1Metadata(scene.safe[0], priority=name, polarization=scene.polarization, orbits=scene.orbitDir)
+        mat_data.update(scene_metadata(name, scene.safe[0], metadata.sensing_start, metadata.sensing_stop))
 
     savemat('topsinsar_filename.mat', mat_data)
 
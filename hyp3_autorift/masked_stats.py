@@ -0,0 +1,100 @@
+"""Statistics of several variables over several masks (e.g., the stable surface masks), in one pass
+
+The bias correction and error estimates of a product are statistics (counts, medians, standard deviations) of
+velocities and offsets over the stable surface mask and the slowest 25% of the scene. Rather than copying each
+variable, NaN-ing everything outside a mask, and then indexing the within-bounds values (3-4 full-grid temporaries
+per statistic), the locations inside any of the masks are found once, and each variable (or difference of
+variables) is gathered at just those locations. The gathered values are in the same (C) order as boolean indexing
+of the full grid would give, so the statistics are identical to the full-grid ones.
+"""
+
+from typing import Dict, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+Bounds = Optional[Tuple[float, float]]
+
+
+class Summary(NamedTuple):
+    count: int
+    median: float
+    std: float
+    percentiles: Dict[float, float]
+
+
+class MaskedStatistics:
+    """Gather and summarize variables over a set of named masks of the same shape
+
+    Args:
+        masks: Boolean masks, by name
+    """
+    def __init__(self, masks: Dict[str, np.ndarray]):
+        shapes = {mask.shape for mask in masks.values()}
+        if len(shapes) != 1:
+            raise ValueError(f'Masks must all have the same shape, not {sorted(shapes)}')
+        self.shape = shapes.pop()
+
+        union = np.logical_or.reduce([np.asarray(mask, dtype=bool) for mask in masks.values()])
+        self.index = np.flatnonzero(union)
+        del union
+        if self.index.size and self.index[-1] <= np.iinfo(np.int32).max:
+            self.index = self.index.astype(np.int32)
+        self.masks = {name: np.asarray(mask, dtype=bool).ravel()[self.index] for name, mask in masks.items()}
+
+    def gather(self, values: np.ndarray, reference: Optional[np.ndarray] = None) -> np.ndarray:
+        """Values (minus a reference) at the locations inside any of the masks"""
+        if values.shape != self.shape:
+            raise ValueError(f'Values must have the shape of the masks, {self.shape}, not {values.shape}')
+        gathered = values.ravel()[self.index]
+        if reference is not None:
+            gathered = gathered - reference.ravel()[self.index]
+        return gathered
+
+    @staticmethod
+    def _valid(gathered: np.ndarray, bounds: Bounds) -> np.ndarray:
+        """Which gathered values are strictly within the bounds, or if no bounds, aren't NaN"""
+        if bounds is None:
+            return ~np.isnan(gathered)
+        return (gathered > bounds[0]) & (gathered < bounds[1])
+
+    def select(self, gathered: np.ndarray, mask: str, bounds: Bounds = None) -> np.ndarray:
+        """Gathered values inside a mask that are strictly within the bounds, or if no bounds, aren't NaN"""
+        return gathered[self.masks[mask] & self._valid(gathered, bounds)]
+
+    def count(self, mask: str, *gathered: np.ndarray, bounds: Bounds = None) -> int:
+        """Number of locations inside a mask where all the gathered values are valid (see `select`)"""
+        valid = self.masks[mask].copy()
+        for values in gathered:
+            valid &= self._valid(values, bounds)
+        return int(np.count_nonzero(valid))
+
+    def median(self, gathered: np.ndarray, mask: str, bounds: Bounds = None) -> float:
+        return np.median(self.select(gathered, mask, bounds))
+
+    def std(self, gathered: np.ndarray, mask: str, bounds: Bounds = None) -> float:
+        return np.std(self.select(gathered, mask, bounds))
+
+    def summary(self, gathered: np.ndarray, bounds: Bounds = None,
+                percentiles: Sequence[float] = ()) -> Dict[str, Summary]:
+        """Count, median, standard deviation, and percentiles of the valid gathered values inside each mask
+
+        Args:
+            gathered: Values from `gather`
+            bounds: Open interval values must be within, otherwise, values must just not be NaN
+            percentiles: Percentiles (between 0 and 100) to compute
+
+        Returns:
+            summaries: Summary for each mask; statistics of masks without any valid values are NaN
+        """
+        valid = self._valid(gathered, bounds)
+        summaries = {}
+        for name, mask in self.masks.items():
+            values = gathered[mask & valid]
+            if values.size:
+                summaries[name] = Summary(
+                    values.size, np.median(values), np.std(values),
+                    dict(zip(percentiles, np.percentile(values, percentiles))) if percentiles else {},
+                )
+            else:
+                summaries[name] = Summary(0, np.nan, np.nan, {q: np.nan for q in percentiles})
+        return summaries
@@ -0,0 +1,138 @@
+"""Per-stage metrics for a processing run
+
+Peak RSS can't be measured per stage: the operating system only reports a process's high-water mark. So the
+metrics record `peak_rss_so_far`, the high-water mark of the process at the end of the stage (or run), which
+includes the memory used by any earlier stages.
+"""
+
+import json
+import logging
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+log = logging.getLogger(__name__)
+
+PROC_IO = Path('/proc/self/io')
+PROC_NET_DEV = Path('/proc/self/net/dev')
+
+# Counters which are differenced over a stage; peak RSS is a high-water mark, so isn't
+COUNTERS = ('cpu_time', 'disk_read_bytes', 'disk_write_bytes', 'net_received_bytes', 'net_sent_bytes')
+
+
+def _read_proc_io() -> Dict[str, Optional[int]]:
+    """Bytes this process has read from and written to storage (Linux only)"""
+    try:
+        fields = dict(line.split(': ') for line in PROC_IO.read_text().splitlines())
+        return {'disk_read_bytes': int(fields['read_bytes']), 'disk_write_bytes': int(fields['write_bytes'])}
+    except (OSError, KeyError, ValueError):
+        return {'disk_read_bytes': None, 'disk_write_bytes': None}
+
+
+def _read_net_dev() -> Dict[str, Optional[int]]:
+    """Bytes received and sent on the (non-loopback) network interfaces of this process's network namespace
+    (Linux only); in a container, that's the container's network traffic
+    """
+    try:
+        received, sent = 0, 0
+        for line in PROC_NET_DEV.read_text().splitlines()[2:]:
+            interface, counters = line.split(':', 1)
+            if interface.strip() == 'lo':
+                continue
+            counters = counters.split()
+            received += int(counters[0])
+            sent += int(counters[8])
+        return {'net_received_bytes': received, 'net_sent_bytes': sent}
+    except (OSError, IndexError, ValueError):
+        return {'net_received_bytes': None, 'net_sent_bytes': None}
+
+
+def resource_usage() -> dict:
+    """Snapshot of the cumulative resource usage of this process, including its finished child processes
+
+    Returns:
+        usage: CPU time (in seconds), peak RSS (the largest of this process and its children, in bytes), and the
+            bytes read from and written to storage and received and sent over the network (None where unavailable)
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        'cpu_time': usage.ru_utime + usage.ru_stime + children.ru_utime + children.ru_stime,
+        'peak_rss': max(usage.ru_maxrss, children.ru_maxrss) * 1024,
+        **_read_proc_io(),
+        **_read_net_dev(),
+    }
+
+
+def usage_delta(start: dict, end: dict) -> dict:
+    """Resource usage between two snapshots; `peak_rss_so_far` is the high-water mark at the end"""
+    delta = {
+        name: None if start[name] is None or end[name] is None else end[name] - start[name] for name in COUNTERS
+    }
+    return {**delta, 'peak_rss_so_far': end['peak_rss']}
+
+
+def _megabytes(value: Optional[int]) -> str:
+    return 'n/a' if value is None else f'{value / 2**20:.0f} MB'
+
+
+def format_usage(usage: dict) -> str:
+    return (f'CPU {usage["cpu_time"]:.1f} s, peak RSS so far {_megabytes(usage["peak_rss_so_far"])}, '
+            f'disk read {_megabytes(usage["disk_read_bytes"])}, written {_megabytes(usage["disk_write_bytes"])}, '
+            f'network received {_megabytes(usage["net_received_bytes"])}, '
+            f'sent {_megabytes(usage["net_sent_bytes"])}')
+
+
+class StageMetrics:
+    """Records how long each stage of a run takes, and the resources it uses
+
+    Stages may run concurrently in multiple threads. Resource usage is measured for the whole process (CPU time,
+    and storage I/O) or network namespace (network traffic), so the usage of concurrent stages includes each
+    other's, and peak RSS is the high-water mark of the process at the end of a stage (`peak_rss_so_far`).
+    """
+    def __init__(self):
+        self.stages: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._start_usage = resource_usage()
+
+    @contextmanager
+    def stage(self, name: str):
+        start_usage = resource_usage()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start
+            usage = usage_delta(start_usage, resource_usage())
+            with self._lock:
+                self.stages[name] = {'wall_time': wall_time, **usage}
+            log.info(f'Stage {name} took {wall_time:.1f} s ({format_usage(usage)})')
+
+    def call(self, name: str, func: Callable, *args, **kwargs):
+        """Call a function as a stage; useful for submitting stages to an executor"""
+        with self.stage(name):
+            return func(*args, **kwargs)
+
+    def summary(self) -> str:
+        return ', '.join(f'{name}: {stage["wall_time"]:.1f} s' for name, stage in self.stages.items())
+
+    def to_dict(self) -> dict:
+        """Total and per-stage metrics of the run so far"""
+        with self._lock:
+            stages = dict(self.stages)
+        return {
+            'wall_time': time.perf_counter() - self._start,
+            **usage_delta(self._start_usage, resource_usage()),
+            'stages': stages,
+        }
+
+    def write(self, metrics_file: Path) -> Path:
+        """Write the metrics to a JSON file, and log them as a single JSON line"""
+        metrics = self.to_dict()
+        log.info(f'Metrics: {json.dumps(metrics)}')
+        metrics_file.write_text(json.dumps(metrics, indent=2))
+        return metrics_file
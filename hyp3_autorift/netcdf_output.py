@@ -3,43 +3,66 @@
 
 import datetime
 import subprocess
+from functools import lru_cache
 
 import netCDF4
 import numpy as np
+from scipy.special import ellipe
 
 import hyp3_autorift
+from hyp3_autorift.masked_stats import MaskedStatistics
+from hyp3_autorift.netcdf_writer import Compression, write_rows
 
 
+@lru_cache(maxsize=None)
 def v_error_cal(vx_error, vy_error):
-    vx = np.random.normal(0, vx_error, 1000000)
-    vy = np.random.normal(0, vy_error, 1000000)
-    v = np.sqrt(vx**2 + vy**2)
-    return np.std(v)
+    """Standard deviation of the speed sqrt(vx**2 + vy**2), for independent zero-mean normal errors in vx and vy
+
+    The speed follows a Hoyt distribution, whose mean is sqrt(2/pi) * a * E(1 - b**2/a**2), where a >= b are the
+    standard deviations of the errors and E is the complete elliptic integral of the second kind, and whose
+    second moment is a**2 + b**2. This replaces a (nondeterministic) Monte Carlo estimate from 1,000,000 samples.
+    """
+    a, b = sorted((abs(float(vx_error)), abs(float(vy_error))), reverse=True)
+    if a == 0:
+        return 0.0
+    mean = np.sqrt(2 / np.pi) * a * ellipe(1 - (b / a) ** 2)
+    return float(np.sqrt(max(a ** 2 + b ** 2 - mean ** 2, 0.0)))
+
+
+def _to_int16(block):
+    return np.round(np.clip(block, -32768, 32767)).astype(np.int16)
+
+
+def _to_uint16(block):
+    return np.round(np.clip(block, 0, 65535)).astype('uint16')
+
+
+def _to_uint8(block):
+    return np.round(np.clip(block, 0, 255)).astype('uint8')
 
 
 def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1, SX, SY,
                      offset2vx_1, offset2vx_2, offset2vy_1, offset2vy_2, MM, VXref, VYref,
                      rangePixelSize, azimuthPixelSize, dt, epsg, srs, tran, out_nc_filename, pair_type,
                      detection_method, coordinates, IMG_INFO_DICT, stable_count, stable_count1, stable_shift_applied,
-                     dx_mean_shift, dy_mean_shift, dx_mean_shift1, dy_mean_shift1, error_vector, parameter_file):
-    vx_mean_shift = offset2vx_1 * dx_mean_shift + offset2vx_2 * dy_mean_shift
-    temp = vx_mean_shift
-    temp[np.logical_not(SSM)] = np.nan
-    vx_mean_shift = np.median(temp[np.logical_not(np.isnan(temp))])
-    vy_mean_shift = offset2vy_1 * dx_mean_shift + offset2vy_2 * dy_mean_shift
-    temp = vy_mean_shift
-    temp[np.logical_not(SSM)] = np.nan
-    vy_mean_shift = np.median(temp[np.logical_not(np.isnan(temp))])
+                     dx_mean_shift, dy_mean_shift, dx_mean_shift1, dy_mean_shift1, error_vector, parameter_file,
+                     compression=None):
+    # statistics over the stable surface masks are of values gathered inside them, rather than of full-grid copies
+    stable = MaskedStatistics({'SSM': SSM, 'SSM1': SSM1})
+    error_bounds = (-500, 500)
+
+    offset2vx_1_stable = stable.gather(offset2vx_1)
+    offset2vx_2_stable = stable.gather(offset2vx_2)
+    offset2vy_1_stable = stable.gather(offset2vy_1)
+    offset2vy_2_stable = stable.gather(offset2vy_2)
+
+    vx_mean_shift = stable.median(offset2vx_1_stable * dx_mean_shift + offset2vx_2_stable * dy_mean_shift, 'SSM')
+    vy_mean_shift = stable.median(offset2vy_1_stable * dx_mean_shift + offset2vy_2_stable * dy_mean_shift, 'SSM')
 
+    vx_mean_shift1 = stable.median(offset2vx_1_stable * dx_mean_shift1 + offset2vx_2_stable * dy_mean_shift1, 'SSM1')
+    vy_mean_shift1 = stable.median(offset2vy_1_stable * dx_mean_shift1 + offset2vy_2_stable * dy_mean_shift1, 'SSM1')
 
-    vx_mean_shift1 = offset2vx_1 * dx_mean_shift1 + offset2vx_2 * dy_mean_shift1
-    temp = vx_mean_shift1
-    temp[np.logical_not(SSM1)] = np.nan
-    vx_mean_shift1 = np.median(temp[np.logical_not(np.isnan(temp))])
-    vy_mean_shift1 = offset2vy_1 * dx_mean_shift1 + offset2vy_2 * dy_mean_shift1
-    temp = vy_mean_shift1
-    temp[np.logical_not(SSM1)] = np.nan
-    vy_mean_shift1 = np.median(temp[np.logical_not(np.isnan(temp))])
+    del offset2vx_1_stable, offset2vx_2_stable, offset2vy_1_stable, offset2vy_2_stable
 
 
 
@@ -100,8 +123,8 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         VXPP = VX.copy()
         VYPP = VY.copy()
 
-        stable_count_p = np.sum(SSM & np.logical_not(np.isnan(VXP)))
-        stable_count1_p = np.sum(SSM1 & np.logical_not(np.isnan(VXP)))
+        stable_count_p = stable.count('SSM', stable.gather(VXP))
+        stable_count1_p = stable.count('SSM1', stable.gather(VXP))
 
         vxp_mean_shift = 0.0
         vyp_mean_shift = 0.0
@@ -109,25 +132,17 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         vyp_mean_shift1 = 0.0
 
         if stable_count_p != 0:
-            temp = VXP.copy() - VX.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            bias_mean_shift = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift = stable.median(stable.gather(VXP, VX), 'SSM', error_bounds)
             vxp_mean_shift = vx_mean_shift + bias_mean_shift / 2
 
-            temp = VYP.copy() - VY.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            bias_mean_shift = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift = stable.median(stable.gather(VYP, VY), 'SSM', error_bounds)
             vyp_mean_shift = vy_mean_shift + bias_mean_shift / 2
 
         if stable_count1_p != 0:
-            temp = VXP.copy() - VX.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            bias_mean_shift1 = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift1 = stable.median(stable.gather(VXP, VX), 'SSM1', error_bounds)
             vxp_mean_shift1 = vx_mean_shift1 + bias_mean_shift1 / 2
 
-            temp = VYP.copy() - VY.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            bias_mean_shift1 = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift1 = stable.median(stable.gather(VYP, VY), 'SSM1', error_bounds)
             vyp_mean_shift1 = vy_mean_shift1 + bias_mean_shift1 / 2
 
         if stable_count_p == 0:
@@ -216,8 +231,12 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     nc_outfile.createDimension('y',dimidY)
     x = np.arange(tran[0],tran[0]+tran[1]*(dimidX),tran[1])
     y = np.arange(tran[3],tran[3]+tran[5]*(dimidY),tran[5])
-    chunk_lines = np.min([np.ceil(8192/dimidY)*128, dimidY])
-    ChunkSize = [chunk_lines, dimidX]
+    # image variables are chunked and compressed as configured (see hyp3_autorift.netcdf_writer), and written a
+    # block of whole chunks at a time
+    if compression is None:
+        compression = Compression.from_env()
+    image_kwargs = compression.variable_kwargs(nc_outfile, VX.shape)
+    block_lines = image_kwargs['chunksizes'][0]
 
 
     varname='x'
@@ -293,7 +312,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     datatype=np.dtype('int16')
     dimensions=('y','x')
     FillValue=NoDataValue
-    var = nc_outfile.createVariable(varname,datatype,dimensions, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize, fill_value=FillValue)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
 
     var.setncattr('standard_name','x_velocity')
@@ -305,15 +324,11 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
 
     if stable_count != 0:
-        temp = VX.copy()
-        temp[np.logical_not(SSM)] = np.nan
-        vx_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+        vx_error_mask = stable.std(stable.gather(VX), 'SSM', error_bounds)
     else:
         vx_error_mask = np.nan
     if stable_count1 != 0:
-        temp = VX.copy()
-        temp[np.logical_not(SSM1)] = np.nan
-        vx_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+        vx_error_slow = stable.std(stable.gather(VX), 'SSM1', error_bounds)
     else:
         vx_error_slow = np.nan
     if pair_type is 'radar':
@@ -361,14 +376,14 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     var.setncattr('grid_mapping',mapping_name)
 
     VX[noDataMask] = NoDataValue
-    var[:] = np.round(np.clip(VX, -32768, 32767)).astype(np.int16)
+    write_rows(var, VX, _to_int16, block_lines)
 #    var.setncattr('_FillValue',np.int16(FillValue))
 
     varname='vy'
     datatype=np.dtype('int16')
     dimensions=('y','x')
     FillValue=NoDataValue
-    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
     var.setncattr('standard_name','y_velocity')
     if pair_type is 'radar':
@@ -379,15 +394,11 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
 
     if stable_count != 0:
-        temp = VY.copy()
-        temp[np.logical_not(SSM)] = np.nan
-        vy_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+        vy_error_mask = stable.std(stable.gather(VY), 'SSM', error_bounds)
     else:
         vy_error_mask = np.nan
     if stable_count1 != 0:
-        temp = VY.copy()
-        temp[np.logical_not(SSM1)] = np.nan
-        vy_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+        vy_error_slow = stable.std(stable.gather(VY), 'SSM1', error_bounds)
     else:
         vy_error_slow = np.nan
     if pair_type is 'radar':
@@ -437,7 +448,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     var.setncattr('grid_mapping',mapping_name)
 
     VY[noDataMask] = NoDataValue
-    var[:] = np.round(np.clip(VY, -32768, 32767)).astype(np.int16)
+    write_rows(var, VY, _to_int16, block_lines)
 #    var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -447,7 +458,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     datatype=np.dtype('int16')
     dimensions=('y','x')
     FillValue=NoDataValue
-    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
     var.setncattr('standard_name','velocity')
     if pair_type is 'radar':
         var.setncattr('description','velocity magnitude from radar range and azimuth measurements')
@@ -458,7 +469,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     var.setncattr('grid_mapping',mapping_name)
 
     V[noDataMask] = NoDataValue
-    var[:] = np.round(np.clip(V, -32768, 32767)).astype(np.int16)
+    write_rows(var, V, _to_int16, block_lines)
 #    var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -469,7 +480,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     datatype=np.dtype('int16')
     dimensions=('y','x')
     FillValue=NoDataValue
-    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
     var.setncattr('standard_name','velocity_error')
     if pair_type is 'radar':
         var.setncattr('description','velocity magnitude error from radar range and azimuth measurements')
@@ -482,7 +493,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     V_error = np.sqrt((vx_error * VX / V)**2 + (vy_error * VY / V)**2)
     V_error[V==0] = v_error
     V_error[noDataMask] = NoDataValue
-    var[:] = np.round(np.clip(V_error, -32768, 32767)).astype(np.int16)
+    write_rows(var, V_error, _to_int16, block_lines)
 #    var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -495,7 +506,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         datatype=np.dtype('int16')
         dimensions=('y','x')
         FillValue=NoDataValue
-        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
 
         var.setncattr('standard_name','range_velocity')
@@ -503,15 +514,11 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('units','m/y')
 
         if stable_count != 0:
-            temp = VR.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            vr_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+            vr_error_mask = stable.std(stable.gather(VR), 'SSM', error_bounds)
         else:
             vr_error_mask = np.nan
         if stable_count1 != 0:
-            temp = VR.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            vr_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+            vr_error_slow = stable.std(stable.gather(VR), 'SSM1', error_bounds)
         else:
             vr_error_slow = np.nan
         vr_error_mod = (error_vector[0][2]*IMG_INFO_DICT['date_dt']+error_vector[1][2])/IMG_INFO_DICT['date_dt']*365
@@ -558,7 +565,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('grid_mapping',mapping_name)
 
         VR[noDataMask] = NoDataValue
-        var[:] = np.round(np.clip(VR, -32768, 32767)).astype(np.int16)
+        write_rows(var, VR, _to_int16, block_lines)
 #        var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -567,7 +574,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         datatype=np.dtype('int16')
         dimensions=('y','x')
         FillValue=NoDataValue
-        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
 
         var.setncattr('standard_name','azimuth_velocity')
@@ -576,15 +583,11 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
 
         if stable_count != 0:
-            temp = VA.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            va_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+            va_error_mask = stable.std(stable.gather(VA), 'SSM', error_bounds)
         else:
             va_error_mask = np.nan
         if stable_count1 != 0:
-            temp = VA.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            va_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+            va_error_slow = stable.std(stable.gather(VA), 'SSM1', error_bounds)
         else:
             va_error_slow = np.nan
         va_error_mod = (error_vector[0][3]*IMG_INFO_DICT['date_dt']+error_vector[1][3])/IMG_INFO_DICT['date_dt']*365
@@ -631,7 +634,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('grid_mapping',mapping_name)
 
         VA[noDataMask] = NoDataValue
-        var[:] = np.round(np.clip(VA, -32768, 32767)).astype(np.int16)
+        write_rows(var, VA, _to_int16, block_lines)
 #        var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -640,21 +643,13 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
         # fuse the (slope parallel & reference) flow-based range-projected result with the raw observed range/azimuth-based result
         if stable_count_p != 0:
-            temp = VXP.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            vxp_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+            vxp_error_mask = stable.std(stable.gather(VXP), 'SSM', error_bounds)
 
-            temp = VYP.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            vyp_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+            vyp_error_mask = stable.std(stable.gather(VYP), 'SSM', error_bounds)
         if stable_count1_p != 0:
-            temp = VXP.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            vxp_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+            vxp_error_slow = stable.std(stable.gather(VXP), 'SSM1', error_bounds)
 
-            temp = VYP.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            vyp_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+            vyp_error_slow = stable.std(stable.gather(VYP), 'SSM1', error_bounds)
         vxp_error_mod = (error_vector[0][4]*IMG_INFO_DICT['date_dt']+error_vector[1][4])/IMG_INFO_DICT['date_dt']*365
         vyp_error_mod = (error_vector[0][5]*IMG_INFO_DICT['date_dt']+error_vector[1][5])/IMG_INFO_DICT['date_dt']*365
 
@@ -676,8 +671,8 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         VYP = VYPP.astype(np.float32)
         VP = np.sqrt(VXP**2+VYP**2)
 
-        stable_count_p = np.sum(SSM & np.logical_not(np.isnan(VXP)))
-        stable_count1_p = np.sum(SSM1 & np.logical_not(np.isnan(VXP)))
+        stable_count_p = stable.count('SSM', stable.gather(VXP))
+        stable_count1_p = stable.count('SSM1', stable.gather(VXP))
 
         vxp_mean_shift = 0.0
         vyp_mean_shift = 0.0
@@ -685,25 +680,17 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         vyp_mean_shift1 = 0.0
 
         if stable_count_p != 0:
-            temp = VXP.copy() - VX.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            bias_mean_shift = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift = stable.median(stable.gather(VXP, VX), 'SSM', error_bounds)
             vxp_mean_shift = vx_mean_shift + bias_mean_shift / 2
 
-            temp = VYP.copy() - VY.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            bias_mean_shift = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift = stable.median(stable.gather(VYP, VY), 'SSM', error_bounds)
             vyp_mean_shift = vy_mean_shift + bias_mean_shift / 2
 
         if stable_count1_p != 0:
-            temp = VXP.copy() - VX.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            bias_mean_shift1 = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift1 = stable.median(stable.gather(VXP, VX), 'SSM1', error_bounds)
             vxp_mean_shift1 = vx_mean_shift1 + bias_mean_shift1 / 2
 
-            temp = VYP.copy() - VY.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            bias_mean_shift1 = np.median(temp[(temp > -500)&(temp < 500)])
+            bias_mean_shift1 = stable.median(stable.gather(VYP, VY), 'SSM1', error_bounds)
             vyp_mean_shift1 = vy_mean_shift1 + bias_mean_shift1 / 2
 
         if stable_count_p == 0:
@@ -723,7 +710,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         datatype=np.dtype('int16')
         dimensions=('y','x')
         FillValue=NoDataValue
-        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
 
         var.setncattr('standard_name','projected_x_velocity')
@@ -732,15 +719,11 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
 
         if stable_count_p != 0:
-            temp = VXP.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            vxp_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+            vxp_error_mask = stable.std(stable.gather(VXP), 'SSM', error_bounds)
         else:
             vxp_error_mask = np.nan
         if stable_count1_p != 0:
-            temp = VXP.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            vxp_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+            vxp_error_slow = stable.std(stable.gather(VXP), 'SSM1', error_bounds)
         else:
             vxp_error_slow = np.nan
         if stable_shift_applied_p == 1:
@@ -786,7 +769,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('grid_mapping',mapping_name)
 
         VXP[noDataMask] = NoDataValue
-        var[:] = np.round(np.clip(VXP, -32768, 32767)).astype(np.int16)
+        write_rows(var, VXP, _to_int16, block_lines)
 #        var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -798,7 +781,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         datatype=np.dtype('int16')
         dimensions=('y','x')
         FillValue=NoDataValue
-        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
 
         var.setncattr('standard_name','projected_y_velocity')
@@ -807,15 +790,11 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
 
         if stable_count_p != 0:
-            temp = VYP.copy()
-            temp[np.logical_not(SSM)] = np.nan
-            vyp_error_mask = np.std(temp[(temp > -500)&(temp < 500)])
+            vyp_error_mask = stable.std(stable.gather(VYP), 'SSM', error_bounds)
         else:
             vyp_error_mask = np.nan
         if stable_count1_p != 0:
-            temp = VYP.copy()
-            temp[np.logical_not(SSM1)] = np.nan
-            vyp_error_slow = np.std(temp[(temp > -500)&(temp < 500)])
+            vyp_error_slow = stable.std(stable.gather(VYP), 'SSM1', error_bounds)
         else:
             vyp_error_slow = np.nan
         if stable_shift_applied_p == 1:
@@ -861,7 +840,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('grid_mapping',mapping_name)
 
         VYP[noDataMask] = NoDataValue
-        var[:] = np.round(np.clip(VYP, -32768, 32767)).astype(np.int16)
+        write_rows(var, VYP, _to_int16, block_lines)
 #        var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -872,7 +851,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         datatype=np.dtype('int16')
         dimensions=('y','x')
         FillValue=NoDataValue
-        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
         var.setncattr('standard_name','projected_velocity')
         var.setncattr('description','velocity magnitude determined by projecting radar range measurements onto an a priori flow vector. Where projected errors are larger than those determined from range and azimuth measurements, unprojected v estimates are used')
         var.setncattr('units','m/y')
@@ -880,7 +859,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('grid_mapping',mapping_name)
 
         VP[noDataMask] = NoDataValue
-        var[:] = np.round(np.clip(VP, -32768, 32767)).astype(np.int16)
+        write_rows(var, VP, _to_int16, block_lines)
 #        var.setncattr('missing_value',np.int16(NoDataValue))
 
 
@@ -892,7 +871,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         datatype=np.dtype('int16')
         dimensions=('y','x')
         FillValue=NoDataValue
-        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+        var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
         var.setncattr('standard_name','projected_velocity_error')
         var.setncattr('description','velocity magnitude error determined by projecting radar range measurements onto an a priori flow vector. Where projected errors are larger than those determined from range and azimuth measurements, unprojected v_error estimates are used')
         var.setncattr('units','m/y')
@@ -902,14 +881,14 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         VP_error = np.sqrt((vxp_error * VXP / VP)**2 + (vyp_error * VYP / VP)**2)
         VP_error[VP==0] = vp_error
         VP_error[noDataMask] = NoDataValue
-        var[:] = np.round(np.clip(VP_error, -32768, 32767)).astype(np.int16)
+        write_rows(var, VP_error, _to_int16, block_lines)
 #        var.setncattr('missing_value',np.int16(NoDataValue))
 
     varname='chip_size_width'
     datatype=np.dtype('uint16')
     dimensions=('y','x')
     FillValue=0
-    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
     var.setncattr('standard_name','chip_size_width')
     var.setncattr('description','width of search window')
@@ -923,7 +902,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
         var.setncattr('chip_size_coordinates','image projection geometry: width = x, height = y')
 
     var.setncattr('grid_mapping',mapping_name)
-    var[:] = np.round(np.clip(CHIPSIZEX, 0, 65535)).astype('uint16')
+    write_rows(var, CHIPSIZEX, _to_uint16, block_lines)
 
 
 
@@ -933,7 +912,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     datatype=np.dtype('uint16')
     dimensions=('y','x')
     FillValue=0
-    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
     var.setncattr('standard_name','chip_size_height')
     var.setncattr('description','height of search window')
@@ -948,7 +927,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
     var.setncattr('grid_mapping',mapping_name)
 
-    var[:] = np.round(np.clip(CHIPSIZEY, 0, 65535)).astype('uint16')
+    write_rows(var, CHIPSIZEY, _to_uint16, block_lines)
 
 
 
@@ -958,7 +937,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
     datatype=np.dtype('uint8')
     dimensions=('y','x')
     FillValue=None
-    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, zlib=True, complevel=2, shuffle=True, chunksizes=ChunkSize)
+    var = nc_outfile.createVariable(varname,datatype,dimensions, fill_value=FillValue, **image_kwargs)
 
     var.setncattr('standard_name','interpolated_value_mask')
     var.setncattr('description','light interpolation mask')
@@ -966,7 +945,7 @@ def netCDF_packaging(VX, VY, DX, DY, INTERPMASK, CHIPSIZEX, CHIPSIZEY, SSM, SSM1
 
     var.setncattr('grid_mapping',mapping_name)
 
-    var[:] = np.round(np.clip(INTERPMASK, 0, 255)).astype('uint8')
+    write_rows(var, INTERPMASK, _to_uint8, block_lines)
 
     nc_outfile.sync() # flush data to disk
     nc_outfile.close()
@@ -0,0 +1,112 @@
+"""Chunking and compression of the netCDF product's image variables, and writing them a block of rows at a time
+
+The compression filter, its level, and the chunk shape of the image variables can be set per deployment with
+environment variables:
+
+* `HYP3_AUTORIFT_NC_COMPRESSION`: one of `COMPRESSIONS` (default: `zlib`). Filters other than `zlib` need
+  netCDF4 >= 1.6 built with (or with an HDF5 plugin for) the filter; if it isn't available, `zlib` is used instead
+* `HYP3_AUTORIFT_NC_COMPLEVEL`: compression level (default: 2)
+* `HYP3_AUTORIFT_NC_CHUNK_SIZE`: chunk shape as `lines` or `lines,columns` (default: full-width chunks of
+  `default_chunk_lines` lines)
+"""
+
+import logging
+import math
+import os
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+COMPRESSION_ENV = 'HYP3_AUTORIFT_NC_COMPRESSION'
+COMPLEVEL_ENV = 'HYP3_AUTORIFT_NC_COMPLEVEL'
+CHUNK_SIZE_ENV = 'HYP3_AUTORIFT_NC_CHUNK_SIZE'
+
+COMPRESSIONS = ('none', 'zlib', 'zstd', 'bzip2', 'blosc_lz4', 'blosc_zstd')
+DEFAULT_COMPRESSION = 'zlib'
+DEFAULT_COMPLEVEL = 2
+
+
+def default_chunk_lines(lines: int) -> int:
+    """Lines in the default, full-width, chunks of a product with this many lines"""
+    return int(min(math.ceil(8192 / lines) * 128, lines))
+
+
+@dataclass(frozen=True)
+class Compression:
+    """How the image variables of a product are chunked and compressed
+
+    Args:
+        compression: Compression filter (one of `COMPRESSIONS`)
+        complevel: Compression level
+        chunk_lines: Lines in each chunk (default: `default_chunk_lines`)
+        chunk_columns: Columns in each chunk (default: the full width)
+    """
+    compression: str = DEFAULT_COMPRESSION
+    complevel: int = DEFAULT_COMPLEVEL
+    chunk_lines: Optional[int] = None
+    chunk_columns: Optional[int] = None
+
+    def __post_init__(self):
+        if self.compression not in COMPRESSIONS:
+            raise ValueError(f'netCDF compression must be one of {COMPRESSIONS}, not {self.compression!r}')
+
+    @classmethod
+    def from_env(cls) -> 'Compression':
+        """Compression set by the `HYP3_AUTORIFT_NC_*` environment variables"""
+        chunk_size = os.environ.get(CHUNK_SIZE_ENV)
+        chunk_lines, chunk_columns = None, None
+        if chunk_size:
+            chunk_lines, _, chunk_columns = chunk_size.partition(',')
+            chunk_lines = int(chunk_lines)
+            chunk_columns = int(chunk_columns) if chunk_columns else None
+        return cls(
+            compression=os.environ.get(COMPRESSION_ENV, DEFAULT_COMPRESSION),
+            complevel=int(os.environ.get(COMPLEVEL_ENV, DEFAULT_COMPLEVEL)),
+            chunk_lines=chunk_lines,
+            chunk_columns=chunk_columns,
+        )
+
+    def chunk_sizes(self, shape: Sequence[int]) -> List[int]:
+        """Chunk shape of an image variable, clipped to its shape"""
+        lines, columns = shape
+        chunk_lines = default_chunk_lines(lines) if self.chunk_lines is None else self.chunk_lines
+        chunk_columns = columns if self.chunk_columns is None else self.chunk_columns
+        return [max(1, min(chunk_lines, lines)), max(1, min(chunk_columns, columns))]
+
+    def variable_kwargs(self, dataset, shape: Sequence[int]) -> dict:
+        """Keyword arguments for `netCDF4.Dataset.createVariable` to create an image variable with
+
+        Args:
+            dataset: The `netCDF4.Dataset` the variable is created in, to check the filter is available in
+            shape: Shape of the variable
+        """
+        kwargs = {'chunksizes': self.chunk_sizes(shape)}
+        if self.compression == 'none':
+            return kwargs
+
+        if self.compression != 'zlib':
+            has_filter = getattr(dataset, f'has_{self.compression.split("_")[0]}_filter', None)
+            if has_filter is not None and has_filter():
+                return {'compression': self.compression, 'complevel': self.complevel, 'shuffle': True, **kwargs}
+            log.warning(f'netCDF compression filter {self.compression} is not available; using zlib')
+
+        return {'zlib': True, 'complevel': self.complevel, 'shuffle': True, **kwargs}
+
+
+def write_rows(variable, array: np.ndarray, convert: Callable[[np.ndarray], np.ndarray], block_lines: int):
+    """Convert an image into a variable's data type and write it a block of rows at a time
+
+    Blocks of a whole number of chunk lines fill whole chunks, so each chunk is compressed and written once, and
+    only a block of the converted image is in memory at a time.
+
+    Args:
+        variable: The `netCDF4.Variable` to write to
+        array: The image to write
+        convert: Function converting a block of the image into the variable's data type
+        block_lines: Lines in each block
+    """
+    for start in range(0, array.shape[0], block_lines):
+        variable[start:start + block_lines] = convert(array[start:start + block_lines])
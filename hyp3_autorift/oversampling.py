@@ -0,0 +1,44 @@
+"""Policies for the oversampling ratio autoRIFT refines offsets to subpixel precision with
+
+Subpixel refinement oversamples the correlation surface around each chip's integer-pixel peak, and dominates
+autoRIFT's runtime. The `default` policy is autoRIFT's own choice: a ratio for each chip size, determined by
+comparing the results of combinations of ratio and chip size against those of the largest ratio (128) and
+chip size, over a stable region of Greenland. The `fast` policy halves each ratio, and the `accurate` policy uses
+the largest ratio for every chip size.
+"""
+
+from typing import Dict, Union
+
+POLICIES = ('fast', 'default', 'accurate')
+
+# Oversampling ratio without chip-size-dependent search (i.e., without chip size rasters)
+SCALAR_RATIOS = {'fast': 32, 'default': 64, 'accurate': 128}
+
+# Oversampling ratios for chip sizes ChipSize0X * [1, 2, 4, 8], for optical and radar images
+CHIP_SIZE_RATIOS = {
+    'fast': {'optical': (8, 16, 32, 32), 'radar': (16, 32, 64, 64)},
+    'default': {'optical': (16, 32, 64, 64), 'radar': (32, 64, 128, 128)},
+    'accurate': {'optical': (128, 128, 128, 128), 'radar': (128, 128, 128, 128)},
+}
+
+
+def oversample_ratio(policy: str = 'default', optical: bool = True,
+                     chip_size0: Union[int, None] = None) -> Union[int, Dict[int, int]]:
+    """Oversampling ratio to assign to autoRIFT's `OverSampleRatio`
+
+    Args:
+        policy: Oversampling policy (one of `POLICIES`)
+        optical: Whether the images are optical, rather than radar, images
+        chip_size0: Smallest chip size (autoRIFT's `ChipSize0X`), if the chip size depends on location
+
+    Returns:
+        ratio: The ratio, or if `chip_size0` is given, a dictionary of the ratio for each chip size
+    """
+    if policy not in POLICIES:
+        raise ValueError(f'Oversampling policy must be one of {POLICIES}, not {policy!r}')
+
+    if chip_size0 is None:
+        return SCALAR_RATIOS[policy]
+
+    ratios = CHIP_SIZE_RATIOS[policy]['optical' if optical else 'radar']
+    return {chip_size0 * multiple: ratio for multiple, ratio in zip((1, 2, 4, 8), ratios)}
@@ -0,0 +1,189 @@
+"""Plan an autoRIFT run: resolve its inputs and estimate its cost, without downloading or processing the scenes
+
+Only metadata is read: the STAC items of optical scenes or the annotations of Sentinel-1 scenes (with HTTP range
+requests), the parameter shapefile, and the search range raster's window over the scene.
+"""
+
+import json
+import logging
+from typing import List, Optional, Tuple
+
+import numpy as np
+from hyp3lib.scene import get_download_url
+from osgeo import gdal
+from osgeo import ogr
+from osgeo import osr
+
+from hyp3_autorift import geometry, io, raster, safe, tiling
+from hyp3_autorift.process import DEFAULT_PARAMETER_FILE, get_optical_scene, get_platform, get_s1_primary_polarization
+
+log = logging.getLogger(__name__)
+
+gdal.UseExceptions()
+
+# Rough cost model; adjust to the instance types runs are scheduled on
+SECONDS_PER_CHIP = 2e-3
+DOWNLOAD_BYTES_PER_SECOND = 50e6
+# autoRIFT's per-grid-point inputs (image locations, search ranges, chip sizes, ...) and outputs
+GRID_BYTES_PER_POINT = 256
+
+
+def lonlat_srs() -> osr.SpatialReference:
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+    return srs
+
+
+def footprint_from_points(points: List[Tuple[float, float]]) -> ogr.Geometry:
+    """Footprint (lon, lat polygon) of a scene from the (latitude, longitude) of points covering it"""
+    multipoint = ogr.Geometry(ogr.wkbMultiPoint)
+    for lat, lon in points:
+        point = ogr.Geometry(ogr.wkbPoint)
+        point.AddPoint_2D(lon, lat)
+        multipoint.AddGeometry(point)
+
+    footprint = multipoint.ConvexHull()
+    footprint.AssignSpatialReference(lonlat_srs())
+    return footprint
+
+
+def footprint_from_geojson(geojson: dict) -> ogr.Geometry:
+    """Footprint (lon, lat polygon) of a scene from its STAC item's geometry"""
+    footprint = ogr.CreateGeometryFromJson(json.dumps(geojson))
+    footprint.AssignSpatialReference(lonlat_srs())
+    return footprint
+
+
+def geogrid_window(footprint: ogr.Geometry, search_range: str) -> dict:
+    """Find the Geogrid window of a scene and count the chips autoRIFT will search
+
+    The Geogrid grid is the window of the parameter rasters (which share a grid with the DEM) covering the scene.
+    Chips are searched at the grid points inside the scene's footprint with a positive search range.
+
+    Args:
+        footprint: Footprint of the scene
+        search_range: Path to the (x) search range parameter raster
+
+    Returns:
+        grid: Offset (`xoff`, `yoff`), dimensions (`rows`, `columns`), and number of `valid_chips` of the window
+    """
+    ds = gdal.Open(search_range)
+    geotransform = ds.GetGeoTransform()
+    srs = ds.GetSpatialRef()
+    srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)
+
+    projected = footprint.Clone()
+    projected.TransformTo(srs)
+    x_min, x_max, y_min, y_max = projected.GetEnvelope()
+
+    xoff = max(int(np.floor((x_min - geotransform[0]) / geotransform[1])), 0)
+    xend = min(int(np.ceil((x_max - geotransform[0]) / geotransform[1])), ds.RasterXSize)
+    yoff = max(int(np.floor((y_max - geotransform[3]) / geotransform[5])), 0)
+    yend = min(int(np.ceil((y_min - geotransform[3]) / geotransform[5])), ds.RasterYSize)
+    columns, rows = max(xend - xoff, 0), max(yend - yoff, 0)
+    del ds
+
+    valid_chips = 0
+    if rows and columns:
+        mask_ds = gdal.GetDriverByName('MEM').Create('', columns, rows, 1, gdal.GDT_Byte)
+        mask_ds.SetGeoTransform((geotransform[0] + xoff * geotransform[1], geotransform[1], 0,
+                                 geotransform[3] + yoff * geotransform[5], 0, geotransform[5]))
+        mask_ds.SetSpatialRef(srs)
+
+        vector_ds = ogr.GetDriverByName('Memory').CreateDataSource('')
+        layer = vector_ds.CreateLayer('footprint', srs=srs)
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetGeometry(projected)
+        layer.CreateFeature(feature)
+        gdal.RasterizeLayer(mask_ds, [1], layer, burn_values=[1])
+
+        inside = mask_ds.GetRasterBand(1).ReadAsArray().astype(bool)
+        searched = raster.read_window(search_range, xoff, yoff, columns, rows) > 0
+        valid_chips = int(np.count_nonzero(inside & searched))
+
+    return {'xoff': xoff, 'yoff': yoff, 'rows': rows, 'columns': columns, 'valid_chips': valid_chips}
+
+
+def estimate_peak_memory(image_pixels: int, grid_points: int, memory_limit: Optional[float] = None,
+                         workers: int = 1) -> int:
+    """Estimate the peak memory, in bytes, of running autoRIFT
+
+    Args:
+        image_pixels: Number of pixels in each image
+        grid_points: Number of points in the Geogrid grid
+        memory_limit: Approximate memory limit, in GB, for running autoRIFT in tiles (for each worker)
+        workers: Number of processes to run autoRIFT with
+    """
+    image_bytes = image_pixels * tiling.BYTES_PER_PIXEL
+    if memory_limit is not None:
+        image_bytes = min(image_bytes, int(memory_limit * 2**30) * workers)
+    return image_bytes + grid_points * GRID_BYTES_PER_POINT
+
+
+def estimate_runtime(valid_chips: int, download_bytes: int, workers: int = 1) -> float:
+    """Estimate the runtime, in seconds, of downloading the scenes and searching the chips"""
+    return valid_chips * SECONDS_PER_CHIP / workers + download_bytes / DOWNLOAD_BYTES_PER_SECOND
+
+
+def plan(reference: str, secondary: str, parameter_file: str = DEFAULT_PARAMETER_FILE, band: str = 'B08',
+         memory_limit: Optional[float] = None, workers: int = 1) -> dict:
+    """Plan processing a Sentinel-1, Sentinel-2, or Landsat-8 image pair
+
+    Args:
+        reference: Name of the reference Sentinel-1, Sentinel-2, or Landsat-8 Collection 2 scene
+        secondary: Name of the secondary Sentinel-1, Sentinel-2, or Landsat-8 Collection 2 scene
+        parameter_file: Shapefile for determining the correct search parameters by geographic location
+        band: Band to process for Sentinel-2 or Landsat-8 Collection 2 scenes
+        memory_limit: Approximate memory limit, in GB, for running autoRIFT in tiles (for each worker)
+        workers: Number of processes to run autoRIFT with
+
+    Returns:
+        plan: JSON-serializable plan, with the parameter region, EPSG code, Geogrid grid, number of valid chips,
+            bytes to download, and estimated runtime (seconds) and peak memory (bytes)
+    """
+    platform = get_platform(reference)
+    if platform == 'S1':
+        polarization = get_s1_primary_polarization(reference)
+        annotations = safe.read_annotations(get_download_url(reference), polarization)
+        footprint = footprint_from_points(safe.geolocation_grid(annotations))
+        lines, samples = safe.image_size(annotations)
+        image_pixels = lines * samples
+        download_bytes = sum(safe.HttpRangeFile(get_download_url(scene)).size for scene in (reference, secondary))
+    else:
+        if platform == 'L' and band == 'B08':
+            band = 'B8'
+        reference_metadata, reference_path = get_optical_scene(platform, reference, band)
+        _, secondary_path = get_optical_scene(platform, secondary, band)
+        footprint = footprint_from_geojson(reference_metadata['geometry'])
+        ds = gdal.Open(reference_path)
+        image_pixels = ds.RasterXSize * ds.RasterYSize
+        del ds
+        download_bytes = sum(gdal.VSIStatL(path).size for path in (reference_path, secondary_path))
+
+    lon_min, lon_max, lat_min, lat_max = footprint.GetEnvelope()
+    lat_limits, lon_limits = (lat_min, lat_max), (lon_min, lon_max)
+    scene_poly = geometry.polygon_from_bbox(x_limits=lat_limits, y_limits=lon_limits)
+    parameter_info = io.find_jpl_parameter_info(scene_poly, parameter_file)
+
+    grid = geogrid_window(footprint, parameter_info['geogrid']['srx'])
+    grid['pixel_size'] = parameter_info['xsize']
+
+    run_plan = {
+        'reference': reference,
+        'secondary': secondary,
+        'platform': platform,
+        'lat_limits': list(lat_limits),
+        'lon_limits': list(lon_limits),
+        'parameter_region': parameter_info['name'],
+        'epsg': int(parameter_info['epsg']),
+        'grid': grid,
+        'image_pixels': image_pixels,
+        'download_bytes': download_bytes,
+        'estimated_runtime': estimate_runtime(grid['valid_chips'], download_bytes, workers),
+        'estimated_peak_memory': estimate_peak_memory(image_pixels, grid['rows'] * grid['columns'],
+                                                      memory_limit, workers),
+    }
+    log.info(f'Planned {reference} and {secondary}: {grid["valid_chips"]} valid chips in the '
+             f'{parameter_info["name"]} region')
+    return run_plan
@@ -0,0 +1,82 @@
+"""Cache of preprocessed optical images, shared by the pairs a scene is in
+
+autoRIFT preprocesses each image of a pair independently (a high-pass filter, then conversion to a uniform data
+type), so a scene's preprocessed image can be reused by every other pair it's in, as long as the same window of it
+is processed with the same parameters. Preprocessed images are stored, with the mask of the raw image's non-zero
+pixels, as `.npy` files in the blob cache (see `hyp3_autorift.cache`), and are memory-mapped when reused.
+
+Caching only pays off when a scene is in several pairs processed on the same host, so the cache is opt-in: it's
+enabled by setting the `HYP3_AUTORIFT_PREPROCESSING_CACHE` environment variable to `true`, as `hyp3_autorift batch`
+does by default.
+"""
+
+import json
+import logging
+import os
+from hashlib import sha256
+from pathlib import Path
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from hyp3_autorift import cache
+
+log = logging.getLogger(__name__)
+
+PREPROCESSING_CACHE_ENV = 'HYP3_AUTORIFT_PREPROCESSING_CACHE'
+
+# Increment when preprocessing changes, to invalidate previously cached images
+PREPROCESSING_VERSION = 1
+
+IMAGE_FILE = 'image.npy'
+VALID_FILE = 'valid.npy'
+
+
+def is_enabled() -> bool:
+    """The preprocessing cache is enabled by `HYP3_AUTORIFT_PREPROCESSING_CACHE`, unless the blob cache's size is 0"""
+    enabled = os.environ.get(PREPROCESSING_CACHE_ENV, '').lower() in ('1', 'true', 'yes')
+    return enabled and cache.get_cache_size() > 0
+
+
+def cache_key(path: str, window: Sequence[int], parameters: dict) -> str:
+    """Key a preprocessed image by its scene and band, the window of it processed, and the preprocessing parameters
+
+    Args:
+        path: GDAL path of the scene's band
+        window: (xoff, yoff, xsize, ysize) window of the band
+        parameters: autoRIFT's preprocessing parameters
+    """
+    description = {
+        'path': path,
+        'window': [int(value) for value in window],
+        'parameters': parameters,
+        'version': PREPROCESSING_VERSION,
+    }
+    return sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+def load(key: str, cache_dir: Optional[Path] = None) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Load a cached preprocessed image
+
+    The arrays are memory-mapped copy-on-write, so they're only read from disk as needed, and never modified on disk.
+
+    Returns:
+        image: Preprocessed image, or None if it isn't cached
+        valid: Mask of the non-zero pixels of the raw image
+    """
+    paths = cache.find_blobs(key, [IMAGE_FILE, VALID_FILE], cache_dir)
+    if paths is None:
+        return None
+    log.info(f'Using cached preprocessed image {paths[0]}')
+    return np.load(paths[0], mmap_mode='c'), np.load(paths[1], mmap_mode='c')
+
+
+def store(key: str, image: np.ndarray, valid: np.ndarray, cache_dir: Optional[Path] = None,
+          cache_size: Optional[int] = None):
+    """Store a preprocessed image, and the mask of the non-zero pixels of the raw image, in the cache"""
+    for name, array in ((IMAGE_FILE, image), (VALID_FILE, valid)):
+        def write(path, array=array):
+            with open(path, 'wb') as f:
+                np.save(f, array)
+        path = cache.store_blob(key, name, write, cache_dir, cache_size)
+    log.info(f'Cached preprocessed image {path.with_name(IMAGE_FILE)}')
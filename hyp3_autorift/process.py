@@ -6,22 +6,30 @@ import argparse
 import logging
 import os
 import shutil
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from secrets import token_hex
-from typing import Tuple
+from typing import Optional, Tuple
 
 import numpy as np
 import requests
-from hyp3lib.fetch import download_file
-from hyp3lib.get_orb import downloadSentinelOrbitFile
+from hyp3lib import DemError
 from hyp3lib.scene import get_download_url
 from netCDF4 import Dataset
 from osgeo import gdal
 
+from hyp3_autorift import download
 from hyp3_autorift import geometry
 from hyp3_autorift import image
 from hyp3_autorift import io
+from hyp3_autorift import oversampling
+from hyp3_autorift import profiling
+from hyp3_autorift import safe
+from hyp3_autorift.metrics import StageMetrics
 
 log = logging.getLogger(__name__)
 
@@ -118,6 +126,41 @@ def get_platform(scene: str) -> str:
         raise NotImplementedError(f'autoRIFT processing not available for this platform. {scene}')
 
 
+@lru_cache(maxsize=None)
+def get_stac_item(platform: str, scene: str) -> dict:
+    """Look up a Sentinel-2 or Landsat-8 Collection 2 scene's STAC item, once per process"""
+    return get_s2_metadata(scene) if platform == 'S2' else get_lc2_metadata(scene)
+
+
+def get_optical_scene(platform: str, scene: str, band: str) -> Tuple[dict, str]:
+    """Look up a Sentinel-2 or Landsat-8 Collection 2 scene's metadata and the GDAL path of a band
+
+    Also sets the GDAL configuration options needed to read the band from its (requester pays) S3 bucket.
+
+    Args:
+        platform: Platform of the scene, `S2` or `L`
+        scene: Name of the scene
+        band: Band to process
+
+    Returns:
+        metadata: STAC item of the scene
+        path: GDAL path of the band
+    """
+    gdal.SetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN', 'EMPTY_DIR')
+    gdal.SetConfigOption('AWS_REQUEST_PAYER', 'requester')
+
+    metadata = get_stac_item(platform, scene)
+    if platform == 'S2':
+        gdal.SetConfigOption('AWS_REGION', 'eu-central-1')
+        path = metadata['assets'][band]['href'].replace('s3://', '/vsis3/')
+    else:
+        gdal.SetConfigOption('AWS_REGION', 'us-west-2')
+        path = metadata['assets'][f'{band}.TIF']['href']
+        path = path.replace('https://landsatlook.usgs.gov/data/', '/vsis3/usgs-landsat/')
+
+    return metadata, path
+
+
 def get_s1_primary_polarization(granule_name):
     polarization = granule_name[14:16]
     if polarization in ['SV', 'DV']:
@@ -127,8 +170,54 @@ def get_s1_primary_polarization(granule_name):
     raise ValueError(f'Cannot determine co-polarization of granule {granule_name}')
 
 
+def get_parameter_info(lat_limits: Tuple[float, float], lon_limits: Tuple[float, float], parameter_file: str,
+                       workers: int = 1) -> dict:
+    """Find the autoRIFT parameters for a scene's bounding box
+
+    Args:
+        lat_limits: Minimum and maximum latitude of the scene
+        lon_limits: Minimum and maximum longitude of the scene
+        parameter_file: Shapefile for determining the correct search parameters by geographic location
+        workers: Number of processes to run autoRIFT with
+    """
+    scene_poly = geometry.polygon_from_bbox(x_limits=lat_limits, y_limits=lon_limits)
+    parameter_info = io.find_jpl_parameter_info(scene_poly, parameter_file)
+    parameter_info = io.cache_parameter_rasters(parameter_info)
+    if workers > 1:
+        parameter_info['autorift']['mpflag'] = workers
+    return parameter_info
+
+
+def get_s1_parameter_info(safe_zip: str, polarization: str, parameter_file: str, workers: int = 1) -> dict:
+    """Find the autoRIFT parameters for a Sentinel-1 scene from only its annotations
+
+    Only the annotation files are read from the SAFE zip archive, so this can be done before the
+    scene is downloaded.
+
+    Args:
+        safe_zip: Local path or URL of the Sentinel-1 SAFE zip archive
+        polarization: Image polarization
+        parameter_file: Shapefile for determining the correct search parameters by geographic location
+        workers: Number of processes to run autoRIFT with
+    """
+    lat_limits, lon_limits = safe.bounding_box(safe_zip, polarization)
+    return get_parameter_info(lat_limits, lon_limits, parameter_file, workers)
+
+
+def same_parameter_region(parameter_info: dict, lat_limits: Tuple[float, float], lon_limits: Tuple[float, float],
+                          parameter_file: str) -> bool:
+    """Check whether a bounding box falls in the parameter region of some (previously found) parameters"""
+    scene_poly = geometry.polygon_from_bbox(x_limits=lat_limits, y_limits=lon_limits)
+    region = io.find_parameter_region(geometry.flip_point_coordinates(scene_poly.Centroid()), parameter_file)
+    return region is not None and region['name'] == parameter_info['name']
+
+
 def process(reference: str, secondary: str, parameter_file: str = DEFAULT_PARAMETER_FILE,
-            naming_scheme: str = 'ITS_LIVE_OD', band: str = 'B08') -> Tuple[Path, Path]:
+            naming_scheme: str = 'ITS_LIVE_OD', band: str = 'B08',
+            memory_limit: Optional[float] = None, workers: int = 1,
+            download_chunk_size: int = download.DEFAULT_CHUNK_SIZE, amplitude_dtype: str = 'float32',
+            oversample: str = 'default', metrics: Optional[StageMetrics] = None,
+            metrics_file: Optional[Path] = None) -> Tuple[Path, Path]:
     """Process a Sentinel-1, Sentinel-2, or Landsat-8 image pair
 
     Args:
@@ -137,6 +226,17 @@ def process(reference: str, secondary: str, parameter_file: str = DEFAULT_PARAME
         parameter_file: Shapefile for determining the correct search parameters by geographic location
         naming_scheme: Naming scheme to use for product files
         band: Band to process for Sentinel-2 or Landsat-8 Collection 2 scenes
+        memory_limit: Approximate memory limit, in GB, for running autoRIFT; if provided, autoRIFT will be run
+            in tiles sized to fit within this limit (for each worker)
+        workers: Number of processes to run autoRIFT with
+        download_chunk_size: Number of bytes to read into memory and write at a time when downloading
+            Sentinel-1 scenes
+        amplitude_dtype: Data type to load the amplitude of Sentinel-1 SLCs as, float32 or (to halve its memory)
+            uint16, scaled
+        oversample: Oversampling policy for autoRIFT's subpixel refinement (see `hyp3_autorift.oversampling`)
+        metrics: Metrics to record the stages of processing in (default: new metrics)
+        metrics_file: JSON file to write the run's total and per-stage metrics (wall time, CPU time, peak RSS so
+            far, and bytes read and written) to, whether or not processing succeeds
     """
     orbits = None
     polarization = None
@@ -146,135 +246,178 @@ def process(reference: str, secondary: str, parameter_file: str = DEFAULT_PARAME
     secondary_metadata = None
     reference_state_vec = None
     secondary_state_vec = None
+    reference_s1_metadata = None
+    secondary_s1_metadata = None
     lat_limits, lon_limits = None, None
+    parameter_info = None
+    isce_dem = None
+    if metrics is None:
+        metrics = StageMetrics()
 
-    platform = get_platform(reference)
-    if platform == 'S1':
-        for scene in [reference, secondary]:
-            scene_url = get_download_url(scene)
-            download_file(scene_url, chunk_size=5242880)
-
-        orbits = Path('Orbits').resolve()
-        orbits.mkdir(parents=True, exist_ok=True)
-        reference_state_vec, reference_provider = downloadSentinelOrbitFile(reference, directory=orbits)
-        log.info(f'Downloaded orbit file {reference_state_vec} from {reference_provider}')
-        secondary_state_vec, secondary_provider = downloadSentinelOrbitFile(secondary, directory=orbits)
-        log.info(f'Downloaded orbit file {secondary_state_vec} from {secondary_provider}')
-
-        polarization = get_s1_primary_polarization(reference)
-        lat_limits, lon_limits = geometry.bounding_box(f'{reference}.zip', polarization=polarization, orbits=orbits)
-
-    elif platform == 'S2':
-        gdal.SetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN', 'EMPTY_DIR')
-        gdal.SetConfigOption('AWS_REQUEST_PAYER', 'requester')
-        gdal.SetConfigOption('AWS_REGION', 'eu-central-1')
-
-        reference_metadata = get_s2_metadata(reference)
-        reference_path = reference_metadata['assets'][band]['href'].replace('s3://', '/vsis3/')
-
-        secondary_metadata = get_s2_metadata(secondary)
-        secondary_path = secondary_metadata['assets'][band]['href'].replace('s3://', '/vsis3/')
-
-        bbox = reference_metadata['bbox']
-        lat_limits = (bbox[1], bbox[3])
-        lon_limits = (bbox[0], bbox[2])
-
-    elif platform == 'L':
-        gdal.SetConfigOption('GDAL_DISABLE_READDIR_ON_OPEN', 'EMPTY_DIR')
-        gdal.SetConfigOption('AWS_REQUEST_PAYER', 'requester')
-        gdal.SetConfigOption('AWS_REGION', 'us-west-2')
-
-        if band == 'B08':
-            band = 'B8'
-        reference_metadata = get_lc2_metadata(reference)
-        reference_path = reference_metadata['assets'][f'{band}.TIF']['href']
-        reference_path = reference_path.replace('https://landsatlook.usgs.gov/data/', '/vsis3/usgs-landsat/')
-
-        secondary_metadata = get_lc2_metadata(secondary)
-        secondary_path = secondary_metadata['assets'][f'{band}.TIF']['href']
-        secondary_path = secondary_path.replace('https://landsatlook.usgs.gov/data/', '/vsis3/usgs-landsat/')
-
-        bbox = reference_metadata['bbox']
-        lat_limits = (bbox[1], bbox[3])
-        lon_limits = (bbox[0], bbox[2])
-
-    scene_poly = geometry.polygon_from_bbox(x_limits=lat_limits, y_limits=lon_limits)
-    parameter_info = io.find_jpl_parameter_info(scene_poly, parameter_file)
-
-    if platform == 'S1':
-        isce_dem = geometry.prep_isce_dem(parameter_info['geogrid']['dem'], lat_limits, lon_limits)
-
-        io.format_tops_xml(reference, secondary, polarization, isce_dem, orbits)
-
-        import isce  # noqa
-        from topsApp import TopsInSAR
-        insar = TopsInSAR(name='topsApp', cmdline=['topsApp.xml', '--end=mergebursts'])
-        insar.configure()
-        insar.run()
-
-        reference_path = os.path.join(os.getcwd(), 'merged', 'reference.slc.full')
-        secondary_path = os.path.join(os.getcwd(), 'merged', 'secondary.slc.full')
-
-        for slc in [reference_path, secondary_path]:
-            gdal.Translate(slc, f'{slc}.vrt', format='ENVI')
-
-        from hyp3_autorift.vend.testGeogrid_ISCE import loadMetadata, runGeogrid
-        meta_r = loadMetadata('reference')
-        meta_s = loadMetadata('secondary')
-        geogrid_info = runGeogrid(meta_r, meta_s, epsg=parameter_info['epsg'], **parameter_info['geogrid'])
-
-        # NOTE: After Geogrid is run, all drivers are no longer registered.
-        #       I've got no idea why, or if there are other affects...
-        gdal.AllRegister()
-
-        from hyp3_autorift.vend.testautoRIFT_ISCE import generateAutoriftProduct
-        netcdf_file = generateAutoriftProduct(
-            reference_path, secondary_path, nc_sensor=platform[0], optical_flag=False, ncname=None,
-            geogrid_run_info=geogrid_info, **parameter_info['autorift'],
-            parameter_file=parameter_file.replace('/vsicurl/', ''),
-        )
-
-    else:
-        from hyp3_autorift.vend.testGeogridOptical import coregisterLoadMetadata, runGeogrid
-        meta_r, meta_s = coregisterLoadMetadata(
-            reference_path, secondary_path,
-            reference_metadata=reference_metadata,
-            secondary_metadata=secondary_metadata,
-        )
-        geogrid_info = runGeogrid(meta_r, meta_s, epsg=parameter_info['epsg'], **parameter_info['geogrid'])
-
-        from hyp3_autorift.vend.testautoRIFT import generateAutoriftProduct
-        netcdf_file = generateAutoriftProduct(
-            reference_path, secondary_path, nc_sensor=platform, optical_flag=True, ncname=None,
-            reference_metadata=reference_metadata, secondary_metadata=secondary_metadata,
-            geogrid_run_info=geogrid_info, **parameter_info['autorift'],
-            parameter_file=parameter_file.replace('/vsicurl/', ''),
-        )
-
-    if netcdf_file is None:
-        raise Exception('Processing failed! Output netCDF file not found')
-
-    if naming_scheme == 'ITS_LIVE_PROD':
-        product_file = Path(netcdf_file)
-    elif naming_scheme == 'ASF':
-        product_name = get_product_name(
-            reference, secondary, orbit_files=(reference_state_vec, secondary_state_vec),
-            band=band, pixel_spacing=parameter_info['xsize'],
-        )
-        product_file = Path(f'{product_name}.nc')
-        shutil.move(netcdf_file, str(product_file))
-    else:
-        product_file = Path(netcdf_file.replace('.nc', '_IL_ASF_OD.nc'))
-        shutil.move(netcdf_file, str(product_file))
-
-    with Dataset(product_file) as nc:
-        velocity = nc.variables['v']
-        data = np.ma.masked_values(velocity, -32767.).filled(0)
-
-    browse_file = product_file.with_suffix('.png')
-    image.make_browse(browse_file, data)
-
-    return product_file, browse_file
+    try:
+        platform = get_platform(reference)
+        if platform == 'S1':
+            orbits = Path('Orbits').resolve()
+            orbits.mkdir(parents=True, exist_ok=True)
+            polarization = get_s1_primary_polarization(reference)
+            reference_s1_metadata = geometry.S1Metadata(f'{reference}.zip', 'reference', polarization, orbits)
+            secondary_s1_metadata = geometry.S1Metadata(f'{secondary}.zip', 'secondary', polarization, orbits)
+
+            # The bounding box, parameters, and DEM only depend on the reference scene and the orbits,
+            # so they're prepared while the secondary scene is still downloading. The parameters (and their
+            # rasters) are looked up from the reference annotations, before the reference scene is downloaded.
+            # If preparing them fails, the scene downloads are cancelled, rather than waited for, so the error
+            # surfaces right away.
+            cancel_downloads = threading.Event()
+            executor = ThreadPoolExecutor(max_workers=5)
+            futures = []
+            try:
+                annotation_parameters = executor.submit(
+                    metrics.call, 'annotation parameter lookup', get_s1_parameter_info, get_download_url(reference),
+                    polarization, parameter_file, workers,
+                )
+                reference_download = executor.submit(
+                    metrics.call, 'download reference', download.download_file, get_download_url(reference),
+                    chunk_size=download_chunk_size, cancel=cancel_downloads,
+                )
+                secondary_download = executor.submit(
+                    metrics.call, 'download secondary', download.download_file, get_download_url(secondary),
+                    chunk_size=download_chunk_size, cancel=cancel_downloads,
+                )
+                reference_orbit = executor.submit(
+                    metrics.call, 'download reference orbit', download.download_orbit, reference, orbits
+                )
+                secondary_orbit = executor.submit(
+                    metrics.call, 'download secondary orbit', download.download_orbit, secondary, orbits
+                )
+                futures = [annotation_parameters, reference_download, secondary_download, reference_orbit,
+                           secondary_orbit]
+
+                reference_state_vec, _ = reference_orbit.result()
+                secondary_state_vec, _ = secondary_orbit.result()
+                reference_download.result()
+
+                with metrics.stage('bounding box'):
+                    lat_limits, lon_limits = geometry.bounding_box(
+                        f'{reference}.zip', polarization=polarization, orbits=orbits, metadata=reference_s1_metadata
+                    )
+                with metrics.stage('parameter lookup'):
+                    try:
+                        parameter_info = annotation_parameters.result()
+                    except (requests.RequestException, zipfile.BadZipFile, ValueError, RuntimeError, DemError) as e:
+                        log.warning(f'Unable to find parameters from the {reference} annotations: {e}')
+                    if parameter_info is None \
+                            or not same_parameter_region(parameter_info, lat_limits, lon_limits, parameter_file):
+                        parameter_info = get_parameter_info(lat_limits, lon_limits, parameter_file, workers)
+                with metrics.stage('DEM preparation'):
+                    isce_dem = geometry.prep_isce_dem(parameter_info['geogrid']['dem'], lat_limits, lon_limits)
+
+                secondary_download.result()
+            except BaseException:  # noqa: B902 (the downloads are cancelled whatever the error, then it's re-raised)
+                cancel_downloads.set()
+                for future in futures:
+                    future.cancel()
+                executor.shutdown(wait=False)
+                raise
+            executor.shutdown()
+
+        elif platform in ('S2', 'L'):
+            if platform == 'L' and band == 'B08':
+                band = 'B8'
+            with metrics.stage('scene lookup'):
+                reference_metadata, reference_path = get_optical_scene(platform, reference, band)
+                secondary_metadata, secondary_path = get_optical_scene(platform, secondary, band)
+
+            bbox = reference_metadata['bbox']
+            lat_limits = (bbox[1], bbox[3])
+            lon_limits = (bbox[0], bbox[2])
+
+        if parameter_info is None:
+            with metrics.stage('parameter lookup'):
+                parameter_info = get_parameter_info(lat_limits, lon_limits, parameter_file, workers)
+
+        if platform == 'S1':
+            with metrics.stage('topsApp'):
+                io.format_tops_xml(reference, secondary, polarization, isce_dem, orbits)
+                import isce  # noqa
+                from topsApp import TopsInSAR
+                insar = TopsInSAR(name='topsApp', cmdline=['topsApp.xml', '--end=mergebursts'])
+                insar.configure()
+                insar.run()
+
+            # autoRIFT reads the amplitude of the merged SLCs directly from topsApp's VRTs of their bursts
+            reference_path = os.path.join(os.getcwd(), 'merged', 'reference.slc.full.vrt')
+            secondary_path = os.path.join(os.getcwd(), 'merged', 'secondary.slc.full.vrt')
+
+            with metrics.stage('Geogrid'):
+                from hyp3_autorift.vend.testGeogrid_ISCE import runGeogrid
+                meta_r = reference_s1_metadata.geogrid_info()
+                meta_s = secondary_s1_metadata.geogrid_info()
+                geogrid_info = runGeogrid(meta_r, meta_s, epsg=parameter_info['epsg'], **parameter_info['geogrid'])
+                topsinsar_metadata = io.topsinsar_metadata(f'{reference}.zip', f'{secondary}.zip', meta_r, meta_s)
+
+            # NOTE: After Geogrid is run, all drivers are no longer registered.
+            #       I've got no idea why, or if there are other affects...
+            gdal.AllRegister()
+
+            with metrics.stage('autoRIFT'):
+                from hyp3_autorift.vend.testautoRIFT_ISCE import generateAutoriftProduct
+                netcdf_file = generateAutoriftProduct(
+                    reference_path, secondary_path, nc_sensor=platform[0], optical_flag=False, ncname=None,
+                    geogrid_run_info=geogrid_info, **parameter_info['autorift'],
+                    parameter_file=parameter_file.replace('/vsicurl/', ''), memory_limit=memory_limit,
+                    topsinsar_metadata=topsinsar_metadata, amplitude_dtype=amplitude_dtype, oversample=oversample,
+                )
+
+        else:
+            with metrics.stage('Geogrid'):
+                from hyp3_autorift.vend.testGeogridOptical import coregisterLoadMetadata, runGeogrid
+                meta_r, meta_s = coregisterLoadMetadata(
+                    reference_path, secondary_path,
+                    reference_metadata=reference_metadata,
+                    secondary_metadata=secondary_metadata,
+                )
+                geogrid_info = runGeogrid(meta_r, meta_s, epsg=parameter_info['epsg'], **parameter_info['geogrid'])
+
+            with metrics.stage('autoRIFT'):
+                from hyp3_autorift.vend.testautoRIFT import generateAutoriftProduct
+                netcdf_file = generateAutoriftProduct(
+                    reference_path, secondary_path, nc_sensor=platform, optical_flag=True, ncname=None,
+                    reference_metadata=reference_metadata, secondary_metadata=secondary_metadata,
+                    geogrid_run_info=geogrid_info, **parameter_info['autorift'],
+                    parameter_file=parameter_file.replace('/vsicurl/', ''), memory_limit=memory_limit,
+                    oversample=oversample,
+                )
+
+        if netcdf_file is None:
+            raise Exception('Processing failed! Output netCDF file not found')
+
+        if naming_scheme == 'ITS_LIVE_PROD':
+            product_file = Path(netcdf_file)
+        elif naming_scheme == 'ASF':
+            product_name = get_product_name(
+                reference, secondary, orbit_files=(reference_state_vec, secondary_state_vec),
+                band=band, pixel_spacing=parameter_info['xsize'],
+            )
+            product_file = Path(f'{product_name}.nc')
+            shutil.move(netcdf_file, str(product_file))
+        else:
+            product_file = Path(netcdf_file.replace('.nc', '_IL_ASF_OD.nc'))
+            shutil.move(netcdf_file, str(product_file))
+
+        with metrics.stage('browse'):
+            with Dataset(product_file) as nc:
+                velocity = nc.variables['v']
+                data = np.ma.masked_values(velocity, -32767.).filled(0)
+
+            browse_file = product_file.with_suffix('.png')
+            image.make_browse(browse_file, data)
+
+        log.info(f'Stage timings: {metrics.summary()}')
+        return product_file, browse_file
+    finally:
+        if metrics_file is not None:
+            metrics.write(metrics_file)
 
 
 def main():
@@ -289,9 +432,30 @@ def main():
                         help='Secondary Sentinel-1, Sentinel-2, or Landsat-8 Collection 2 scene')
     parser.add_argument('-b', '--band', default='B08',
                         help='Band to process for Sentinel-2 or Landsat-8 Collection 2 scenes')
+    parser.add_argument('--memory-limit', type=float,
+                        help='Approximate memory limit, in GB, for running autoRIFT in tiles (for each worker)')
+    parser.add_argument('--workers', type=int, default=1, help='Number of processes to run autoRIFT with')
+    parser.add_argument('--download-chunk-size', type=int, default=download.DEFAULT_CHUNK_SIZE,
+                        help='Number of bytes to read into memory and write at a time when downloading '
+                             'Sentinel-1 scenes')
+    parser.add_argument('--amplitude-dtype', default='float32', choices=['float32', 'uint16'],
+                        help='Data type to load the amplitude of Sentinel-1 SLCs as')
+    parser.add_argument('--oversample', default='default', choices=oversampling.POLICIES,
+                        help='Oversampling policy for subpixel refinement, trading accuracy for speed')
+    parser.add_argument('--metrics-file', type=Path,
+                        help='JSON file to write the per-stage wall time, CPU time, peak RSS so far, and I/O to')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run, writing .pstats and collapsed stack files next to the product')
     args = parser.parse_args()
 
-    process(**args.__dict__)
+    profile = args.__dict__.pop('profile')
+    if not profile:
+        process(**args.__dict__)
+        return
+
+    with profiling.Profiler() as profiler:
+        product_file, _ = process(**args.__dict__)
+    profiler.write(product_file.with_suffix(''))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,145 @@
+"""Profiling of processing runs, to find out why a pair is slow
+
+A run is profiled with cProfile, and written as a `.pstats` file (for `pstats`, `snakeviz`, etc.) and as a
+`.collapsed` file of collapsed stacks (for `flamegraph.pl`, speedscope, etc.). If `py-spy` is installed, and
+allowed to attach to this process, the collapsed stacks are sampled by it instead, which includes time spent in
+native code (e.g., autoRIFT's and Geogrid's C++ extensions), other threads, and subprocesses; otherwise, they're
+derived from cProfile's call graph, which attributes each function's time to its call paths in proportion to its
+callers'. cProfile only profiles the thread it's enabled in, so stages run in worker threads (like the Sentinel-1
+downloads) show up in its profile as time waiting on them.
+"""
+
+import cProfile
+import logging
+import os
+import pstats
+import shutil
+import signal
+import subprocess
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+DEFAULT_PREFIX = Path('hyp3_autorift_profile')
+SAMPLING_RATE = 100
+
+# Call paths taking less time than this, in seconds, are left out of the collapsed stacks
+COLLAPSED_THRESHOLD = 1e-4
+
+
+def _frame_label(func: tuple) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name.replace(';', ':')
+    return f'{name} ({os.path.basename(filename)}:{line})'.replace(';', ':')
+
+
+def collapsed_stacks(stats: pstats.Stats, threshold: float = COLLAPSED_THRESHOLD) -> Dict[str, float]:
+    """Derive collapsed stacks from cProfile's call graph
+
+    cProfile only records the callers of each function, not full call stacks, so each function's own time is
+    attributed to its call paths in proportion to the time spent in it from each caller. Recursive calls are
+    cut off where a function would appear on a stack twice.
+
+    Returns:
+        stacks: Own time, in seconds, of each `;`-separated call stack
+    """
+    children = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        for caller, (_, _, _, edge_time) in callers.items():
+            children[caller].append((func, edge_time))
+
+    stacks = defaultdict(float)
+
+    def visit(func, stack, on_stack, scale):
+        _, _, own_time, _, _ = stats.stats[func]
+        stack = f'{stack};{_frame_label(func)}' if stack else _frame_label(func)
+        if own_time * scale > 0:
+            stacks[stack] += own_time * scale
+        for child, edge_time in children[func]:
+            child_time = stats.stats[child][3]
+            if child in on_stack or not child_time or edge_time * scale < threshold:
+                continue
+            visit(child, stack, on_stack | {child}, scale * edge_time / child_time)
+
+    for func, (_, _, _, _, callers) in stats.stats.items():
+        if not callers:
+            visit(func, '', {func}, 1.0)
+
+    return dict(stacks)
+
+
+def write_collapsed(stacks: Dict[str, float], collapsed_file: Path):
+    """Write collapsed stacks, with their times in microseconds"""
+    with open(collapsed_file, 'w') as f:
+        for stack, seconds in sorted(stacks.items()):
+            microseconds = round(seconds * 1e6)
+            if microseconds > 0:
+                f.write(f'{stack} {microseconds}\n')
+
+
+class Profiler:
+    """Profile the code run in this context
+
+    If the context exits with an exception, the profile is written with the default prefix, so failed runs can be
+    profiled too; otherwise, call `write` with a prefix for the files.
+    """
+    def __init__(self, sample: bool = True):
+        self.profile = cProfile.Profile()
+        self.sample = sample and shutil.which('py-spy') is not None
+        self._sampler: Optional[subprocess.Popen] = None
+        self._sampled_file: Optional[Path] = None
+
+    def __enter__(self):
+        if self.sample:
+            fd, sampled_file = tempfile.mkstemp(suffix='.collapsed')
+            os.close(fd)
+            self._sampled_file = Path(sampled_file)
+            self._sampler = subprocess.Popen(
+                ['py-spy', 'record', '--pid', str(os.getpid()), '--format', 'raw', '--rate', str(SAMPLING_RATE),
+                 '--subprocesses', '--nonblocking', '--output', str(self._sampled_file)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.profile.disable()
+        if self._sampler is not None:
+            self._sampler.send_signal(signal.SIGINT)
+            try:
+                self._sampler.wait(timeout=60)
+            except subprocess.TimeoutExpired:
+                self._sampler.kill()
+                self._sampler.wait()
+        if exc_type is not None:
+            self.write(DEFAULT_PREFIX)
+
+    def write(self, prefix: Path) -> List[Path]:
+        """Write the profile to `{prefix}.pstats` and `{prefix}.collapsed`
+
+        Returns:
+            profile_files: The files written
+        """
+        stats_file = prefix.with_name(f'{prefix.name}.pstats')
+        collapsed_file = prefix.with_name(f'{prefix.name}.collapsed')
+
+        self.profile.dump_stats(stats_file)
+
+        sampled = self._sampler is not None and self._sampler.returncode == 0 \
+            and self._sampled_file.exists() and self._sampled_file.stat().st_size > 0
+        if sampled:
+            shutil.move(str(self._sampled_file), collapsed_file)
+        else:
+            if self._sampler is not None:
+                log.warning('py-spy failed to sample this process; deriving the collapsed stacks from cProfile')
+            write_collapsed(collapsed_stacks(pstats.Stats(self.profile)), collapsed_file)
+            if self._sampled_file is not None:
+                self._sampled_file.unlink(missing_ok=True)
+
+        log.info(f'Wrote profile to {stats_file} and {"sampled" if sampled else "derived"} collapsed stacks '
+                 f'to {collapsed_file}')
+        return [stats_file, collapsed_file]
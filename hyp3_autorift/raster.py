@@ -0,0 +1,100 @@
+"""Window reads of rasters: the reference rasters used when packaging products, and the optical images"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import List, Optional, Sequence
+
+import numpy as np
+from osgeo import gdal
+
+log = logging.getLogger(__name__)
+
+
+@contextmanager
+def gdal_config(**options: Optional[str]):
+    """Set GDAL configuration options for the current thread, for the duration of the context
+
+    The options are thread-local, so they only apply to the datasets opened and read in this thread, not to any
+    GDAL calls other threads make meanwhile.
+    """
+    previous = {key: gdal.GetThreadLocalConfigOption(key, None) for key in options}
+    for key, value in options.items():
+        gdal.SetThreadLocalConfigOption(key, value)
+    try:
+        yield
+    finally:
+        for key, value in previous.items():
+            gdal.SetThreadLocalConfigOption(key, value)
+
+
+def read_window(path: str, xoff: int, yoff: int, xcount: int, ycount: int, band: int = 1) -> np.ndarray:
+    """Read a window of a raster band; the raster is opened once and only the blocks in the window are read"""
+    ds = gdal.Open(path)
+    data = ds.GetRasterBand(band).ReadAsArray(xoff, yoff, xcount, ycount)
+    del ds
+    return data
+
+
+def read_window_into(path: str, xoff: int, yoff: int, xcount: int, ycount: int, dtype: np.dtype = np.float32,
+                     band: int = 1) -> np.ndarray:
+    """Read a window of a raster band directly into a single, newly allocated array
+
+    GDAL converts the band's data type as it reads, so the window is never also held in the band's data type
+    (as with `ReadAsArray().astype(dtype)`).
+
+    Args:
+        path: Path to the raster
+        xoff: Column of the upper-left corner of the window
+        yoff: Row of the upper-left corner of the window
+        xcount: Number of columns in the window
+        ycount: Number of rows in the window
+        dtype: Data type of the array
+        band: Band to read
+
+    Returns:
+        window: Window of the raster band
+    """
+    ds = gdal.Open(path)
+    window = np.empty((ycount, xcount), dtype=dtype)
+    ds.GetRasterBand(band).ReadAsArray(xoff, yoff, xcount, ycount, buf_obj=window)
+
+    del ds
+    return window
+
+
+def read_windows(paths: Sequence[str], xoff: int, yoff: int, xcount: int, ycount: int,
+                 multirange: bool = True) -> List[np.ndarray]:
+    """Concurrently read the same window of several rasters
+
+    Each raster is opened once, in its own thread. For `/vsicurl/` rasters, directory listings aren't
+    requested on open and, with `multirange`, the blocks in the window are requested from the server with
+    as few (multi-)range requests as possible; otherwise, they're requested one range at a time. These GDAL
+    options are set for each reading thread only (see `gdal_config`).
+
+    Args:
+        paths: Paths to the rasters, which must share a grid
+        xoff: Column of the upper-left corner of the window
+        yoff: Row of the upper-left corner of the window
+        xcount: Number of columns in the window
+        ycount: Number of rows in the window
+        multirange: Request the blocks of a remote raster's window with HTTP multi-range requests
+
+    Returns:
+        windows: Window of the first band of each raster, in the order of `paths`
+    """
+    options = {
+        'GDAL_DISABLE_READDIR_ON_OPEN': 'EMPTY_DIR',
+        'GDAL_HTTP_MULTIRANGE': 'YES' if multirange else 'SERIAL',
+        'GDAL_HTTP_MERGE_CONSECUTIVE_RANGES': 'YES' if multirange else 'NO',
+    }
+
+    def read(path: str) -> np.ndarray:
+        with gdal_config(**options):
+            return read_window(path, xoff, yoff, xcount, ycount)
+
+    with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+        windows = list(executor.map(read, paths))
+
+    log.info(f'Read {xcount}x{ycount} windows of {len(paths)} reference rasters')
+    return windows
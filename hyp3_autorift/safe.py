@@ -0,0 +1,162 @@
+"""Lightweight reader for the metadata of Sentinel-1 SAFE zip archives
+
+Only the zip's central directory and the requested metadata members (manifest, annotation, and calibration
+XML files) are read, so remote archives can be inspected with a handful of HTTP range requests instead of
+downloading the multi-GB archive.
+"""
+
+import io
+import logging
+import re
+import xml.etree.ElementTree as ET
+import zipfile
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import requests
+
+from hyp3_autorift.cache import REQUEST_TIMEOUT
+from hyp3_autorift.download import get_session
+
+log = logging.getLogger(__name__)
+
+# Read-ahead for remote archives; the central directory of a SAFE zip is well under this size
+REMOTE_BUFFER_SIZE = 1048576
+
+METADATA_MEMBERS = ('*/manifest.safe', '*/annotation/*.xml', '*/annotation/calibration/*.xml')
+
+
+class HttpRangeFile(io.RawIOBase):
+    """Read-only, seekable file object for a remote file, read with HTTP range requests"""
+    def __init__(self, url: str, session: Optional[requests.Session] = None):
+        self.session = get_session() if session is None else session
+        self.position = 0
+        self.requests = 0
+
+        # Resolve any redirects (e.g., for authentication) once, and reuse the final URL for every read
+        with self.session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            self.requests += 1
+            self.url = response.url
+            content_range = response.headers.get('Content-Range')
+            if response.status_code != 206 or content_range is None:
+                raise ValueError(f'{url} does not support HTTP range requests')
+            self.size = int(content_range.rsplit('/', 1)[-1])
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.position = offset
+        elif whence == io.SEEK_CUR:
+            self.position += offset
+        elif whence == io.SEEK_END:
+            self.position = self.size + offset
+        else:
+            raise ValueError(f'Invalid whence: {whence}')
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        length = min(len(buffer), self.size - self.position)
+        if length <= 0:
+            return 0
+
+        headers = {'Range': f'bytes={self.position}-{self.position + length - 1}'}
+        response = self.session.get(self.url, headers=headers, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        self.requests += 1
+
+        data = response.content
+        buffer[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def open_safe(safe: str, session: Optional[requests.Session] = None) -> zipfile.ZipFile:
+    """Open a local or remote (`http(s)://` or `/vsicurl/`) SAFE zip archive for reading"""
+    url = safe[len('/vsicurl/'):] if safe.startswith('/vsicurl/') else safe
+    if re.match(r'https?://', url):
+        return zipfile.ZipFile(io.BufferedReader(HttpRangeFile(url, session), buffer_size=REMOTE_BUFFER_SIZE))
+    return zipfile.ZipFile(safe)
+
+
+def metadata_members(archive: zipfile.ZipFile, patterns: Tuple[str, ...] = METADATA_MEMBERS) -> List[str]:
+    return [name for name in archive.namelist() if any(fnmatch(name, pattern) for pattern in patterns)]
+
+
+def extract_metadata(safe: str, directory: Path, session: Optional[requests.Session] = None) -> List[Path]:
+    """Extract only the manifest, annotation, and calibration files of a SAFE zip archive
+
+    Returns:
+        paths: Paths to the extracted files
+    """
+    with open_safe(safe, session) as archive:
+        return [Path(archive.extract(name, directory)) for name in metadata_members(archive)]
+
+
+def annotation_members(archive: zipfile.ZipFile, polarization: str) -> List[str]:
+    """Names of the swath annotation files of a polarization"""
+    return sorted(metadata_members(archive, (f'*/annotation/s1?-iw?-slc-{polarization.lower()}-*.xml',)))
+
+
+def read_annotations(safe: str, polarization: str = 'hh',
+                     session: Optional[requests.Session] = None) -> List[ET.Element]:
+    """Read and parse the swath annotation files of a polarization from a SAFE zip archive"""
+    with open_safe(safe, session) as archive:
+        return [ET.fromstring(archive.read(name)) for name in annotation_members(archive, polarization)]
+
+
+def geolocation_grid(annotations: List[ET.Element]) -> List[Tuple[float, float]]:
+    """(latitude, longitude) of every geolocation grid point in a set of swath annotations"""
+    points = []
+    for root in annotations:
+        for point in root.iter('geolocationGridPoint'):
+            points.append((float(point.findtext('latitude')), float(point.findtext('longitude'))))
+    return points
+
+
+def image_size(annotations: List[ET.Element]) -> Tuple[int, int]:
+    """Upper bound of the (lines, samples) of the image merged from a set of swath annotations
+
+    Swaths are stacked in range, so their samples are summed, ignoring their small overlaps.
+    """
+    lines = max(int(root.findtext('imageAnnotation/imageInformation/numberOfLines')) for root in annotations)
+    samples = sum(int(root.findtext('imageAnnotation/imageInformation/numberOfSamples')) for root in annotations)
+    return lines, samples
+
+
+def bounding_box(safe: str, polarization: str = 'hh',
+                 session: Optional[requests.Session] = None) -> Tuple[Tuple[float, float], Tuple[float, float]]:
+    """Approximate the bounding box of a Sentinel-1 scene from its annotations' geolocation grids
+
+    The geolocation grids cover the footprint of every swath, so this closely matches
+    `hyp3_autorift.geometry.bounding_box`, without the orbit files or pixel data.
+
+    Args:
+        safe: Local path or URL of the Sentinel-1 SAFE zip archive
+        polarization: Image polarization
+        session: requests session to use for reading a remote archive
+
+    Returns:
+        lat_limits: Minimum and maximum latitude
+        lon_limits: Minimum and maximum longitude
+    """
+    points = geolocation_grid(read_annotations(safe, polarization, session))
+    if not points:
+        raise ValueError(f'No {polarization} annotations found in {safe}')
+
+    lats, lons = zip(*points)
+    lat_limits = (min(lats), max(lats))
+    lon_limits = (min(lons), max(lons))
+    log.info(f'Approximate latitude limits [min, max] from the {Path(safe).name} annotations: {lat_limits}')
+    log.info(f'Approximate longitude limits [min, max] from the {Path(safe).name} annotations: {lon_limits}')
+
+    return lat_limits, lon_limits
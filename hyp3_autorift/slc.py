@@ -0,0 +1,136 @@
+"""Amplitude images of complex SLC rasters, such as the merged Sentinel-1 SLCs written by topsApp
+
+topsApp writes each merged SLC as a VRT of its bursts. Reading the VRT with GDAL, a block of rows at a time,
+avoids writing (and reading back) a full-resolution copy of the complex SLC, and only one block of complex data
+is ever held in memory: each block's amplitude is written into a single preallocated float32 (or scaled uint16)
+array, and the block is dropped.
+"""
+
+import logging
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+from osgeo import gdal
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BLOCK_ROWS = 1024
+
+UINT16_MAX = np.iinfo(np.uint16).max
+
+# uint16 amplitudes are scaled so this percentile of a sample of rows maps to half of the uint16 range
+SCALE_PERCENTILE = 99.99
+SCALE_SAMPLES = 16
+SAMPLE_ROWS = 16
+
+
+def raster_shape(path: str) -> Tuple[int, int]:
+    """Number of (rows, columns) in a raster"""
+    ds = gdal.Open(path)
+    shape = (ds.RasterYSize, ds.RasterXSize)
+    del ds
+    return shape
+
+
+def estimate_uint16_scale(read_rows: Callable[[int, int], np.ndarray], rows: int) -> float:
+    """Estimate the factor which scales amplitudes into the uint16 range, from a sample of rows
+
+    Args:
+        read_rows: Function which reads the complex data of rows `[start, stop)`
+        rows: Number of rows
+    """
+    starts = np.unique(np.linspace(0, max(rows - SAMPLE_ROWS, 0), SCALE_SAMPLES).astype(int))
+    sample = np.concatenate([np.abs(read_rows(start, min(start + SAMPLE_ROWS, rows))).ravel() for start in starts])
+    sample = sample[sample > 0]
+    reference = np.percentile(sample, SCALE_PERCENTILE) if sample.size else 1.0
+    return UINT16_MAX / (2 * reference)
+
+
+def stream_amplitude(read_rows: Callable[[int, int], np.ndarray], shape: Tuple[int, int],
+                     dtype: np.dtype = np.float32, scale: Optional[float] = None,
+                     block_rows: int = DEFAULT_BLOCK_ROWS) -> np.ndarray:
+    """Compute the amplitude of complex data, a block of rows at a time, into a single preallocated array
+
+    With a uint16 `dtype`, amplitudes are multiplied by `scale`, rounded, and clipped to the uint16 range;
+    non-zero amplitudes are kept non-zero, since autoRIFT treats zeros as no data. autoRIFT normalizes each image
+    after filtering it, so scaling the amplitudes only affects the results through rounding and clipping.
+
+    Args:
+        read_rows: Function which reads the complex data of rows `[start, stop)`
+        shape: Number of (rows, columns) of complex data
+        dtype: Data type of the amplitude, float32 or uint16
+        scale: Factor to scale uint16 amplitudes by (default: `estimate_uint16_scale`)
+        block_rows: Number of rows of complex data to read at a time
+
+    Returns:
+        amplitude: Amplitude of the complex data
+    """
+    dtype = np.dtype(dtype)
+    if dtype not in (np.float32, np.uint16):
+        raise ValueError(f'Amplitude data type must be float32 or uint16, not {dtype}')
+    if dtype == np.uint16 and scale is None:
+        scale = estimate_uint16_scale(read_rows, shape[0])
+
+    amplitude = np.empty(shape, dtype=dtype)
+    for start in range(0, shape[0], block_rows):
+        stop = min(start + block_rows, shape[0])
+        block = read_rows(start, stop)
+        if dtype == np.float32:
+            np.abs(block, out=amplitude[start:stop])
+            del block
+        else:
+            scaled = np.abs(block)
+            del block
+            nonzero = scaled > 0
+            np.multiply(scaled, scale, out=scaled)
+            np.rint(scaled, out=scaled)
+            np.clip(scaled, 0, UINT16_MAX, out=scaled)
+            scaled[nonzero & (scaled == 0)] = 1
+            amplitude[start:stop] = scaled
+            del scaled, nonzero
+
+    return amplitude
+
+
+def log_memory_saved(name: str, amplitude: np.ndarray, complex_itemsize: int = 8):
+    """Log the memory saved by streaming a complex image's amplitude, rather than holding the complex image
+    alongside a float32 amplitude image of it
+    """
+    pixels = amplitude.size
+    saved = pixels * (complex_itemsize + 4) - amplitude.nbytes
+    log.info(f'Loaded the {amplitude.shape[0]}x{amplitude.shape[1]} {amplitude.dtype} amplitude of {name} '
+             f'({amplitude.nbytes / 2**20:.0f} MB), saving {saved / 2**20:.0f} MB')
+
+
+def read_amplitude(path: str, window: Optional[Tuple[int, int, int, int]] = None, dtype: np.dtype = np.float32,
+                   scale: Optional[float] = None, block_rows: int = DEFAULT_BLOCK_ROWS) -> np.ndarray:
+    """Read the amplitude of a complex raster, a block of rows at a time (see `stream_amplitude`)
+
+    Args:
+        path: Path to the complex raster (e.g., `merged/reference.slc.full.vrt`)
+        window: (row0, row1, col0, col1) bounds of the window to read (default: the whole raster)
+        dtype: Data type of the amplitude, float32 or uint16
+        scale: Factor to scale uint16 amplitudes by
+        block_rows: Number of rows of complex data to read at a time
+
+    Returns:
+        amplitude: Amplitude of the window
+    """
+    ds = gdal.Open(path)
+    band = ds.GetRasterBand(1)
+    if window is None:
+        window = (0, ds.RasterYSize, 0, ds.RasterXSize)
+    row0, row1, col0, col1 = window
+
+    def read_rows(start, stop):
+        return band.ReadAsArray(col0, row0 + start, col1 - col0, stop - start)
+
+    return stream_amplitude(read_rows, (row1 - row0, col1 - col0), dtype, scale, block_rows)
+
+
+def array_amplitude(array: np.ndarray, dtype: np.dtype = np.float32, scale: Optional[float] = None,
+                    block_rows: int = DEFAULT_BLOCK_ROWS) -> np.ndarray:
+    """Compute the amplitude of a (e.g., memory-mapped) complex array, a block of rows at a time
+    (see `stream_amplitude`)
+    """
+    return stream_amplitude(lambda start, stop: array[start:stop], array.shape, dtype, scale, block_rows)
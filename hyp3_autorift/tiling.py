@@ -0,0 +1,292 @@
+"""Tiled autoRIFT processing with bounded memory
+
+The Geogrid window is split into tiles of grid points, which overlap so that autoRIFT's neighborhood filtering
+near tile edges sees the same neighbors it would in a full-scene run. For each tile, only the image sub-windows
+that its chips and search ranges reach are read, autoRIFT is run, and the tile's core is stitched back into the
+full grid.
+
+Note: autoRIFT normalizes each image to a uniform data type using the image's statistics, so tiled results may
+differ very slightly from a full-scene run.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# Both float32 images, plus autoRIFT's high-pass filtered and uint8 working copies of them
+BYTES_PER_PIXEL = 24
+
+# Image pixels read beyond the reach of the chips and search ranges (covers the preprocessing filter kernel)
+WINDOW_PAD = 32
+
+
+class Tile(NamedTuple):
+    rows: slice
+    cols: slice
+    core_rows: slice
+    core_cols: slice
+
+
+def round_up(value: int, multiple: int) -> int:
+    return int(np.ceil(value / multiple) * multiple)
+
+
+def tile_grid(grid_shape: Tuple[int, int], tile_size: int, overlap: int) -> List[Tile]:
+    """Split a grid into square tiles, which overlap their neighbors by `overlap` grid points
+
+    Args:
+        grid_shape: Number of (rows, columns) in the grid
+        tile_size: Number of rows and columns in the core of each tile
+        overlap: Number of grid points each tile extends past its core
+
+    Returns:
+        tiles: Tiles covering the grid; the tile cores do not overlap
+    """
+    tiles = []
+    for row in range(0, grid_shape[0], tile_size):
+        for col in range(0, grid_shape[1], tile_size):
+            core_rows = slice(row, min(row + tile_size, grid_shape[0]))
+            core_cols = slice(col, min(col + tile_size, grid_shape[1]))
+            rows = slice(max(core_rows.start - overlap, 0), min(core_rows.stop + overlap, grid_shape[0]))
+            cols = slice(max(core_cols.start - overlap, 0), min(core_cols.stop + overlap, grid_shape[1]))
+            tiles.append(Tile(rows, cols, core_rows, core_cols))
+    return tiles
+
+
+def image_window(xGrid: np.ndarray, yGrid: np.ndarray, valid: np.ndarray, reach_x: np.ndarray,
+                 reach_y: np.ndarray, image_shape: Tuple[int, int],
+                 pad: int = WINDOW_PAD) -> Optional[Tuple[int, int, int, int]]:
+    """Image window needed to process a set of grid points
+
+    Args:
+        xGrid: Image column (1-based) of each grid point
+        yGrid: Image row (1-based) of each grid point
+        valid: Grid points to be processed
+        reach_x: Number of pixels each chip and its search reaches in x
+        reach_y: Number of pixels each chip and its search reaches in y
+        image_shape: Number of (rows, columns) in the image
+        pad: Additional pixels to read around the reach of the grid points
+
+    Returns:
+        window: (row0, row1, col0, col1) bounds of the image window, or None if there are no valid grid points
+    """
+    if not valid.any():
+        return None
+
+    x = xGrid[valid] - 1
+    y = yGrid[valid] - 1
+    rx = reach_x[valid]
+    ry = reach_y[valid]
+
+    row0 = max(int(np.floor(np.min(y - ry))) - pad, 0)
+    row1 = min(int(np.ceil(np.max(y + ry))) + pad + 1, image_shape[0])
+    col0 = max(int(np.floor(np.min(x - rx))) - pad, 0)
+    col1 = min(int(np.ceil(np.max(x + rx))) + pad + 1, image_shape[1])
+
+    return row0, row1, col0, col1
+
+
+def window_bytes(window: Optional[Tuple[int, int, int, int]]) -> int:
+    if window is None:
+        return 0
+    row0, row1, col0, col1 = window
+    return (row1 - row0) * (col1 - col0) * BYTES_PER_PIXEL
+
+
+def choose_tile_size(memory_limit: float, xGrid: np.ndarray, yGrid: np.ndarray, valid: np.ndarray,
+                     reach_x: np.ndarray, reach_y: np.ndarray, image_shape: Tuple[int, int],
+                     multiple: int, overlap: int) -> int:
+    """Choose the largest tile size, in grid points, whose image windows fit within a memory limit
+
+    Args:
+        memory_limit: Approximate memory limit for a tile, in bytes
+        xGrid: Image column (1-based) of each grid point
+        yGrid: Image row (1-based) of each grid point
+        valid: Grid points to be processed
+        reach_x: Number of pixels each chip and its search reaches in x
+        reach_y: Number of pixels each chip and its search reaches in y
+        image_shape: Number of (rows, columns) in the image
+        multiple: Tile sizes will be a multiple of this number of grid points
+        overlap: Number of grid points each tile extends past its core
+
+    Returns:
+        tile_size: Number of rows and columns in the core of each tile
+    """
+    tile_size = round_up(max(xGrid.shape), multiple)
+    while True:
+        largest = max(
+            window_bytes(image_window(xGrid[t.rows, t.cols], yGrid[t.rows, t.cols], valid[t.rows, t.cols],
+                                      reach_x[t.rows, t.cols], reach_y[t.rows, t.cols], image_shape))
+            for t in tile_grid(xGrid.shape, tile_size, overlap)
+        )
+        if largest <= memory_limit:
+            return tile_size
+        if tile_size == multiple:
+            log.warning(f'Smallest tile size ({tile_size} grid points) requires ~{largest / 2**30:.2f} GB, '
+                        f'which exceeds the memory limit of {memory_limit / 2**30:.2f} GB')
+            return tile_size
+        tile_size = round_up(tile_size // 2, multiple)
+
+
+def chop_factor(CSMINx0: np.ndarray, CSMAXx0: np.ndarray, valid: np.ndarray) -> int:
+    """autoRIFT truncates its grid to a multiple of the ratio of the largest to the smallest chip size"""
+    sized = valid & (CSMINx0 > 0)
+    if not sized.any():
+        return 1
+    ratio = np.max(CSMAXx0[sized]) / np.min(CSMINx0[sized])
+    return int(2 ** np.ceil(np.log2(max(ratio, 1))))
+
+
+def pad_to(array: np.ndarray, shape: Tuple[int, int], fill) -> np.ndarray:
+    padded = np.full(shape, fill, dtype=array.dtype)
+    padded[0:array.shape[0], 0:array.shape[1]] = array
+    return padded
+
+
+def run_tiled(run_autorift: Callable, open_product: Callable, product_files: Tuple[str, str], memory_limit: float,
+              xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0, noDataMask, optflag, nodata,
+              workers: int = 1, geogrid_run_info=None, oversample: str = 'default'):
+    """Run autoRIFT over the Geogrid window in overlapping tiles
+
+    The tiling depends only on the memory limit, so running the tiles in parallel gives results identical to
+    running them serially.
+
+    Args:
+        run_autorift: The vendored driver's `runAutorift` function
+        open_product: Function that opens both images for windowed reads, returning their shape and a
+            function that reads the (row0, row1, col0, col1) window of both images
+        product_files: Reference and secondary image files, as passed to `open_product`
+        memory_limit: Approximate memory limit for a tile (and so for each worker), in bytes
+        workers: Number of processes to run tiles in; each process opens the images itself, so windows are
+            read from the (memory-mapped) image files rather than sent between processes
+
+        All other arguments are those of `runAutorift` for the full Geogrid window
+
+    Returns:
+        The outputs of `runAutorift`, for the full Geogrid window
+    """
+    image_shape, read_window = open_product(*product_files)
+
+    grid_shape = xGrid.shape
+    valid = (xGrid != nodata) & (yGrid != nodata) & np.logical_not(noDataMask)
+
+    RATIO_Y2X = CSMINy0 / CSMINx0
+    scale_chip_size_y = np.median(RATIO_Y2X[(CSMINx0 != nodata) & (CSMINy0 != nodata)])
+
+    def magnitude(array):
+        return np.where(array == nodata, 0, np.abs(array))
+
+    reach_x = magnitude(CSMAXx0) / 2 + magnitude(SRx0) + magnitude(Dx0)
+    reach_y = magnitude(CSMAXx0) * scale_chip_size_y / 2 + magnitude(SRy0) + magnitude(Dy0)
+
+    multiple = chop_factor(CSMINx0, CSMAXx0, valid)
+    overlap = 4 * multiple
+    tile_size = choose_tile_size(memory_limit, xGrid, yGrid, valid, reach_x, reach_y, image_shape,
+                                 multiple, overlap)
+
+    tiles = []
+    for tile in tile_grid(grid_shape, tile_size, overlap):
+        window = image_window(xGrid[tile.rows, tile.cols], yGrid[tile.rows, tile.cols], valid[tile.rows, tile.cols],
+                              reach_x[tile.rows, tile.cols], reach_y[tile.rows, tile.cols], image_shape)
+        if window is not None:
+            tiles.append((tile, window))
+    log.info(f'Running autoRIFT in {len(tiles)} tiles of {tile_size}x{tile_size} grid points '
+             f'with {workers} worker(s)')
+
+    grids = (xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0, noDataMask)
+    args = (scale_chip_size_y, optflag, nodata, geogrid_run_info, oversample)
+
+    if workers > 1:
+        # Tiles run single-process in the workers; the grids are handed to each worker once, when it starts
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(open_product, product_files, grids))
+        with executor:
+            futures = [executor.submit(_run_worker_tile, run_autorift, window, tile, *args)
+                       for tile, window in tiles]
+            results = (future.result() for future in futures)
+            outputs = _stitch(grid_shape, (tile for tile, _ in tiles), results)
+    else:
+        results = (run_tile(run_autorift, read_window, window, tile, grids, *args) for tile, window in tiles)
+        outputs = _stitch(grid_shape, (tile for tile, _ in tiles), results)
+
+    Dx, Dy, InterpMask, ChipSizeX, SearchLimitX, SearchLimitY, noDataMaskOut = outputs
+    return Dx, Dy, InterpMask, ChipSizeX, scale_chip_size_y, SearchLimitX, SearchLimitY, grid_shape, noDataMaskOut
+
+
+def _stitch(grid_shape: Tuple[int, int], tiles: Iterable[Tile], results: Iterable[list]) -> list:
+    """Stitch the outputs of each tile's core into the full grid"""
+    outputs = [
+        np.full(grid_shape, np.nan, dtype=np.float32),  # Dx
+        np.full(grid_shape, np.nan, dtype=np.float32),  # Dy
+        np.zeros(grid_shape, dtype=np.float32),  # InterpMask
+        np.zeros(grid_shape, dtype=np.float32),  # ChipSizeX
+        np.zeros(grid_shape, dtype=np.float32),  # SearchLimitX
+        np.zeros(grid_shape, dtype=np.float32),  # SearchLimitY
+        np.ones(grid_shape, dtype=bool),  # noDataMask
+    ]
+    for tile, tile_outputs in zip(tiles, results):
+        for full, tile_output in zip(outputs, tile_outputs):
+            full[tile.core_rows, tile.core_cols] = tile_output
+    return outputs
+
+
+_worker = {}
+
+
+def _init_worker(open_product: Callable, product_files: Tuple[str, str], grids: tuple):
+    _, _worker['read_window'] = open_product(*product_files)
+    _worker['grids'] = grids
+
+
+def _run_worker_tile(run_autorift: Callable, window: Tuple[int, int, int, int], tile: Tile, *args):
+    return run_tile(run_autorift, _worker['read_window'], window, tile, _worker['grids'], *args)
+
+
+def run_tile(run_autorift: Callable, read_window: Callable, window: Tuple[int, int, int, int], tile: Tile,
+             grids: tuple, scale_chip_size_y, optflag, nodata, geogrid_run_info=None,
+             oversample: str = 'default') -> list:
+    """Run autoRIFT for a single tile, returning the outputs for the tile's core
+
+    Args:
+        run_autorift: The vendored driver's `runAutorift` function
+        read_window: Function that reads the (row0, row1, col0, col1) window of both images
+        window: Image window needed by the tile
+        tile: Tile to run
+        grids: The (xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0, noDataMask) arrays
+            for the full Geogrid window
+        scale_chip_size_y: Ratio of the y to x chip size for the full Geogrid window
+
+        All other arguments are those of `runAutorift`
+    """
+    row0, row1, col0, col1 = window
+    I1, I2 = read_window(row0, row1, col0, col1)
+
+    rows, cols = tile.rows, tile.cols
+    tile_shape = (rows.stop - rows.start, cols.stop - cols.start)
+
+    xGrid, yGrid, *others = [None if array is None else array[rows, cols].copy() for array in grids]
+    gridded = (xGrid != nodata) & (yGrid != nodata)
+    xGrid[gridded] -= col0
+    yGrid[gridded] -= row0
+
+    Dx, Dy, InterpMask, ChipSizeX, _, SearchLimitX, SearchLimitY, _, noDataMaskTile = run_autorift(
+        I1, I2, xGrid, yGrid, *others, optflag, nodata, 0,
+        geogrid_run_info=geogrid_run_info, scale_chip_size_y=scale_chip_size_y, oversample=oversample,
+    )
+
+    core = (slice(tile.core_rows.start - rows.start, tile.core_rows.stop - rows.start),
+            slice(tile.core_cols.start - cols.start, tile.core_cols.stop - cols.start))
+
+    return [
+        pad_to(Dx, tile_shape, np.nan)[core],
+        pad_to(Dy, tile_shape, np.nan)[core],
+        pad_to(InterpMask, tile_shape, 0)[core],
+        pad_to(ChipSizeX, tile_shape, 0)[core],
+        pad_to(SearchLimitX, tile_shape, 0)[core],
+        pad_to(SearchLimitY, tile_shape, 0)[core],
+        pad_to(noDataMaskTile, tile_shape, True)[core],
+    ]
@@ -212,6 +212,9 @@ def runGeogrid(info, info1, dem, dhdx, dhdy, vx, vy, srx, sry, csminx, csminy, c
         'cen_lon': obj.cen_lon,
     }
 
+    from hyp3_autorift.geogrid_info import write_run_info
+    write_run_info(run_info)
+
     return run_info
 
 def main():
@@ -280,6 +280,9 @@ def runGeogrid(info, info1, dem, dhdx, dhdy, vx, vy, srx, sry, csminx, csminy, c
         'cen_lon': obj.cen_lon,
     }
 
+    from hyp3_autorift.geogrid_info import write_run_info
+    write_run_info(run_info)
+
     return run_info
 
 
@@ -363,6 +366,9 @@ def runGeogridOptical(info, info1, dem, dhdx, dhdy, vx, vy, srx, sry, csminx, cs
         'cen_lon': obj.cen_lon,
     }
 
+    from hyp3_autorift.geogrid_info import write_run_info
+    write_run_info(run_info)
+
     return run_info
 
 def main():
@@ -88,17 +88,32 @@ class Dummy(object):
 
 
 
-def loadProduct(filename):
+def loadProduct(filename, amplitude_dtype='float32'):
     '''
     Load the product using Product Manager.
+
+    GDAL VRTs of complex SLCs (e.g., topsApp's merged SLCs) are read directly, as amplitude. With amplitude_dtype
+    (float32 or uint16), complex images are loaded as amplitude, a block of rows at a time, so the complex image is
+    never held in memory; otherwise, they're memory-mapped as is.
     '''
+    if filename.endswith('.vrt'):
+        from hyp3_autorift.slc import log_memory_saved, read_amplitude
+        img = read_amplitude(filename, dtype=amplitude_dtype or 'float32')
+        log_memory_saved(filename, img)
+        return img
+
     import isce
     import logging
+    import numpy as np
     from imageMath import IML
 
     IMG = IML.mmapFromISCE(filename, logging)
     img = IMG.bands[0]
 #    pdb.set_trace()
+    if amplitude_dtype is not None and np.iscomplexobj(img):
+        from hyp3_autorift.slc import array_amplitude, log_memory_saved
+        img = array_amplitude(img, dtype=amplitude_dtype)
+        log_memory_saved(filename, img)
     return img
 
 
@@ -107,6 +122,116 @@ def loadProductOptical(file_m, file_s):
     '''
     Load the product using Product Manager.
     '''
+    from hyp3_autorift.raster import read_window_into
+    from geogrid import GeogridOptical
+#    from components.contrib.geo_autoRIFT.geogrid import GeogridOptical
+
+    obj = GeogridOptical()
+
+    x1a, y1a, xsize1, ysize1, x2a, y2a, xsize2, ysize2, trans = obj.coregister(file_m, file_s)
+
+    # each window is read directly into a single float32 array
+    I1 = read_window_into(file_m, x1a, y1a, xsize1, ysize1)
+    I2 = read_window_into(file_s, x2a, y2a, xsize2, ysize2)
+
+    return I1, I2
+
+
+def preprocessingParameters():
+    '''
+    The autoRIFT parameters that preprocessing depends on.
+    '''
+    from autoRIFT import autoRIFT
+    from autoRIFT import __version__ as version
+
+    obj = autoRIFT()
+
+    return {'version': version, 'WallisFilterWidth': obj.WallisFilterWidth, 'DataType': obj.DataType,
+            'zeroMask': obj.zeroMask is not None}
+
+
+def preprocessImages(I1, I2):
+    '''
+    Preprocess (high-pass filter and convert to a uniform data type) the images, as runAutorift does.
+    '''
+    from autoRIFT import autoRIFT
+    import time
+
+    obj = autoRIFT()
+    obj.I1 = I1
+    obj.I2 = I2
+
+    t1 = time.time()
+    print("Pre-process Start!!!")
+    obj.preprocess_filt_hps()
+    print("Pre-process Done!!!")
+    print(time.time()-t1)
+
+    t1 = time.time()
+    obj.uniform_data_type()
+    print("Uniform Data Type Done!!!")
+    print(time.time()-t1)
+
+    return obj.I1, obj.I2
+
+
+def preprocessImage(I):
+    '''
+    Preprocess a lone image, as runAutorift does.
+
+    autoRIFT preprocesses the images of a pair independently, so a small placeholder, whose result is discarded, is
+    preprocessed in place of the other one.
+    '''
+    import numpy as np
+
+    P, _ = preprocessImages(I, np.arange(4, dtype=np.float32).reshape(2, 2))
+    return P
+
+
+def loadPreprocessedOptical(file_m, file_s):
+    '''
+    Load the coregistered products, preprocessed, reusing images preprocessed for other pairs.
+
+    Returns the masks of the raw images' non-zero pixels and the preprocessed images, for runAutorift.
+    '''
+    import numpy as np
+    from geogrid import GeogridOptical
+#    from components.contrib.geo_autoRIFT.geogrid import GeogridOptical
+    from hyp3_autorift import preprocessing
+    from hyp3_autorift.raster import read_window_into
+
+    obj = GeogridOptical()
+
+    x1a, y1a, xsize1, ysize1, x2a, y2a, xsize2, ysize2, trans = obj.coregister(file_m, file_s)
+
+    files = (file_m, file_s)
+    windows = ((x1a, y1a, xsize1, ysize1), (x2a, y2a, xsize2, ysize2))
+    parameters = preprocessingParameters()
+    keys = [preprocessing.cache_key(file, window, parameters) for file, window in zip(files, windows)]
+    cached = [preprocessing.load(key) for key in keys]
+
+    # images which aren't cached are read and preprocessed; a lone image is preprocessed on its own
+    missing = [index for index, hit in enumerate(cached) if hit is None]
+    images = []
+    for index in missing:
+        images.append(read_window_into(files[index], *windows[index]))
+
+    if images:
+        preprocessed = preprocessImages(*images) if len(images) == 2 else [preprocessImage(images[0])]
+        for index, image, P in zip(missing, images, preprocessed):
+            V = image != 0
+            preprocessing.store(keys[index], P, V)
+            cached[index] = (P, V)
+
+    (P1, V1), (P2, V2) = cached
+    return V1, V2, (P1, P2)
+
+
+def openProductOptical(file_m, file_s):
+    '''
+    Open the coregistered products for windowed reads.
+    '''
+    import numpy as np
     from geogrid import GeogridOptical
 #    from components.contrib.geo_autoRIFT.geogrid import GeogridOptical
 
@@ -117,22 +242,61 @@ def loadProductOptical(file_m, file_s):
     DS1 = gdal.Open(file_m)
     DS2 = gdal.Open(file_s)
 
-    I1 = DS1.ReadAsArray(xoff=x1a, yoff=y1a, xsize=xsize1, ysize=ysize1)
-    I2 = DS2.ReadAsArray(xoff=x2a, yoff=y2a, xsize=xsize2, ysize=ysize2)
+    def readWindow(row0, row1, col0, col1):
+        # read directly into float32 arrays, rather than converting copies of the native data type windows
+        I1 = np.empty((row1-row0, col1-col0), dtype=np.float32)
+        I2 = np.empty((row1-row0, col1-col0), dtype=np.float32)
+        DS1.GetRasterBand(1).ReadAsArray(x1a+col0, y1a+row0, col1-col0, row1-row0, buf_obj=I1)
+        DS2.GetRasterBand(1).ReadAsArray(x2a+col0, y2a+row0, col1-col0, row1-row0, buf_obj=I2)
+        return I1, I2
 
-    I1 = I1.astype(np.float32)
-    I2 = I2.astype(np.float32)
+    return (min(ysize1, ysize2), min(xsize1, xsize2)), readWindow
 
-    DS1=None
-    DS2=None
 
-    return I1, I2
+def openProduct(file_m, file_s):
+    '''
+    Open the products for windowed reads.
+    '''
+    import numpy as np
+
+    if file_m.endswith('.vrt'):
+        from hyp3_autorift.slc import raster_shape, read_amplitude
+
+        def readWindow(row0, row1, col0, col1):
+            window = (row0, row1, col0, col1)
+            return read_amplitude(file_m, window), read_amplitude(file_s, window)
+
+        return raster_shape(file_m), readWindow
+
+    data_m = loadProduct(file_m, amplitude_dtype=None)
+    data_s = loadProduct(file_s, amplitude_dtype=None)
+
+    def readWindow(row0, row1, col0, col1):
+        return np.array(data_m[row0:row1, col0:col1]), np.array(data_s[row0:row1, col0:col1])
+
+    return data_m.shape, readWindow
+
+
+def maskZeroValues(I1, I2, xGrid, yGrid, noDataMask, nodata):
+    '''
+    Mask (in place) the grid points where either image is zero.
+    '''
+    validGrid = (yGrid != nodata) & (xGrid != nodata)
+    yIndex = yGrid[validGrid] - 1
+    xIndex = xGrid[validGrid] - 1
+    noDataMask[validGrid] |= (I1[yIndex, xIndex] == 0) | (I2[yIndex, xIndex] == 0)
+
+    return noDataMask
 
 
 def runAutorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0, noDataMask, optflag,
-                nodata, mpflag, geogrid_run_info=None):
+                nodata, mpflag, geogrid_run_info=None, scale_chip_size_y=None, preprocessed=None,
+                oversample='default'):
     '''
     Wire and run geogrid.
+
+    If the preprocessed images are provided, I1 and I2 only need to be zero where the raw images are.
+    The OverSampleRatio is chosen by the oversample policy (see hyp3_autorift.oversampling).
     '''
 
 #    import isce
@@ -141,7 +305,6 @@ def runAutorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CS
     import numpy as np
 #    import isceobj
     import time
-    import subprocess
 
 
     obj = autoRIFT()
@@ -153,13 +316,18 @@ def runAutorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CS
 
     obj.MultiThread = mpflag
 
-    # take the amplitude only for the radar images
+    # take the amplitude only for the radar images (unless they've been loaded as amplitude)
     if optflag == 0:
-        I1 = np.abs(I1)
-        I2 = np.abs(I2)
-
-    obj.I1 = I1
-    obj.I2 = I2
+        if np.iscomplexobj(I1):
+            I1 = np.abs(I1)
+        if np.iscomplexobj(I2):
+            I2 = np.abs(I2)
+
+    if preprocessed is None:
+        obj.I1 = I1
+        obj.I2 = I2
+    else:
+        obj.I1, obj.I2 = preprocessed
 
     # test with lena image (533 X 533)
 #    obj.ChipSizeMinX=16
@@ -196,11 +364,7 @@ def runAutorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CS
 
 
     # generate the nodata mask where offset searching will be skipped based on 1) imported nodata mask and/or 2) zero values in the image
-    for ii in range(obj.xGrid.shape[0]):
-        for jj in range(obj.xGrid.shape[1]):
-            if (obj.yGrid[ii,jj] != nodata)&(obj.xGrid[ii,jj] != nodata):
-                if (I1[obj.yGrid[ii,jj]-1,obj.xGrid[ii,jj]-1]==0)|(I2[obj.yGrid[ii,jj]-1,obj.xGrid[ii,jj]-1]==0):
-                    noDataMask[ii,jj] = True
+    maskZeroValues(I1, I2, obj.xGrid, obj.yGrid, noDataMask, nodata)
 
 
 
@@ -226,23 +390,21 @@ def runAutorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CS
         obj.ChipSizeMinX = CSMINx0
 
         if geogrid_run_info is None:
-            gridspacingx = float(str.split(subprocess.getoutput('fgrep "Grid spacing in m:" testGeogrid.txt'))[-1])
-            chipsizex0 = float(str.split(subprocess.getoutput('fgrep "Smallest Allowable Chip Size in m:" testGeogrid.txt'))[-1])
-            try:
-                pixsizex = float(str.split(subprocess.getoutput('fgrep "Ground range pixel size:" testGeogrid.txt'))[-1])
-            except:
-                pixsizex = float(str.split(subprocess.getoutput('fgrep "X-direction pixel size:" testGeogrid.txt'))[-1])
-        else:
-            gridspacingx = geogrid_run_info['gridspacingx']
-            chipsizex0 = geogrid_run_info['chipsizex0']
-            pixsizex = geogrid_run_info['XPixelSize']
+            from hyp3_autorift.geogrid_info import load_run_info
+            geogrid_run_info = load_run_info()
+        gridspacingx = geogrid_run_info['gridspacingx']
+        chipsizex0 = geogrid_run_info['chipsizex0']
+        pixsizex = geogrid_run_info['XPixelSize']
 
         obj.ChipSize0X = int(np.ceil(chipsizex0/pixsizex/4)*4)
         obj.GridSpacingX = int(obj.ChipSize0X*gridspacingx/chipsizex0)
 
 #        obj.ChipSize0X = np.min(CSMINx0[CSMINx0!=nodata])
-        RATIO_Y2X = CSMINy0/CSMINx0
-        obj.ScaleChipSizeY = np.median(RATIO_Y2X[(CSMINx0!=nodata)&(CSMINy0!=nodata)])
+        if scale_chip_size_y is None:
+            RATIO_Y2X = CSMINy0/CSMINx0
+            obj.ScaleChipSizeY = np.median(RATIO_Y2X[(CSMINx0!=nodata)&(CSMINy0!=nodata)])
+        else:
+            obj.ScaleChipSizeY = scale_chip_size_y
 #        obj.ChipSizeMaxX = obj.ChipSizeMaxX / obj.ChipSizeMaxX * 544
 #        obj.ChipSizeMinX = obj.ChipSizeMinX / obj.ChipSizeMinX * 68
     else:
@@ -279,35 +441,40 @@ def runAutorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CS
 
 
     ######## preprocessing
-    t1 = time.time()
-    print("Pre-process Start!!!")
-#    obj.zeroMask = 1
-    obj.preprocess_filt_hps()
-#    obj.I1 = np.abs(I1)
-#    obj.I2 = np.abs(I2)
-    print("Pre-process Done!!!")
-    print(time.time()-t1)
+    if preprocessed is None:
+        # uint16 radar amplitudes (see amplitude_dtype) are converted only now, when preprocessing needs floats
+        if not np.issubdtype(obj.I1.dtype, np.floating):
+            obj.I1 = obj.I1.astype(np.float32)
+        if not np.issubdtype(obj.I2.dtype, np.floating):
+            obj.I2 = obj.I2.astype(np.float32)
 
-    t1 = time.time()
-#    obj.DataType = 0
-    obj.uniform_data_type()
-    print("Uniform Data Type Done!!!")
-    print(time.time()-t1)
+        t1 = time.time()
+        print("Pre-process Start!!!")
+#        obj.zeroMask = 1
+        obj.preprocess_filt_hps()
+#        obj.I1 = np.abs(I1)
+#        obj.I2 = np.abs(I2)
+        print("Pre-process Done!!!")
+        print(time.time()-t1)
+
+        t1 = time.time()
+#        obj.DataType = 0
+        obj.uniform_data_type()
+        print("Uniform Data Type Done!!!")
+        print(time.time()-t1)
 
 #    pdb.set_trace()
 
 #    obj.sparseSearchSampleRate = 16
 
-    obj.OverSampleRatio = 64
+    from hyp3_autorift.oversampling import oversample_ratio
+    obj.OverSampleRatio = oversample_ratio(oversample)
 
     #   OverSampleRatio can be assigned as a scalar (such as the above line) or as a Python dictionary below for intellgient use (ChipSize-dependent).
     #   Here, four chip sizes are used: ChipSize0X*[1,2,4,8] and four OverSampleRatio are considered [16,32,64,128]. The intelligent selection of OverSampleRatio (as a function of chip size) was determined by analyzing various combinations of (OverSampleRatio and chip size) and comparing the resulting image quality and statistics with the reference scenario (where the largest OverSampleRatio of 128 and chip size of ChipSize0X*8 are considered).
     #   The selection for the optical data flag is based on Landsat-8 data over an inland region (thus stable and not moving much) of Greenland, while that for the radar flag (optflag = 0) is based on Sentinel-1 data over the same region of Greenland.
     if CSMINx0 is not None:
-        if (optflag == 1):
-            obj.OverSampleRatio = {obj.ChipSize0X:16,obj.ChipSize0X*2:32,obj.ChipSize0X*4:64,obj.ChipSize0X*8:64}
-        else:
-            obj.OverSampleRatio = {obj.ChipSize0X:32,obj.ChipSize0X*2:64,obj.ChipSize0X*4:128,obj.ChipSize0X*8:128}
+        obj.OverSampleRatio = oversample_ratio(oversample, optical=optflag == 1, chip_size0=obj.ChipSize0X)
 
 
 
@@ -394,7 +561,7 @@ def main():
 
 def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search_range, chip_size_min, chip_size_max,
                             offset2vx, offset2vy, stable_surface_mask, optical_flag, nc_sensor, mpflag, ncname,
-                            geogrid_run_info=None, **kwargs):
+                            geogrid_run_info=None, memory_limit=None, **kwargs):
 
     import numpy as np
     import time
@@ -402,16 +569,29 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
     # from components.contrib.geo_autoRIFT.autoRIFT import __version__ as version
     from autoRIFT import __version__ as version
 
-    if optical_flag == 1:
-        data_m, data_s = loadProductOptical(indir_m, indir_s)
+    preprocessed = None
+    oversample = kwargs.get('oversample', 'default')
+    tiled = memory_limit is not None and None not in (grid_location, init_offset, search_range, chip_size_min,
+                                                          chip_size_max)
+    if tiled:
+        # image windows are read tile by tile
+        data_m, data_s = None, None
+    elif optical_flag == 1:
+        from hyp3_autorift import preprocessing
+        if preprocessing.is_enabled():
+            # preprocessed images are cached, and shared by the pairs a scene is in
+            data_m, data_s, preprocessed = loadPreprocessedOptical(indir_m, indir_s)
+        else:
+            data_m, data_s = loadProductOptical(indir_m, indir_s)
         # test with lena/Venus image
 #        import scipy.io as sio
 #        conts = sio.loadmat(indir_m)
 #        data_m = conts['I']
 #        data_s = conts['I1']
     else:
-        data_m = loadProduct(indir_m)
-        data_s = loadProduct(indir_s)
+        amplitude_dtype = kwargs.get('amplitude_dtype', 'float32')
+        data_m = loadProduct(indir_m, amplitude_dtype=amplitude_dtype)
+        data_s = loadProduct(indir_s, amplitude_dtype=amplitude_dtype)
 
 
 
@@ -489,10 +669,21 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
 
 
 
-    Dx, Dy, InterpMask, ChipSizeX, ScaleChipSizeY, SearchLimitX, SearchLimitY, origSize, noDataMask = runAutorift(
-        data_m, data_s, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0,
-        noDataMask, optical_flag, nodata, mpflag, geogrid_run_info=geogrid_run_info,
-    )
+    if tiled:
+        from hyp3_autorift.tiling import run_tiled
+        # tiles are distributed across mpflag processes, and each tile is run single-threaded
+        openProductWindows = openProductOptical if optical_flag == 1 else openProduct
+        Dx, Dy, InterpMask, ChipSizeX, ScaleChipSizeY, SearchLimitX, SearchLimitY, origSize, noDataMask = run_tiled(
+            runAutorift, openProductWindows, (indir_m, indir_s), memory_limit * 2**30, xGrid, yGrid, Dx0, Dy0,
+            SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0, noDataMask, optical_flag, nodata,
+            workers=max(mpflag, 1), geogrid_run_info=geogrid_run_info, oversample=oversample,
+        )
+    else:
+        Dx, Dy, InterpMask, ChipSizeX, ScaleChipSizeY, SearchLimitX, SearchLimitY, origSize, noDataMask = runAutorift(
+            data_m, data_s, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0,
+            noDataMask, optical_flag, nodata, mpflag, geogrid_run_info=geogrid_run_info, preprocessed=preprocessed,
+            oversample=oversample,
+        )
 
     if optical_flag == 0:
         Dy = -Dy
@@ -606,65 +797,28 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
 
             if nc_sensor is not None:
                 if geogrid_run_info is None:
-                    vxrefname = str.split(runCmd('fgrep "Velocities:" testGeogrid.txt'))[1]
-                    vyrefname = str.split(runCmd('fgrep "Velocities:" testGeogrid.txt'))[2]
-                    sxname = str.split(runCmd('fgrep "Slopes:" testGeogrid.txt'))[1][:-4]+"s.tif"
-                    syname = str.split(runCmd('fgrep "Slopes:" testGeogrid.txt'))[2][:-4]+"s.tif"
-                    maskname = str.split(runCmd('fgrep "Slopes:" testGeogrid.txt'))[2][:-8]+"sp.tif"
-                    xoff = int(str.split(runCmd('fgrep "Origin index (in DEM) of geogrid:" testGeogrid.txt'))[6])
-                    yoff = int(str.split(runCmd('fgrep "Origin index (in DEM) of geogrid:" testGeogrid.txt'))[7])
-                    xcount = int(str.split(runCmd('fgrep "Dimensions of geogrid:" testGeogrid.txt'))[3])
-                    ycount = int(str.split(runCmd('fgrep "Dimensions of geogrid:" testGeogrid.txt'))[5])
-                    cen_lat = int(100*float(str.split(runCmd('fgrep "Scene-center lat/lon:" testGeogrid.txt'))[2]))/100
-                    cen_lon = int(100*float(str.split(runCmd('fgrep "Scene-center lat/lon:" testGeogrid.txt'))[3]))/100
-                else:
-                    vxrefname = geogrid_run_info['vxname']
-                    vyrefname = geogrid_run_info['vyname']
-                    sxname = geogrid_run_info['sxname']
-                    syname = geogrid_run_info['syname']
-                    maskname = geogrid_run_info['maskname']
-                    xoff = geogrid_run_info['xoff']
-                    yoff = geogrid_run_info['yoff']
-                    xcount = geogrid_run_info['xcount']
-                    ycount = geogrid_run_info['ycount']
-                    cen_lat = int(100*geogrid_run_info['cen_lat'])/100
-                    cen_lon = int(100*geogrid_run_info['cen_lon'])/100
-
-                ds = gdal.Open(vxrefname)
-                band = ds.GetRasterBand(1)
-                VXref = band.ReadAsArray(xoff, yoff, xcount, ycount)
-                ds = None
-                band = None
-
-                ds = gdal.Open(vyrefname)
-                band = ds.GetRasterBand(1)
-                VYref = band.ReadAsArray(xoff, yoff, xcount, ycount)
-                ds = None
-                band = None
-
-                ds = gdal.Open(sxname)
-                band = ds.GetRasterBand(1)
-                SX = band.ReadAsArray(xoff, yoff, xcount, ycount)
-                ds = None
-                band = None
-
-                ds = gdal.Open(syname)
-                band = ds.GetRasterBand(1)
-                SY = band.ReadAsArray(xoff, yoff, xcount, ycount)
-                ds = None
-                band = None
-
-                ds = gdal.Open(maskname)
-                band = ds.GetRasterBand(1)
-                MM = band.ReadAsArray(xoff, yoff, xcount, ycount)
-                ds = None
-                band = None
+                    from hyp3_autorift.geogrid_info import load_run_info
+                    geogrid_run_info = load_run_info()
+                vxrefname = geogrid_run_info['vxname']
+                vyrefname = geogrid_run_info['vyname']
+                sxname = geogrid_run_info['sxname']
+                syname = geogrid_run_info['syname']
+                maskname = geogrid_run_info['maskname']
+                xoff = geogrid_run_info['xoff']
+                yoff = geogrid_run_info['yoff']
+                xcount = geogrid_run_info['xcount']
+                ycount = geogrid_run_info['ycount']
+                cen_lat = int(100*geogrid_run_info['cen_lat'])/100
+                cen_lon = int(100*geogrid_run_info['cen_lon'])/100
+
+                from hyp3_autorift.raster import read_windows
+                VXref, VYref, SX, SY, MM = read_windows(
+                    [vxrefname, vyrefname, sxname, syname, maskname], xoff, yoff, xcount, ycount
+                )
 
                 DXref = offset2vy_2 / (offset2vx_1 * offset2vy_2 - offset2vx_2 * offset2vy_1) * VXref - offset2vx_2 / (offset2vx_1 * offset2vy_2 - offset2vx_2 * offset2vy_1) * VYref
                 DYref = offset2vx_1 / (offset2vx_1 * offset2vy_2 - offset2vx_2 * offset2vy_1) * VYref - offset2vy_1 / (offset2vx_1 * offset2vy_2 - offset2vx_2 * offset2vy_1) * VXref
 
-                stable_count = np.sum(SSM & np.logical_not(np.isnan(DX)) & (DX-DXref > -5) & (DX-DXref < 5) & (DY-DYref > -5) & (DY-DYref < 5))
-
                 V_temp = np.sqrt(VX**2 + VY**2)
                 try:
                     V_temp_threshold = np.percentile(V_temp[np.logical_not(np.isnan(V_temp))],25)
@@ -672,7 +826,14 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
                 except IndexError:
                     SSM1 = np.zeros(V_temp.shape).astype('bool')
 
-                stable_count1 = np.sum(SSM1 & np.logical_not(np.isnan(DX)) & (DX-DXref > -5) & (DX-DXref < 5) & (DY-DYref > -5) & (DY-DYref < 5))
+                # gather the offset differences over both stable surface masks once, rather than per statistic
+                from hyp3_autorift.masked_stats import MaskedStatistics
+                stable = MaskedStatistics({'SSM': SSM, 'SSM1': SSM1})
+                DX_diff = stable.gather(DX, DXref)
+                DY_diff = stable.gather(DY, DYref)
+
+                stable_count = stable.count('SSM', DX_diff, DY_diff, bounds=(-5, 5))
+                stable_count1 = stable.count('SSM1', DX_diff, DY_diff, bounds=(-5, 5))
 
                 dx_mean_shift = 0.0
                 dy_mean_shift = 0.0
@@ -680,22 +841,14 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
                 dy_mean_shift1 = 0.0
 
                 if stable_count != 0:
-                    temp = DX.copy() - DXref.copy()
-                    temp[np.logical_not(SSM)] = np.nan
-                    dx_mean_shift = np.median(temp[(temp > -5)&(temp < 5)])
-
-                    temp = DY.copy() - DYref.copy()
-                    temp[np.logical_not(SSM)] = np.nan
-                    dy_mean_shift = np.median(temp[(temp > -5)&(temp < 5)])
+                    dx_mean_shift = stable.median(DX_diff, 'SSM', bounds=(-5, 5))
+                    dy_mean_shift = stable.median(DY_diff, 'SSM', bounds=(-5, 5))
 
                 if stable_count1 != 0:
-                    temp = DX.copy() - DXref.copy()
-                    temp[np.logical_not(SSM1)] = np.nan
-                    dx_mean_shift1 = np.median(temp[(temp > -5)&(temp < 5)])
+                    dx_mean_shift1 = stable.median(DX_diff, 'SSM1', bounds=(-5, 5))
+                    dy_mean_shift1 = stable.median(DY_diff, 'SSM1', bounds=(-5, 5))
 
-                    temp = DY.copy() - DYref.copy()
-                    temp[np.logical_not(SSM1)] = np.nan
-                    dy_mean_shift1 = np.median(temp[(temp > -5)&(temp < 5)])
+                del stable, DX_diff, DY_diff
 
                 if stable_count == 0:
                     if stable_count1 == 0:
@@ -718,27 +871,22 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
             ########################################################################################
                 ############   netCDF packaging for Sentinel and Landsat dataset; can add other sensor format as well
                 if nc_sensor == "S":
-                    if geogrid_run_info is None:
-                        chipsizex0 = float(str.split(runCmd('fgrep "Smallest Allowable Chip Size in m:" testGeogrid.txt'))[-1])
-                        rangePixelSize = float(str.split(runCmd('fgrep "Ground range pixel size:" testGeogrid.txt'))[4])
-                        azimuthPixelSize = float(str.split(runCmd('fgrep "Azimuth pixel size:" testGeogrid.txt'))[3])
-                        dt = float(str.split(runCmd('fgrep "Repeat Time:" testGeogrid.txt'))[2])
-                        epsg = float(str.split(runCmd('fgrep "EPSG:" testGeogrid.txt'))[1])
-                        #  print (str(rangePixelSize)+"      "+str(azimuthPixelSize))
-                    else:
-                        chipsizex0 = geogrid_run_info['chipsizex0']
-                        rangePixelSize = geogrid_run_info['XPixelSize']
-                        azimuthPixelSize = geogrid_run_info['YPixelSize']
-                        dt = geogrid_run_info['dt']
-                        epsg = geogrid_run_info['epsg']
-
-                    runCmd('topsinsar_filename.py')
-    #                import scipy.io as sio
-                    conts = sio.loadmat('topsinsar_filename.mat')
-                    master_filename = conts['reference_filename'][0]
-                    slave_filename = conts['secondary_filename'][0]
-                    master_dt = conts['reference_dt'][0]
-                    slave_dt = conts['secondary_dt'][0]
+                    chipsizex0 = geogrid_run_info['chipsizex0']
+                    rangePixelSize = geogrid_run_info['XPixelSize']
+                    azimuthPixelSize = geogrid_run_info['YPixelSize']
+                    dt = geogrid_run_info['dt']
+                    epsg = geogrid_run_info['epsg']
+
+                    topsinsar_metadata = kwargs.get('topsinsar_metadata')
+                    if topsinsar_metadata is None:
+                        runCmd('topsinsar_filename.py')
+    #                    import scipy.io as sio
+                        conts = sio.loadmat('topsinsar_filename.mat')
+                        topsinsar_metadata = {key: conts[key][0] for key in ['reference_filename', 'secondary_filename', 'reference_dt', 'secondary_dt']}
+                    master_filename = topsinsar_metadata['reference_filename']
+                    slave_filename = topsinsar_metadata['secondary_filename']
+                    master_dt = topsinsar_metadata['reference_dt']
+                    slave_dt = topsinsar_metadata['secondary_dt']
                     master_split = str.split(master_filename,'_')
                     slave_split = str.split(slave_filename,'_')
 
@@ -786,16 +934,10 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
                     )
 
                 elif nc_sensor == "L":
-                    if geogrid_run_info is None:
-                        chipsizex0 = float(str.split(runCmd('fgrep "Smallest Allowable Chip Size in m:" testGeogrid.txt'))[-1])
-                        XPixelSize = float(str.split(runCmd('fgrep "X-direction pixel size:" testGeogrid.txt'))[3])
-                        YPixelSize = float(str.split(runCmd('fgrep "Y-direction pixel size:" testGeogrid.txt'))[3])
-                        epsg = float(str.split(runCmd('fgrep "EPSG:" testGeogrid.txt'))[1])
-                    else:
-                        chipsizex0 = geogrid_run_info['chipsizex0']
-                        XPixelSize = geogrid_run_info['XPixelSize']
-                        YPixelSize = geogrid_run_info['YPixelSize']
-                        epsg = geogrid_run_info['epsg']
+                    chipsizex0 = geogrid_run_info['chipsizex0']
+                    XPixelSize = geogrid_run_info['XPixelSize']
+                    YPixelSize = geogrid_run_info['YPixelSize']
+                    epsg = geogrid_run_info['epsg']
 
                     master_path = indir_m
                     slave_path = indir_s
@@ -865,16 +1007,10 @@ def generateAutoriftProduct(indir_m, indir_s, grid_location, init_offset, search
                     )
 
                 elif nc_sensor == "S2":
-                    if geogrid_run_info is None:
-                        chipsizex0 = float(str.split(runCmd('fgrep "Smallest Allowable Chip Size in m:" testGeogrid.txt'))[-1])
-                        XPixelSize = float(str.split(runCmd('fgrep "X-direction pixel size:" testGeogrid.txt'))[3])
-                        YPixelSize = float(str.split(runCmd('fgrep "Y-direction pixel size:" testGeogrid.txt'))[3])
-                        epsg = float(str.split(runCmd('fgrep "EPSG:" testGeogrid.txt'))[1])
-                    else:
-                        chipsizex0 = geogrid_run_info['chipsizex0']
-                        XPixelSize = geogrid_run_info['XPixelSize']
-                        YPixelSize = geogrid_run_info['YPixelSize']
-                        epsg = geogrid_run_info['epsg']
+                    chipsizex0 = geogrid_run_info['chipsizex0']
+                    XPixelSize = geogrid_run_info['XPixelSize']
+                    YPixelSize = geogrid_run_info['YPixelSize']
+                    epsg = geogrid_run_info['epsg']
 
                     master_path = indir_m
                     slave_path = indir_s
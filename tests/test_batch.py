@@ -0,0 +1,94 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from hyp3_autorift import batch, cache, preprocessing
+
+REFERENCE = 'LC08_L1TP_009011_20200703_20200913_02_T1'
+SECONDARY = 'LC08_L1TP_009011_20200719_20200913_02_T1'
+
+
+def test_load_manifest_csv(tmp_path):
+    manifest = tmp_path / 'pairs.csv'
+    manifest.write_text(f'reference,secondary,name\n{SECONDARY},{REFERENCE},\n{REFERENCE},{SECONDARY},second\n')
+
+    assert batch.load_manifest(manifest) == [
+        {'name': f'{REFERENCE}_{SECONDARY}', 'reference': REFERENCE, 'secondary': SECONDARY},
+        {'name': 'second', 'reference': REFERENCE, 'secondary': SECONDARY},
+    ]
+
+
+def test_load_manifest_json(tmp_path):
+    manifest = tmp_path / 'pairs.json'
+    manifest.write_text(json.dumps({'pairs': [{'reference': REFERENCE, 'secondary': SECONDARY, 'name': 'a'}]}))
+    assert batch.load_manifest(manifest) == [{'name': 'a', 'reference': REFERENCE, 'secondary': SECONDARY}]
+
+    manifest.write_text(json.dumps([{'reference': REFERENCE}]))
+    with pytest.raises(ValueError):
+        batch.load_manifest(manifest)
+
+    manifest.write_text(json.dumps([{'reference': REFERENCE, 'secondary': SECONDARY}] * 2))
+    with pytest.raises(ValueError):
+        batch.load_manifest(manifest)
+
+
+def test_run_batch(tmp_path, monkeypatch):
+    manifest = tmp_path / 'pairs.json'
+    manifest.write_text(json.dumps([
+        {'reference': REFERENCE, 'secondary': SECONDARY, 'name': 'good'},
+        {'reference': REFERENCE, 'secondary': SECONDARY, 'name': 'bad'},
+    ]))
+
+    def mock_process(reference, secondary, metrics, parameter_file):
+        with metrics.stage('autoRIFT'):
+            if Path.cwd().name == 'bad':
+                raise RuntimeError('no valid chips')
+            Path('product.nc').touch()
+            Path('product.png').touch()
+        return Path('product.nc'), Path('product.png')
+
+    monkeypatch.setattr(batch, 'process', mock_process)
+    monkeypatch.delenv(cache.CACHE_SIZE_ENV, raising=False)
+    monkeypatch.delenv(preprocessing.PREPROCESSING_CACHE_ENV, raising=False)
+    results = batch.run_batch(manifest, tmp_path / 'batch', parameter_file='parameters.shp')
+    assert cache.is_enabled()
+    assert preprocessing.is_enabled()
+
+    assert [result['status'] for result in results] == ['succeeded', 'failed']
+    assert results[0]['product_file'] == str((tmp_path / 'batch' / 'good' / 'product.nc').resolve())
+    assert results[1]['error'] == 'RuntimeError: no valid chips'
+    assert all('autoRIFT' in result['stages'] for result in results)
+    assert 'autoRIFT' in json.loads((tmp_path / 'batch' / 'bad' / batch.METRICS_FILE).read_text())['stages']
+
+    assert json.loads((tmp_path / 'batch' / batch.RESULTS_FILE).read_text()) == results
+
+
+def test_process_pair_shares_scenes(tmp_path, monkeypatch):
+    reference = 'S1A_IW_SLC__1SSH_20170221T204710_20170221T204737_015387_0193F6_AB07'
+    secondary = 'S1B_IW_SLC__1SSH_20170227T204628_20170227T204655_004491_007D11_6654'
+    (tmp_path / batch.SCENE_DIR).mkdir()
+    (tmp_path / batch.SCENE_DIR / f'{reference}.zip').write_bytes(b'reference')
+
+    def mock_process(reference, secondary, metrics):
+        assert Path(f'{reference}.zip').read_bytes() == b'reference'
+        Path(f'{secondary}.zip').write_bytes(b'secondary')
+        return Path('product.nc'), Path('product.png')
+
+    monkeypatch.setattr(batch, 'process', mock_process)
+    result = batch.process_pair({'name': 'pair', 'reference': reference, 'secondary': secondary}, tmp_path)
+
+    assert result['status'] == 'succeeded'
+    assert (tmp_path / batch.SCENE_DIR / f'{secondary}.zip').read_bytes() == b'secondary'
+
+
+def test_link_files(tmp_path):
+    (tmp_path / 'a.zip').write_bytes(b'a')
+    (tmp_path / 'shared').mkdir()
+    (tmp_path / 'shared' / 'b.zip').write_bytes(b'shared')
+    (tmp_path / 'b.zip').write_bytes(b'b')
+
+    batch.link_files([tmp_path / 'a.zip', tmp_path / 'b.zip', tmp_path / 'c.zip'], tmp_path / 'shared')
+    assert (tmp_path / 'shared' / 'a.zip').samefile(tmp_path / 'a.zip')
+    assert (tmp_path / 'shared' / 'b.zip').read_bytes() == b'shared'
+    assert not (tmp_path / 'shared' / 'c.zip').exists()
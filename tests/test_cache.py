@@ -0,0 +1,123 @@
+import os
+
+import pytest
+import requests
+import responses
+
+from hyp3_autorift import cache
+
+URL = 'https://example.com/autorift_parameters/v001/parameters.shp'
+
+
+def test_get_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path))
+    assert cache.get_cache_dir() == tmp_path
+
+    monkeypatch.delenv(cache.CACHE_DIR_ENV)
+    assert cache.get_cache_dir().name == 'hyp3_autorift'
+
+
+def test_cached_path(tmp_path):
+    shp = cache.cached_path(URL, tmp_path)
+    dbf = cache.cached_path(URL.replace('.shp', '.dbf'), tmp_path)
+    assert shp.name == 'parameters.shp'
+    assert shp.parent == dbf.parent
+    assert shp.parent.parent == tmp_path
+
+    other = cache.cached_path('https://example.com/autorift_parameters/v002/parameters.shp', tmp_path)
+    assert other.parent != shp.parent
+
+
+@responses.activate
+def test_fetch(tmp_path):
+    responses.add(responses.GET, URL, body=b'foo', status=200, headers={'ETag': '"abc"'})
+    path = cache.fetch(URL, tmp_path)
+    assert path.read_bytes() == b'foo'
+
+    responses.replace(responses.GET, URL, status=304)
+    assert cache.fetch(URL, tmp_path) == path
+    assert path.read_bytes() == b'foo'
+    assert responses.calls[-1].request.headers['If-None-Match'] == '"abc"'
+
+    responses.replace(responses.GET, URL, body=b'bar', status=200, headers={'ETag': '"def"'})
+    assert cache.fetch(URL, tmp_path).read_bytes() == b'bar'
+    assert all(call.request.req_kwargs['timeout'] == cache.REQUEST_TIMEOUT for call in responses.calls)
+
+
+@responses.activate
+def test_fetch_offline(tmp_path):
+    responses.add(responses.GET, URL, body=requests.exceptions.ConnectionError())
+    with pytest.raises(requests.exceptions.ConnectionError):
+        cache.fetch(URL, tmp_path)
+
+    responses.replace(responses.GET, URL, body=b'foo', status=200, headers={'Last-Modified': 'yesterday'})
+    path = cache.fetch(URL, tmp_path)
+
+    responses.replace(responses.GET, URL, body=requests.exceptions.ConnectionError())
+    assert cache.fetch(URL, tmp_path) == path
+    assert responses.calls[-1].request.headers['If-Modified-Since'] == 'yesterday'
+
+
+def test_get_cache_size(monkeypatch):
+    monkeypatch.setenv(cache.CACHE_SIZE_ENV, '0.5')
+    assert cache.get_cache_size() == 2**29
+
+    monkeypatch.delenv(cache.CACHE_SIZE_ENV)
+    assert cache.get_cache_size() == cache.DEFAULT_CACHE_SIZE * 2**30
+
+
+def test_is_enabled(monkeypatch):
+    monkeypatch.delenv(cache.CACHE_SIZE_ENV, raising=False)
+    assert not cache.is_enabled()
+
+    monkeypatch.setenv(cache.CACHE_SIZE_ENV, '0')
+    assert not cache.is_enabled()
+
+    monkeypatch.setenv(cache.CACHE_SIZE_ENV, '0.5')
+    assert cache.is_enabled()
+
+
+@responses.activate
+def test_fetch_blob(tmp_path):
+    tif = 'https://example.com/autorift_parameters/v001/ANT240m_vx.tif'
+    responses.add(responses.HEAD, tif, status=200, headers={'ETag': '"abc"'})
+    responses.add(responses.GET, tif, body=b'foo', status=200, headers={'ETag': '"abc"'})
+
+    path = cache.fetch_blob(tif, tmp_path, cache_size=2**30)
+    assert path.name == 'ANT240m_vx.tif'
+    assert path.read_bytes() == b'foo'
+
+    assert cache.fetch_blob(tif, tmp_path, cache_size=2**30) == path
+    assert [call.request.method for call in responses.calls] == ['HEAD', 'GET', 'HEAD']
+
+    responses.replace(responses.HEAD, tif, status=200, headers={'ETag': '"def"'})
+    responses.replace(responses.GET, tif, body=b'bar', status=200, headers={'ETag': '"def"'})
+    new_path = cache.fetch_blob(tif, tmp_path, cache_size=2**30)
+    assert new_path != path
+    assert new_path.read_bytes() == b'bar'
+    assert path.read_bytes() == b'foo'
+
+    responses.replace(responses.HEAD, tif, body=requests.exceptions.ConnectionError())
+    assert cache.fetch_blob(tif, tmp_path, cache_size=2**30) == new_path
+
+
+def test_evict(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, 'EVICTION_GRACE_PERIOD', 0)
+    assert cache.evict(tmp_path, 0) == 0
+
+    paths = []
+    for ii, key in enumerate(['aa01', 'bb02', 'cc03']):
+        path = tmp_path / 'blobs' / key[:2] / key / 'blob.tif'
+        path.parent.mkdir(parents=True)
+        path.write_bytes(b'x' * 10)
+        os.utime(path, (1000 + ii, 1000 + ii))
+        paths.append(path)
+
+    assert cache.evict(tmp_path, 30) == 0
+    assert cache.evict(tmp_path, 20, keep=paths[0]) == 10
+    assert [path.exists() for path in paths] == [True, False, True]
+
+    monkeypatch.setattr(cache, 'EVICTION_GRACE_PERIOD', 3600)
+    os.utime(paths[0], None)
+    assert cache.evict(tmp_path, 0) == 10
+    assert [path.exists() for path in paths] == [True, False, False]
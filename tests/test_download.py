@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+import requests
+import responses
+
+from hyp3_autorift import cache, download
+
+URL = 'https://example.com/S1A_IW_SLC__1SSH_20170221T204710_20170221T204737_015387_0193F6_AB07.zip'
+
+
+@responses.activate
+def test_download_file(tmp_path):
+    responses.add(responses.GET, URL, body=b'0123456789', status=200)
+
+    path = download.download_file(URL, directory=tmp_path, chunk_size=3)
+    assert path == tmp_path / 'S1A_IW_SLC__1SSH_20170221T204710_20170221T204737_015387_0193F6_AB07.zip'
+    assert path.read_bytes() == b'0123456789'
+    assert not path.with_name(f'{path.name}.part').exists()
+
+    assert download.download_file(URL, directory=tmp_path) == path
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_download_file_resume(tmp_path):
+    partial = tmp_path / f'{URL.rsplit("/", 1)[-1]}.part'
+    partial.write_bytes(b'01234')
+
+    def ranged(request):
+        assert request.headers['Range'] == 'bytes=5-'
+        return 206, {'Content-Range': 'bytes 5-9/10'}, b'56789'
+
+    responses.add_callback(responses.GET, URL, callback=ranged)
+    path = download.download_file(URL, directory=tmp_path)
+    assert path.read_bytes() == b'0123456789'
+    assert not partial.exists()
+
+
+@responses.activate
+def test_download_file_range_ignored(tmp_path):
+    partial = tmp_path / f'{URL.rsplit("/", 1)[-1]}.part'
+    partial.write_bytes(b'garbage')
+
+    responses.add(responses.GET, URL, body=b'0123456789', status=200)
+    path = download.download_file(URL, directory=tmp_path)
+    assert path.read_bytes() == b'0123456789'
+
+
+@responses.activate
+def test_download_file_already_complete(tmp_path):
+    partial = tmp_path / f'{URL.rsplit("/", 1)[-1]}.part'
+    partial.write_bytes(b'0123456789')
+
+    responses.add(responses.GET, URL, status=416, headers={'Content-Range': 'bytes */10'})
+    path = download.download_file(URL, directory=tmp_path)
+    assert path.read_bytes() == b'0123456789'
+    assert responses.calls[0].request.req_kwargs['timeout'] == cache.REQUEST_TIMEOUT
+
+
+@pytest.mark.parametrize('content_range', ['bytes */8', None])
+@responses.activate
+def test_download_file_range_not_satisfiable(tmp_path, content_range):
+    partial = tmp_path / f'{URL.rsplit("/", 1)[-1]}.part'
+    partial.write_bytes(b'0123456789')
+
+    def respond(request):
+        if 'Range' in request.headers:
+            return 416, {'Content-Range': content_range} if content_range else {}, b''
+        return 200, {}, b'01234567'
+
+    responses.add_callback(responses.GET, URL, callback=respond)
+    path = download.download_file(URL, directory=tmp_path)
+    assert path.read_bytes() == b'01234567'
+    assert not partial.exists()
+    assert len(responses.calls) == 2
+
+
+@responses.activate
+def test_download_file_incomplete(tmp_path):
+    responses.add(responses.GET, URL, body=b'01234', status=200, headers={'Content-Length': '10'},
+                  auto_calculate_content_length=False)
+
+    with pytest.raises(requests.exceptions.RequestException):
+        download.download_file(URL, directory=tmp_path)
+
+
+@responses.activate
+def test_download_file_cancelled(tmp_path):
+    responses.add(responses.GET, URL, body=b'0123456789', status=200)
+    cancel = threading.Event()
+    cancel.set()
+
+    with pytest.raises(download.DownloadCancelled):
+        download.download_file(URL, directory=tmp_path, chunk_size=3, cancel=cancel)
+    assert not (tmp_path / URL.rsplit('/', 1)[-1]).exists()
+    assert (tmp_path / f'{URL.rsplit("/", 1)[-1]}.part').exists()
@@ -0,0 +1,56 @@
+import numpy as np
+
+from hyp3_autorift import geogrid_info
+
+GEOGRID_TEXT = '''Smallest Allowable Chip Size in m: 240
+Grid spacing in m: 120.0
+Velocities: /data/ANT240m_vx0.tif /data/ANT240m_vy0.tif
+Slopes: /data/ANT240m_dhdx.tif /data/ANT240m_dhdy.tif
+Origin index (in DEM) of geogrid: 1230 4560
+Dimensions of geogrid: 800 x 600
+Repeat Time: 518400.0
+EPSG: 3031
+Scene-center lat/lon: -75.123 100.456
+Ground range pixel size: 2.33
+Azimuth pixel size: 13.95
+'''
+
+
+def test_parse_run_info_text():
+    assert geogrid_info.parse_run_info_text(GEOGRID_TEXT) == {
+        'chipsizex0': 240.0,
+        'gridspacingx': 120.0,
+        'vxname': '/data/ANT240m_vx0.tif',
+        'vyname': '/data/ANT240m_vy0.tif',
+        'sxname': '/data/ANT240m_dhdxs.tif',
+        'syname': '/data/ANT240m_dhdys.tif',
+        'maskname': '/data/ANT240m_sp.tif',
+        'xoff': 1230,
+        'yoff': 4560,
+        'xcount': 800,
+        'ycount': 600,
+        'dt': 518400.0,
+        'epsg': 3031.0,
+        'cen_lat': -75.123,
+        'cen_lon': 100.456,
+        'XPixelSize': 2.33,
+        'YPixelSize': 13.95,
+    }
+
+    optical_text = GEOGRID_TEXT.replace('Ground range pixel size: 2.33', 'X-direction pixel size: 15.0') \
+        .replace('Azimuth pixel size: 13.95', 'Y-direction pixel size: -15.0')
+    run_info = geogrid_info.parse_run_info_text(optical_text)
+    assert run_info['XPixelSize'] == 15.0
+    assert run_info['YPixelSize'] == -15.0
+
+
+def test_load_run_info(tmp_path):
+    json_file = tmp_path / 'testGeogrid.json'
+    text_file = tmp_path / 'testGeogrid.txt'
+    text_file.write_text(GEOGRID_TEXT)
+
+    assert geogrid_info.load_run_info(json_file, text_file)['xcount'] == 800
+
+    run_info = {'xcount': np.int64(100), 'XPixelSize': np.float32(15.0), 'vxname': 'vx.tif'}
+    geogrid_info.write_run_info(run_info, json_file)
+    assert geogrid_info.load_run_info(json_file, text_file) == {'xcount': 100, 'XPixelSize': 15.0, 'vxname': 'vx.tif'}
@@ -1,11 +1,15 @@
+from datetime import datetime
+
 import pytest
 from hyp3lib import DemError
 
-from hyp3_autorift import geometry, io
+from hyp3_autorift import cache, geometry, io
 from hyp3_autorift.process import DEFAULT_PARAMETER_FILE
 
 
-def test_find_jpl_parameter_info():
+def test_find_jpl_parameter_info(monkeypatch, tmp_path):
+    monkeypatch.setenv(cache.CACHE_DIR_ENV, str(tmp_path))
+    io.load_parameter_regions.cache_clear()
     lat_limits = (55, 56)
     lon_limits = (40, 41)
     polygon = geometry.polygon_from_bbox(x_limits=lat_limits, y_limits=lon_limits)
@@ -65,3 +69,25 @@ def test_find_jpl_parameter_info():
     polygon = geometry.polygon_from_bbox(x_limits=lat_limits, y_limits=lon_limits)
     with pytest.raises(DemError):
         io.find_jpl_parameter_info(polygon, DEFAULT_PARAMETER_FILE)
+
+
+def test_cache_parameter_file(tmp_path):
+    assert io.cache_parameter_file('parameters.shp', tmp_path) == 'parameters.shp'
+    assert io.cache_parameter_file('/vsis3/bucket/parameters.shp', tmp_path) == '/vsis3/bucket/parameters.shp'
+
+
+def test_topsinsar_metadata():
+    class Info:
+        def __init__(self, sensing_start, sensing_stop):
+            self.sensingStart = sensing_start
+            self.sensingStop = sensing_stop
+
+    reference = Info(datetime(2017, 2, 21, 20, 47, 10), datetime(2017, 2, 21, 20, 47, 38))
+    secondary = Info(datetime(2017, 3, 5, 20, 47, 11), datetime(2017, 3, 5, 20, 47, 39))
+
+    assert io.topsinsar_metadata('/data/reference.zip', 'secondary.zip', reference, secondary) == {
+        'reference_filename': 'reference.zip',
+        'reference_dt': '20170221T20:47:24',
+        'secondary_filename': 'secondary.zip',
+        'secondary_dt': '20170305T20:47:25',
+    }
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from hyp3_autorift.masked_stats import MaskedStatistics
+
+
+def make_grids(shape=(60, 50)):
+    rng = np.random.default_rng(seed=42)
+    dx = rng.normal(scale=3, size=shape).astype(np.float32)
+    dx[rng.random(shape) < 0.1] = np.nan
+    dx_ref = rng.normal(scale=1, size=shape)
+    dx_ref[rng.random(shape) < 0.05] = np.nan
+    ssm = rng.random(shape) < 0.3
+    ssm1 = rng.random(shape) < 0.25
+    return dx, dx_ref, ssm, ssm1
+
+
+def test_masked_statistics_match_full_grid():
+    dx, dx_ref, ssm, ssm1 = make_grids()
+    dy = np.flipud(dx).copy()
+    stable = MaskedStatistics({'SSM': ssm, 'SSM1': ssm1})
+    dx_diff = stable.gather(dx, dx_ref)
+    dy_diff = stable.gather(dy)
+
+    for name, mask in (('SSM', ssm), ('SSM1', ssm1)):
+        temp = dx.copy() - dx_ref.copy()
+        temp[np.logical_not(mask)] = np.nan
+        assert stable.median(dx_diff, name, bounds=(-5, 5)) == np.median(temp[(temp > -5) & (temp < 5)])
+        assert stable.std(dx_diff, name, bounds=(-5, 5)) == np.std(temp[(temp > -5) & (temp < 5)])
+        assert stable.median(dx_diff, name) == np.median(temp[np.logical_not(np.isnan(temp))])
+
+        expected_count = np.sum(mask & np.logical_not(np.isnan(dx)) & (dx - dx_ref > -5) & (dx - dx_ref < 5)
+                                & (dy > -5) & (dy < 5))
+        assert stable.count(name, dx_diff, dy_diff, bounds=(-5, 5)) == expected_count
+        assert stable.count(name, dy_diff) == np.sum(mask & np.logical_not(np.isnan(dy)))
+
+
+def test_masked_statistics_summary():
+    dx, dx_ref, ssm, ssm1 = make_grids()
+    stable = MaskedStatistics({'SSM': ssm, 'SSM1': ssm1, 'none': np.zeros_like(ssm)})
+    summaries = stable.summary(stable.gather(dx, dx_ref), bounds=(-5, 5), percentiles=(25, 75))
+
+    values = (dx - dx_ref)[ssm]
+    values = values[(values > -5) & (values < 5)]
+    assert summaries['SSM'].count == values.size
+    assert summaries['SSM'].median == np.median(values)
+    assert summaries['SSM'].std == np.std(values)
+    assert summaries['SSM'].percentiles == {25: np.percentile(values, 25), 75: np.percentile(values, 75)}
+
+    assert summaries['none'].count == 0
+    assert np.isnan(summaries['none'].median)
+    assert np.isnan(summaries['none'].percentiles[75])
+
+
+def test_masked_statistics_shapes():
+    with pytest.raises(ValueError):
+        MaskedStatistics({'a': np.zeros((2, 3), dtype=bool), 'b': np.zeros((3, 2), dtype=bool)})
+
+    stable = MaskedStatistics({'a': np.ones((2, 3), dtype=bool)})
+    with pytest.raises(ValueError):
+        stable.gather(np.zeros((3, 2)))
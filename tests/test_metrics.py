@@ -0,0 +1,75 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from hyp3_autorift.metrics import COUNTERS, StageMetrics, format_usage, resource_usage, usage_delta
+
+
+def test_stage_metrics():
+    metrics = StageMetrics()
+    with metrics.stage('foo'):
+        pass
+
+    with pytest.raises(ValueError):
+        with metrics.stage('bar'):
+            raise ValueError()
+
+    with ThreadPoolExecutor() as executor:
+        future = executor.submit(metrics.call, 'baz', sum, [1, 2, 3])
+    assert future.result() == 6
+
+    assert list(metrics.stages) == ['foo', 'bar', 'baz']
+    assert all(stage['wall_time'] >= 0 for stage in metrics.stages.values())
+    assert metrics.summary().startswith('foo: 0.0 s, bar: 0.0 s')
+
+
+def test_stage_metrics_usage(tmp_path):
+    metrics = StageMetrics()
+    with metrics.stage('foo'):
+        sum(range(100000))
+        (tmp_path / 'foo.txt').write_text('foo')
+
+    stage = metrics.stages['foo']
+    assert set(stage) == {'wall_time', 'peak_rss_so_far', *COUNTERS}
+    assert stage['cpu_time'] >= 0
+    assert stage['peak_rss_so_far'] > 0
+
+    metrics_file = metrics.write(tmp_path / 'metrics.json')
+    written = json.loads(metrics_file.read_text())
+    assert written['stages'] == metrics.stages
+    assert written['wall_time'] >= stage['wall_time']
+
+
+def test_resource_usage(tmp_path, monkeypatch):
+    proc_io = tmp_path / 'io'
+    proc_io.write_text('rchar: 3980\nwchar: 10\nread_bytes: 4096\nwrite_bytes: 8192\ncancelled_write_bytes: 0\n')
+    net_dev = tmp_path / 'dev'
+    net_dev.write_text(
+        'Inter-|   Receive                                                |  Transmit\n'
+        ' face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls '
+        'carrier compressed\n'
+        '    lo:    1000      10    0    0    0     0          0         0     1000      10    0    0    0     0 '
+        '      0          0\n'
+        '  eth0:    2000      20    0    0    0     0          0         0      300       3    0    0    0     0 '
+        '      0          0\n'
+        '  eth1:      50       1    0    0    0     0          0         0       20       1    0    0    0     0 '
+        '      0          0\n'
+    )
+    monkeypatch.setattr('hyp3_autorift.metrics.PROC_IO', proc_io)
+    monkeypatch.setattr('hyp3_autorift.metrics.PROC_NET_DEV', net_dev)
+
+    usage = resource_usage()
+    assert usage['disk_read_bytes'] == 4096
+    assert usage['disk_write_bytes'] == 8192
+    assert usage['net_received_bytes'] == 2050
+    assert usage['net_sent_bytes'] == 320
+
+    monkeypatch.setattr('hyp3_autorift.metrics.PROC_IO', tmp_path / 'missing')
+    usage = resource_usage()
+    assert usage['disk_read_bytes'] is None
+
+    delta = usage_delta(usage, resource_usage())
+    assert delta['disk_read_bytes'] is None
+    assert delta['net_received_bytes'] == 0
+    assert 'n/a' in format_usage(delta)
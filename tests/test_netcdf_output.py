@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from hyp3_autorift import netcdf_output
+
+
+def monte_carlo_v_error(vx_error, vy_error, samples=4_000_000, seed=42):
+    rng = np.random.default_rng(seed)
+    vx = rng.normal(0, vx_error, samples)
+    vy = rng.normal(0, vy_error, samples)
+    return np.std(np.sqrt(vx**2 + vy**2))
+
+
+@pytest.mark.parametrize('vx_error, vy_error', [(1., 1.), (25.5, 25.5), (3., 40.), (40., 3.), (0.1, 7.5), (5., 0.)])
+def test_v_error_cal(vx_error, vy_error):
+    v_error = netcdf_output.v_error_cal(vx_error, vy_error)
+    assert v_error == pytest.approx(monte_carlo_v_error(vx_error, vy_error), rel=2e-3)
+
+
+def test_v_error_cal_closed_form():
+    # Rayleigh distribution
+    assert netcdf_output.v_error_cal(2., 2.) == pytest.approx(2. * np.sqrt(2 - np.pi / 2))
+    # Half-normal distribution
+    assert netcdf_output.v_error_cal(0., 3.) == pytest.approx(3. * np.sqrt(1 - 2 / np.pi))
+    assert netcdf_output.v_error_cal(0., 0.) == 0.
+
+    assert netcdf_output.v_error_cal(np.float32(3.), 4.) == netcdf_output.v_error_cal(4., 3.)
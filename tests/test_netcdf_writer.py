@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from hyp3_autorift import netcdf_writer
+from hyp3_autorift.netcdf_writer import Compression
+
+
+def test_compression_from_env(monkeypatch):
+    monkeypatch.delenv(netcdf_writer.COMPRESSION_ENV, raising=False)
+    monkeypatch.delenv(netcdf_writer.COMPLEVEL_ENV, raising=False)
+    monkeypatch.delenv(netcdf_writer.CHUNK_SIZE_ENV, raising=False)
+    assert Compression.from_env() == Compression('zlib', 2, None, None)
+
+    monkeypatch.setenv(netcdf_writer.COMPRESSION_ENV, 'zstd')
+    monkeypatch.setenv(netcdf_writer.COMPLEVEL_ENV, '5')
+    monkeypatch.setenv(netcdf_writer.CHUNK_SIZE_ENV, '256')
+    assert Compression.from_env() == Compression('zstd', 5, 256, None)
+
+    monkeypatch.setenv(netcdf_writer.CHUNK_SIZE_ENV, '256,512')
+    assert Compression.from_env() == Compression('zstd', 5, 256, 512)
+
+    monkeypatch.setenv(netcdf_writer.COMPRESSION_ENV, 'lzma')
+    with pytest.raises(ValueError):
+        Compression.from_env()
+
+
+def test_chunk_sizes():
+    assert Compression().chunk_sizes((833, 1000)) == [833, 1000]
+    assert Compression().chunk_sizes((4000, 5000)) == [384, 5000]
+    assert Compression().chunk_sizes((10000, 8000)) == [128, 8000]
+    assert Compression(chunk_lines=256, chunk_columns=512).chunk_sizes((4000, 5000)) == [256, 512]
+    assert Compression(chunk_lines=256, chunk_columns=512).chunk_sizes((100, 200)) == [100, 200]
+
+
+def test_variable_kwargs():
+    no_filters = SimpleNamespace()
+    zstd = SimpleNamespace(has_zstd_filter=lambda: True, has_blosc_filter=lambda: False)
+
+    assert Compression().variable_kwargs(no_filters, (4000, 5000)) == {
+        'zlib': True, 'complevel': 2, 'shuffle': True, 'chunksizes': [384, 5000]
+    }
+    assert Compression('none').variable_kwargs(no_filters, (4000, 5000)) == {'chunksizes': [384, 5000]}
+    assert Compression('zstd', 3).variable_kwargs(zstd, (4000, 5000)) == {
+        'compression': 'zstd', 'complevel': 3, 'shuffle': True, 'chunksizes': [384, 5000]
+    }
+    assert Compression('zstd', 3).variable_kwargs(no_filters, (4000, 5000))['zlib']
+    assert Compression('blosc_lz4', 3).variable_kwargs(zstd, (4000, 5000))['zlib']
+
+
+def test_write_rows():
+    data = np.linspace(-40000, 40000, 77 * 13).reshape(77, 13)
+    variable = np.zeros(data.shape, dtype=np.int16)
+    netcdf_writer.write_rows(variable, data, lambda block: np.clip(block, -32768, 32767).astype(np.int16), 10)
+    assert np.array_equal(variable, np.clip(data, -32768, 32767).astype(np.int16))
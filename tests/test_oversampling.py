@@ -0,0 +1,24 @@
+import pytest
+
+from hyp3_autorift import oversampling
+
+
+def test_oversample_ratio():
+    assert oversampling.oversample_ratio() == 64
+    assert oversampling.oversample_ratio('fast') == 32
+    assert oversampling.oversample_ratio('accurate') == 128
+
+    assert oversampling.oversample_ratio('default', optical=True, chip_size0=16) == {16: 16, 32: 32, 64: 64, 128: 64}
+    assert oversampling.oversample_ratio('default', optical=False, chip_size0=16) == \
+        {16: 32, 32: 64, 64: 128, 128: 128}
+    assert oversampling.oversample_ratio('fast', optical=True, chip_size0=16) == {16: 8, 32: 16, 64: 32, 128: 32}
+    assert set(oversampling.oversample_ratio('accurate', optical=False, chip_size0=240).values()) == {128}
+
+
+def test_oversample_ratio_policies():
+    for sensor in ('optical', 'radar'):
+        fast, default, accurate = (oversampling.CHIP_SIZE_RATIOS[name][sensor] for name in oversampling.POLICIES)
+        assert all(f <= d <= a for f, d, a in zip(fast, default, accurate))
+
+    with pytest.raises(ValueError):
+        oversampling.oversample_ratio('fastest')
@@ -0,0 +1,48 @@
+import numpy as np
+from osgeo import gdal
+from osgeo import osr
+
+from hyp3_autorift import plan, tiling
+
+
+def test_footprint_from_points():
+    footprint = plan.footprint_from_points([(68.0, -50.0), (69.5, -49.0), (67.5, -48.0), (69.0, -46.5)])
+    assert footprint.GetGeometryName() == 'POLYGON'
+    assert footprint.GetEnvelope() == (-50.0, -46.5, 67.5, 69.5)
+
+
+def test_geogrid_window(tmp_path):
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32622)
+
+    search_range = np.full((100, 100), 10, dtype=np.int16)
+    search_range[:, :18] = 0
+    path = str(tmp_path / 'srx.tif')
+    ds = gdal.GetDriverByName('GTiff').Create(path, 100, 100, 1, gdal.GDT_Int16)
+    ds.SetGeoTransform((500000.0, 120.0, 0.0, 7490000.0, 0.0, -120.0))
+    ds.SetProjection(srs.ExportToWkt())
+    ds.GetRasterBand(1).WriteArray(search_range)
+    del ds
+
+    footprint = plan.footprint_from_geojson({
+        'type': 'Polygon',
+        'coordinates': [[[-51.0, 67.5], [-50.9, 67.5], [-50.9, 67.45], [-51.0, 67.45], [-51.0, 67.5]]],
+    })
+    grid = plan.geogrid_window(footprint, path)
+
+    assert 0 < grid['rows'] < 100
+    assert 0 < grid['columns'] < 100
+    assert 0 < grid['valid_chips'] < grid['rows'] * grid['columns']
+
+
+def test_estimate_peak_memory():
+    assert plan.estimate_peak_memory(1000, 10) == 1000 * tiling.BYTES_PER_PIXEL + 10 * plan.GRID_BYTES_PER_POINT
+
+    limited = plan.estimate_peak_memory(2**40, 10, memory_limit=2, workers=4)
+    assert limited == 8 * 2**30 + 10 * plan.GRID_BYTES_PER_POINT
+
+
+def test_estimate_runtime():
+    assert plan.estimate_runtime(0, 0) == 0.0
+    assert plan.estimate_runtime(1000, 0, workers=4) == 1000 * plan.SECONDS_PER_CHIP / 4
+    assert plan.estimate_runtime(0, 100e6) == 100e6 / plan.DOWNLOAD_BYTES_PER_SECOND
@@ -0,0 +1,61 @@
+import numpy as np
+
+from hyp3_autorift import cache, preprocessing
+
+PATH = '/vsis3/sentinel-s2-l1c/tiles/22/W/EB/2020/9/13/0/B08.jp2'
+PARAMETERS = {'version': '1.3.0', 'WallisFilterWidth': 21, 'DataType': 0, 'zeroMask': False}
+
+
+def test_cache_key():
+    key = preprocessing.cache_key(PATH, (0, 0, 10980, 10980), PARAMETERS)
+    assert key == preprocessing.cache_key(PATH, (np.int64(0), 0, 10980, 10980), dict(reversed(PARAMETERS.items())))
+
+    assert key != preprocessing.cache_key(PATH.replace('B08', 'B04'), (0, 0, 10980, 10980), PARAMETERS)
+    assert key != preprocessing.cache_key(PATH, (0, 0, 10980, 10979), PARAMETERS)
+    assert key != preprocessing.cache_key(PATH, (0, 0, 10980, 10980), {**PARAMETERS, 'WallisFilterWidth': 5})
+
+
+def test_is_enabled(monkeypatch):
+    monkeypatch.delenv(preprocessing.PREPROCESSING_CACHE_ENV, raising=False)
+    monkeypatch.setenv(cache.CACHE_SIZE_ENV, '1')
+    assert not preprocessing.is_enabled()
+
+    monkeypatch.setenv(preprocessing.PREPROCESSING_CACHE_ENV, 'true')
+    assert preprocessing.is_enabled()
+
+    monkeypatch.delenv(cache.CACHE_SIZE_ENV)
+    assert preprocessing.is_enabled()
+
+    monkeypatch.setenv(cache.CACHE_SIZE_ENV, '0')
+    assert not preprocessing.is_enabled()
+
+    monkeypatch.setenv(cache.CACHE_SIZE_ENV, '1')
+    monkeypatch.setenv(preprocessing.PREPROCESSING_CACHE_ENV, 'false')
+    assert not preprocessing.is_enabled()
+
+
+def test_store_and_load(tmp_path):
+    key = preprocessing.cache_key(PATH, (0, 0, 30, 20), PARAMETERS)
+    assert preprocessing.load(key, cache_dir=tmp_path) is None
+
+    image = np.arange(600, dtype=np.uint8).reshape(20, 30)
+    valid = image % 3 != 0
+    preprocessing.store(key, image, valid, cache_dir=tmp_path, cache_size=2**20)
+
+    cached_image, cached_valid = preprocessing.load(key, cache_dir=tmp_path)
+    assert isinstance(cached_image, np.memmap)
+    assert np.array_equal(cached_image, image)
+    assert np.array_equal(cached_valid, valid)
+
+    # Copy-on-write: modifying the loaded image doesn't modify the cache
+    cached_image[:] = 0
+    assert np.array_equal(preprocessing.load(key, cache_dir=tmp_path)[0], image)
+
+
+def test_load_partially_evicted(tmp_path):
+    key = preprocessing.cache_key(PATH, (0, 0, 30, 20), PARAMETERS)
+    image = np.zeros((20, 30), dtype=np.uint8)
+    preprocessing.store(key, image, image == 0, cache_dir=tmp_path, cache_size=2**20)
+
+    (tmp_path / 'blobs' / key[:2] / key / preprocessing.VALID_FILE).unlink()
+    assert preprocessing.load(key, cache_dir=tmp_path) is None
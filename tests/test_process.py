@@ -1,11 +1,14 @@
+import json
+import time
 from datetime import datetime
+from pathlib import Path
 from re import match
 
 import pytest
 import responses
 from requests import HTTPError
 
-from hyp3_autorift import process
+from hyp3_autorift import download, process
 
 
 def test_get_platform():
@@ -197,3 +200,45 @@ def test_get_s1_primary_polarization():
         process.get_s1_primary_polarization('S1A_IW_SLC__1SVH_20150706T015744_20150706T015814_006684_008EF7_9B69')
     with pytest.raises(ValueError):
         process.get_s1_primary_polarization('S1A_IW_GRDH_1SVV_20150706T015720_20150706T015749_006684_008EF7_54BA')
+
+
+def test_process_writes_metrics_on_failure(tmp_path):
+    metrics_file = tmp_path / 'metrics.json'
+    with pytest.raises(NotImplementedError):
+        process.process('S3B_IW_GRDH_1SSH_20201203T095903_20201203T095928_024536_02EAB3_6D81',
+                        'S3B_IW_GRDH_1SSH_20201215T095903_20201215T095928_024711_02EAB3_6D81',
+                        metrics_file=metrics_file)
+    assert json.loads(metrics_file.read_text())['stages'] == {}
+
+
+def test_process_s1_preparation_failure(tmp_path, monkeypatch):
+    reference = 'S1A_IW_SLC__1SSH_20170221T204710_20170221T204737_015387_0193F6_AB07'
+    secondary = 'S1B_IW_SLC__1SSH_20170227T204628_20170227T204655_004491_007D11_6654'
+    cancelled = []
+
+    def mock_download_file(url, chunk_size, cancel):
+        if secondary in url:
+            cancelled.append(cancel.wait(timeout=10))
+            raise download.DownloadCancelled(url)
+        return Path(url.rsplit('/', 1)[-1])
+
+    def mock_get_parameter_info(*args):
+        raise ValueError('no parameter region')
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(process, 'get_download_url', lambda scene: f'https://example.com/{scene}.zip')
+    monkeypatch.setattr(process.download, 'download_file', mock_download_file)
+    monkeypatch.setattr(process.download, 'download_orbit', lambda granule, directory: (f'{granule}.EOF', 'ESA'))
+    monkeypatch.setattr(process.geometry, 'S1Metadata', lambda *args: None)
+    monkeypatch.setattr(process.geometry, 'bounding_box', lambda *args, **kwargs: ((60., 61.), (-45., -44.)))
+    monkeypatch.setattr(process, 'get_s1_parameter_info', lambda *args: None)
+    monkeypatch.setattr(process, 'get_parameter_info', mock_get_parameter_info)
+
+    with pytest.raises(ValueError, match='no parameter region'):
+        process.process(reference, secondary)
+
+    for _ in range(100):
+        if cancelled:
+            break
+        time.sleep(0.1)
+    assert cancelled == [True]
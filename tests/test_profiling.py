@@ -0,0 +1,58 @@
+import pstats
+
+import pytest
+
+from hyp3_autorift import profiling
+
+
+def fibonacci(n):
+    return n if n < 2 else fibonacci(n - 1) + fibonacci(n - 2)
+
+
+def work():
+    return sum(fibonacci(15) for _ in range(20))
+
+
+def test_profiler(tmp_path):
+    with profiling.Profiler(sample=False) as profiler:
+        work()
+    stats_file, collapsed_file = profiler.write(tmp_path / 'product')
+
+    assert stats_file == tmp_path / 'product.pstats'
+    stats = pstats.Stats(str(stats_file))
+    assert any(name == 'fibonacci' for _, _, name in stats.stats)
+
+    stacks = [line.rsplit(' ', 1) for line in collapsed_file.read_text().splitlines()]
+    assert all(int(microseconds) > 0 for _, microseconds in stacks)
+    fibonacci_stacks = [stack for stack, _ in stacks if 'fibonacci (test_profiling.py' in stack]
+    assert fibonacci_stacks
+    assert all('work (test_profiling.py' in stack for stack in fibonacci_stacks)
+
+
+def test_profiler_failed_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with pytest.raises(ZeroDivisionError):
+        with profiling.Profiler(sample=False):
+            work() / 0
+
+    assert (tmp_path / f'{profiling.DEFAULT_PREFIX}.pstats').exists()
+    assert (tmp_path / f'{profiling.DEFAULT_PREFIX}.collapsed').exists()
+
+
+def test_collapsed_stacks():
+    stats = pstats.Stats.__new__(pstats.Stats)
+    main, a, b, c = ('main.py', 1, 'main'), ('a.py', 1, 'a'), ('b.py', 1, 'b'), ('~', 0, '<built-in method c>')
+    stats.stats = {
+        main: (1, 1, 1.0, 10.0, {}),
+        a: (1, 1, 2.0, 5.0, {main: (1, 1, 2.0, 5.0)}),
+        b: (1, 1, 1.0, 4.0, {main: (1, 1, 1.0, 4.0)}),
+        c: (2, 2, 6.0, 6.0, {a: (1, 1, 3.0, 3.0), b: (1, 1, 3.0, 3.0)}),
+    }
+
+    assert profiling.collapsed_stacks(stats) == {
+        'main (main.py:1)': 1.0,
+        'main (main.py:1);a (a.py:1)': 2.0,
+        'main (main.py:1);a (a.py:1);<built-in method c>': 3.0,
+        'main (main.py:1);b (b.py:1)': 1.0,
+        'main (main.py:1);b (b.py:1);<built-in method c>': 3.0,
+    }
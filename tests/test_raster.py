@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from osgeo import gdal
+
+from hyp3_autorift import raster
+
+
+def test_gdal_config():
+    gdal.SetConfigOption('GDAL_HTTP_MULTIRANGE', None)
+    with raster.gdal_config(GDAL_HTTP_MULTIRANGE='SERIAL'):
+        assert gdal.GetConfigOption('GDAL_HTTP_MULTIRANGE') == 'SERIAL'
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(gdal.GetConfigOption, 'GDAL_HTTP_MULTIRANGE').result() is None
+    assert gdal.GetConfigOption('GDAL_HTTP_MULTIRANGE') is None
+
+
+def test_read_windows(tmp_path):
+    paths = []
+    for ii in range(5):
+        path = str(tmp_path / f'raster{ii}.tif')
+        ds = gdal.GetDriverByName('GTiff').Create(path, 100, 80, 1, gdal.GDT_Float32,
+                                                  options=['TILED=YES', 'BLOCKXSIZE=16', 'BLOCKYSIZE=16'])
+        ds.GetRasterBand(1).WriteArray(np.arange(8000, dtype=np.float32).reshape(80, 100) * ii)
+        del ds
+        paths.append(path)
+
+    for multirange in (True, False):
+        windows = raster.read_windows(paths, 10, 20, 30, 40, multirange=multirange)
+        for ii, window in enumerate(windows):
+            expected = np.arange(8000, dtype=np.float32).reshape(80, 100)[20:60, 10:40] * ii
+            assert np.array_equal(window, expected)
+
+
+def test_read_window_into(tmp_path):
+    path = str(tmp_path / 'band.tif')
+    data = np.arange(8000, dtype=np.uint16).reshape(80, 100)
+    ds = gdal.GetDriverByName('GTiff').Create(path, 100, 80, 1, gdal.GDT_UInt16)
+    ds.GetRasterBand(1).WriteArray(data)
+    del ds
+
+    window = raster.read_window_into(path, 10, 20, 30, 40)
+    assert window.dtype == np.float32
+    assert np.array_equal(window, data[20:60, 10:40].astype(np.float32))
+
+    doubles = raster.read_window_into(path, 10, 20, 30, 40, dtype=np.float64)
+    assert doubles.dtype == np.float64
+    assert np.array_equal(doubles, data[20:60, 10:40])
@@ -0,0 +1,96 @@
+import zipfile
+
+import pytest
+import responses
+
+from hyp3_autorift import cache, safe
+
+NAME = 'S1A_IW_SLC__1SSH_20170221T204710_20170221T204737_015387_0193F6_AB07'
+URL = f'https://example.com/{NAME}.zip'
+
+
+def annotation(points):
+    grid = ''.join(
+        f'<geolocationGridPoint><latitude>{lat}</latitude><longitude>{lon}</longitude></geolocationGridPoint>'
+        for lat, lon in points
+    )
+    return f'<product><geolocationGrid><geolocationGridPointList count="{len(points)}">{grid}' \
+           f'</geolocationGridPointList></geolocationGrid></product>'
+
+
+@pytest.fixture
+def safe_zip(tmp_path):
+    path = tmp_path / f'{NAME}.zip'
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(f'{NAME}.SAFE/manifest.safe', '<manifest/>')
+        archive.writestr(f'{NAME}.SAFE/measurement/s1a-iw1-slc-hh-20170221t204710-001.tiff', b'\0' * 100000)
+        archive.writestr(f'{NAME}.SAFE/annotation/s1a-iw1-slc-hh-20170221t204710-001.xml',
+                         annotation([(68.0, -50.0), (69.5, -49.0)]))
+        archive.writestr(f'{NAME}.SAFE/annotation/s1a-iw2-slc-hh-20170221t204710-002.xml',
+                         annotation([(67.5, -48.0), (69.0, -46.5)]))
+        archive.writestr(f'{NAME}.SAFE/annotation/s1a-iw1-slc-hv-20170221t204710-004.xml',
+                         annotation([(0.0, 0.0)]))
+        archive.writestr(f'{NAME}.SAFE/annotation/calibration/calibration-s1a-iw1-slc-hh-20170221t204710-001.xml',
+                         '<calibration/>')
+    return path
+
+
+def serve_ranges(path):
+    content = path.read_bytes()
+
+    def ranged(request):
+        start, end = map(int, request.headers['Range'][len('bytes='):].split('-'))
+        end = min(end, len(content) - 1)
+        return 206, {'Content-Range': f'bytes {start}-{end}/{len(content)}'}, content[start:end + 1]
+
+    responses.add_callback(responses.GET, URL, callback=ranged)
+
+
+def test_bounding_box(safe_zip):
+    assert safe.bounding_box(str(safe_zip), 'hh') == ((67.5, 69.5), (-50.0, -46.5))
+    assert safe.bounding_box(str(safe_zip), 'HV') == ((0.0, 0.0), (0.0, 0.0))
+
+    with pytest.raises(ValueError):
+        safe.bounding_box(str(safe_zip), 'vv')
+
+
+@responses.activate
+def test_bounding_box_remote(safe_zip):
+    serve_ranges(safe_zip)
+    assert safe.bounding_box(URL, 'hh') == ((67.5, 69.5), (-50.0, -46.5))
+    assert safe.bounding_box(f'/vsicurl/{URL}', 'hh') == ((67.5, 69.5), (-50.0, -46.5))
+
+    # The measurement data is never read
+    assert all(len(call.response.content) < safe_zip.stat().st_size for call in responses.calls)
+
+
+@responses.activate
+def test_http_range_file(safe_zip):
+    serve_ranges(safe_zip)
+    remote = safe.HttpRangeFile(URL)
+    assert remote.size == safe_zip.stat().st_size
+
+    remote.seek(-10, 2)
+    assert remote.read(100) == safe_zip.read_bytes()[-10:]
+    assert remote.read(100) == b''
+    assert remote.requests == 2
+    assert all(call.request.req_kwargs['timeout'] == cache.REQUEST_TIMEOUT for call in responses.calls)
+
+
+@responses.activate
+def test_http_range_file_unsupported():
+    responses.add(responses.GET, URL, body=b'0123456789', status=200)
+    with pytest.raises(ValueError):
+        safe.HttpRangeFile(URL)
+
+
+def test_extract_metadata(safe_zip, tmp_path):
+    paths = safe.extract_metadata(str(safe_zip), tmp_path / 'metadata')
+    assert sorted(path.name for path in paths) == [
+        'calibration-s1a-iw1-slc-hh-20170221t204710-001.xml',
+        'manifest.safe',
+        's1a-iw1-slc-hh-20170221t204710-001.xml',
+        's1a-iw1-slc-hv-20170221t204710-004.xml',
+        's1a-iw2-slc-hh-20170221t204710-002.xml',
+    ]
+    assert not (tmp_path / 'metadata' / f'{NAME}.SAFE' / 'measurement').exists()
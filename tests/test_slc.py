@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from osgeo import gdal
+
+from hyp3_autorift import slc
+
+
+def make_slc(tmp_path):
+    rng = np.random.default_rng(seed=42)
+    data = (rng.normal(size=(50, 40)) + 1j * rng.normal(size=(50, 40))).astype(np.complex64)
+
+    path = str(tmp_path / 'reference.slc.full')
+    ds = gdal.GetDriverByName('ENVI').Create(path, 40, 50, 1, gdal.GDT_CFloat32)
+    ds.GetRasterBand(1).WriteArray(data)
+    del ds
+    gdal.Translate(f'{path}.vrt', path, format='VRT')
+
+    return f'{path}.vrt', data
+
+
+def test_raster_shape(tmp_path):
+    path, data = make_slc(tmp_path)
+    assert slc.raster_shape(path) == data.shape
+
+
+def test_read_amplitude(tmp_path):
+    path, data = make_slc(tmp_path)
+
+    amplitude = slc.read_amplitude(path, block_rows=7)
+    assert amplitude.dtype == np.float32
+    assert np.array_equal(amplitude, np.abs(data))
+
+    window = slc.read_amplitude(path, window=(5, 33, 10, 30), block_rows=10)
+    assert np.array_equal(window, np.abs(data[5:33, 10:30]))
+
+
+def test_array_amplitude():
+    rng = np.random.default_rng(seed=42)
+    data = (rng.normal(size=(50, 40)) + 1j * rng.normal(size=(50, 40))).astype(np.complex64)
+
+    amplitude = slc.array_amplitude(data, block_rows=7)
+    assert amplitude.dtype == np.float32
+    assert np.array_equal(amplitude, np.abs(data))
+
+
+def test_array_amplitude_uint16():
+    rng = np.random.default_rng(seed=42)
+    data = (rng.normal(size=(50, 40)) + 1j * rng.normal(size=(50, 40))).astype(np.complex64)
+    data[:5] = 0
+    data[5, :3] = [1e-6, 1e6, -1e6j]
+
+    amplitude = slc.array_amplitude(data, dtype=np.uint16, scale=1000., block_rows=7)
+    assert amplitude.dtype == np.uint16
+    assert np.array_equal(amplitude == 0, data == 0)
+    assert list(amplitude[5, :3]) == [1, slc.UINT16_MAX, slc.UINT16_MAX]
+    assert np.allclose(amplitude[6:], np.abs(data[6:]) * 1000., atol=0.5)
+
+    estimated = slc.array_amplitude(data[6:], dtype=np.uint16)
+    assert estimated.max() < slc.UINT16_MAX
+    assert np.median(estimated) > 1000
+
+    with pytest.raises(ValueError):
+        slc.array_amplitude(data, dtype=np.float64)
@@ -0,0 +1,126 @@
+import numpy as np
+
+from hyp3_autorift import tiling
+
+
+def test_tile_grid():
+    tiles = tiling.tile_grid((10, 7), 4, 1)
+    assert len(tiles) == 6
+
+    assert tiles[0] == tiling.Tile(slice(0, 5), slice(0, 5), slice(0, 4), slice(0, 4))
+    assert tiles[1] == tiling.Tile(slice(0, 5), slice(3, 7), slice(0, 4), slice(4, 7))
+    assert tiles[-1] == tiling.Tile(slice(7, 10), slice(3, 7), slice(8, 10), slice(4, 7))
+
+    covered = np.zeros((10, 7), dtype=int)
+    for tile in tiles:
+        covered[tile.core_rows, tile.core_cols] += 1
+    assert (covered == 1).all()
+
+
+def test_image_window():
+    xGrid = np.array([[11, 21], [11, 21]])
+    yGrid = np.array([[11, 11], [31, 31]])
+    valid = np.ones(xGrid.shape, dtype=bool)
+    reach = np.full(xGrid.shape, 5)
+
+    assert tiling.image_window(xGrid, yGrid, valid, reach, reach, (100, 100), pad=0) == (5, 36, 5, 26)
+    assert tiling.image_window(xGrid, yGrid, valid, reach, reach, (100, 100), pad=10) == (0, 46, 0, 36)
+    assert tiling.image_window(xGrid, yGrid, valid, reach, reach, (30, 20), pad=0) == (5, 30, 5, 20)
+
+    valid[1, :] = False
+    assert tiling.image_window(xGrid, yGrid, valid, reach, reach, (100, 100), pad=0) == (5, 16, 5, 26)
+
+    valid[:] = False
+    assert tiling.image_window(xGrid, yGrid, valid, reach, reach, (100, 100)) is None
+    assert tiling.window_bytes(None) == 0
+
+
+def test_choose_tile_size():
+    yGrid, xGrid = np.mgrid[1:1000:10, 1:1000:10]
+    valid = np.ones(xGrid.shape, dtype=bool)
+    reach = np.full(xGrid.shape, 16)
+
+    full = tiling.window_bytes((0, 1000, 0, 1000))
+    assert tiling.choose_tile_size(full, xGrid, yGrid, valid, reach, reach, (1000, 1000), 4, 4) == 100
+
+    tile_size = tiling.choose_tile_size(full / 4, xGrid, yGrid, valid, reach, reach, (1000, 1000), 4, 4)
+    assert tile_size < 100
+    assert tile_size % 4 == 0
+
+    assert tiling.choose_tile_size(1, xGrid, yGrid, valid, reach, reach, (1000, 1000), 4, 4) == 4
+
+
+def test_chop_factor():
+    CSMINx0 = np.array([[0, 240], [480, 240]])
+    CSMAXx0 = np.array([[0, 480], [960, 960]])
+    valid = np.ones(CSMINx0.shape, dtype=bool)
+
+    assert tiling.chop_factor(CSMINx0, CSMAXx0, valid) == 4
+    assert tiling.chop_factor(CSMINx0, CSMINx0, valid) == 2
+    assert tiling.chop_factor(CSMINx0, CSMAXx0, np.zeros(CSMINx0.shape, dtype=bool)) == 1
+
+
+def test_pad_to():
+    padded = tiling.pad_to(np.ones((2, 3), dtype=np.float32), (3, 4), np.nan)
+    assert padded.dtype == np.float32
+    assert np.array_equal(padded[:2, :3], np.ones((2, 3)))
+    assert np.isnan(padded[2, :]).all()
+    assert np.isnan(padded[:, 3]).all()
+
+
+IMAGE = np.random.default_rng(42).random((200, 200), dtype=np.float32)
+NODATA = -32767
+
+
+def open_product(file_m, file_s):
+    def read_window(row0, row1, col0, col1):
+        return IMAGE[row0:row1, col0:col1], IMAGE[row0:row1, col0:col1]
+    return IMAGE.shape, read_window
+
+
+def run_autorift(I1, I2, xGrid, yGrid, Dx0, Dy0, SRx0, SRy0, CSMINx0, CSMINy0, CSMAXx0, CSMAXy0, noDataMask,
+                 optflag, nodata, mpflag, geogrid_run_info=None, scale_chip_size_y=None, oversample='default'):
+    gridded = (xGrid != nodata) & (yGrid != nodata)
+    Dx = np.full(xGrid.shape, np.nan, dtype=np.float32)
+    Dx[gridded] = I1[yGrid[gridded] - 1, xGrid[gridded] - 1]
+    Dy = Dx * I1.mean()
+    zeros = np.zeros(xGrid.shape, dtype=np.float32)
+    return Dx, Dy, zeros, zeros, scale_chip_size_y, zeros, zeros, xGrid.shape, ~gridded
+
+
+def run_tiled(workers):
+    yGrid, xGrid = np.mgrid[11:200:20, 11:200:20]
+    xGrid[0, 0] = NODATA
+    yGrid[0, 0] = NODATA
+    ones = np.ones(xGrid.shape)
+    noDataMask = np.zeros(xGrid.shape, dtype=bool)
+
+    outputs = tiling.run_tiled(
+        run_autorift, open_product, ('reference', 'secondary'), 2 * tiling.window_bytes((0, 100, 0, 100)),
+        xGrid, yGrid, ones, ones, 4 * ones, 4 * ones, 16 * ones, 16 * ones, 16 * ones, 16 * ones, noDataMask, 0,
+        NODATA, workers=workers,
+    )
+    return xGrid, yGrid, outputs
+
+
+def test_run_tiled():
+    xGrid, yGrid, outputs = run_tiled(workers=1)
+    Dx, Dy, _, _, scale_chip_size_y, _, _, grid_shape, noDataMaskOut = outputs
+
+    assert grid_shape == xGrid.shape
+    assert scale_chip_size_y == 1
+    assert np.isnan(Dx[0, 0])
+    assert noDataMaskOut[0, 0]
+    assert np.array_equal(Dx[1:, 1:], IMAGE[yGrid[1:, 1:] - 1, xGrid[1:, 1:] - 1])
+    assert not noDataMaskOut[1:, 1:].any()
+
+
+def test_run_tiled_workers():
+    _, _, serial = run_tiled(workers=1)
+    _, _, parallel = run_tiled(workers=3)
+
+    for serial_output, parallel_output in zip(serial, parallel):
+        if isinstance(serial_output, np.ndarray):
+            assert serial_output.tobytes() == parallel_output.tobytes()
+        else:
+            assert serial_output == parallel_output
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+
+from hyp3_autorift.vend import testautoRIFT, testautoRIFT_ISCE
+
+
+def mask_zero_values_loop(I1, I2, xGrid, yGrid, noDataMask, nodata):
+    for ii in range(xGrid.shape[0]):
+        for jj in range(xGrid.shape[1]):
+            if (yGrid[ii, jj] != nodata) & (xGrid[ii, jj] != nodata):
+                if (I1[yGrid[ii, jj] - 1, xGrid[ii, jj] - 1] == 0) | (I2[yGrid[ii, jj] - 1, xGrid[ii, jj] - 1] == 0):
+                    noDataMask[ii, jj] = True
+    return noDataMask
+
+
+@pytest.mark.parametrize('module', [testautoRIFT, testautoRIFT_ISCE])
+@pytest.mark.parametrize('nodata', [-32767, None])
+def test_mask_zero_values(module, nodata):
+    rng = np.random.default_rng(seed=42)
+    I1 = rng.integers(0, 4, size=(200, 300)).astype(np.float32)
+    I2 = rng.integers(0, 4, size=(200, 300)).astype(np.float32)
+    xGrid = rng.integers(1, 301, size=(20, 30)).astype(np.int32)
+    yGrid = rng.integers(1, 201, size=(20, 30)).astype(np.int32)
+    if nodata is not None:
+        xGrid[:5, :5] = nodata
+        yGrid[-5:, -5:] = nodata
+    noDataMask = xGrid == nodata
+
+    expected = mask_zero_values_loop(I1, I2, xGrid, yGrid, noDataMask.copy(), nodata)
+    mask = module.maskZeroValues(I1, I2, xGrid, yGrid, noDataMask, nodata)
+
+    assert mask is noDataMask
+    assert np.array_equal(mask, expected)
+    assert mask.any() and not mask.all()